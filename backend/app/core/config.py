@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Literal, Optional
+from typing import Dict, Literal, Optional
 
 
 class Settings(BaseSettings):
@@ -11,7 +11,9 @@ class Settings(BaseSettings):
     openai_api_key: Optional[str] = None
     openrouter_api_key: Optional[str] = None
 
-    # Local provider URLs (overridable)
+    # Provider URLs (overridable, e.g. to point at local fakes)
+    openai_base_url: str = "https://api.openai.com/v1"
+    openrouter_base_url: str = "https://openrouter.ai/api/v1"
     ollama_base_url: str = "http://localhost:11434/v1"
     lmstudio_base_url: str = "http://localhost:1234/v1"
 
@@ -19,15 +21,119 @@ class Settings(BaseSettings):
     openrouter_site_url: Optional[str] = None
     openrouter_app_name: Optional[str] = None
 
+    # Multi-provider routing (disabled unless llm_router_providers is set)
+    llm_router_providers: str = ""  # Comma-separated, e.g. "openrouter,ollama"
+    llm_router_models: Dict[str, str] = {}  # Per-provider model; defaults to llm_model
+    llm_router_hedge_ms: int = 0  # Start a second backend if no first token by then (0 = off)
+    llm_router_failure_threshold: int = 3
+    llm_router_cooldown_seconds: int = 30
+
     # Observability
     langsmith_enabled: bool = True
     langsmith_api_key: Optional[str] = None
     langsmith_project: str = "rag-masterclass"
 
+    # Retrieval reranking (local cross-encoder, requires requirements-rerank.txt)
+    rerank_enabled: bool = False
+    rerank_model_path: Optional[str] = None
+    rerank_candidate_multiplier: int = 4
+    rerank_top_n: int = 3
+    rerank_batch_size: int = 16
+    rerank_latency_budget_ms: int = 250
+    rerank_cache_size: int = 4096
+
+    # Context packing
+    context_token_budget: int = 2000
+    context_mmr_lambda: float = 0.7
+
+    # Conversation history
+    history_token_budget: int = 3000
+    history_fetch_limit: int = 40
+    history_summary_model: Optional[str] = None  # Defaults to llm_model; unused when routing
+    history_summary_batch_tokens: int = 6000  # Max transcript tokens per summarize() call
+    history_summary_max_batches: int = 4  # Summarize calls per turn; a longer backlog continues next turn
+
+    # SSE streaming
+    sse_coalesce_window_ms: int = 30
+    sse_coalesce_max_chars: int = 512
+
+    # Semantic answer cache
+    answer_cache_enabled: bool = False
+    answer_cache_min_similarity: float = 0.95
+    answer_cache_ttl_hours: int = 168
+
+    # Retrieval prefetch while the user types (POST /api/threads/{id}/prefetch)
+    prefetch_enabled: bool = True
+    prefetch_ttl_seconds: float = 30
+    prefetch_max_entries_per_user: int = 4
+    prefetch_min_chars: int = 8
+    prefetch_min_similarity: float = 0.9  # Text similarity for a near-identical query to reuse chunks
+
+    # Admission control (concurrent slots, globally and per user)
+    llm_max_concurrency: int = 64
+    llm_max_concurrency_per_user: int = 4
+    embedding_max_concurrency: int = 16
+    embedding_max_concurrency_per_user: int = 4
+    admission_max_queue_interactive: int = 128
+    admission_max_queue_background: int = 1024
+    admission_max_wait_seconds: float = 10
+    admission_background_max_wait_seconds: float = 300
+
+    # Ingestion progress
+    ingestion_progress_interval_seconds: float = 1.0
+
+    # Ingestion job queue (shared by all replicas through Postgres)
+    ingestion_worker_enabled: bool = True
+    ingestion_worker_concurrency: int = 2
+    ingestion_lease_seconds: int = 60
+    ingestion_poll_interval_seconds: float = 2
+    ingestion_sweep_interval_seconds: float = 30
+    ingestion_max_attempts: int = 3
+
+    # Sampling profiler (overridable at runtime via profiling_config_path)
+    profiling_enabled: bool = False
+    profiling_sample_rate: float = 0.0
+    profiling_slow_threshold_ms: int = 0
+    profiling_interval_ms: int = 5
+    profiling_output_dir: str = "profiles"
+    profiling_max_files: int = 200
+    profiling_config_path: str = "profiling.json"
+
+    # Document deletion reaper
+    reaper_interval_seconds: float = 30
+    reaper_chunk_batch_size: int = 1000
+    reaper_batch_pause_ms: int = 50
+    reaper_documents_per_pass: int = 50
+    reaper_lease_seconds: int = 120
+
+    # Embedding model (the active model is stored in embedding_config)
+    embedding_state_ttl_seconds: float = 30
+    embedding_backfill_batch_size: int = 100
+    embedding_backfill_pause_ms: int = 200
+    embedding_backfill_max_chunks_per_second: float = 0  # 0 = only the pause throttles
+
+    # Retrieval evaluation (POST /api/evaluations, scripts/evaluate_retrieval.py)
+    evaluation_max_cases: int = 500
+    evaluation_max_concurrency: int = 16
+    evaluation_embedding_batch_size: int = 100
+
+    # Auth
+    auth_token_cache_size: int = 10000
+    auth_jwks_refresh_seconds: int = 600
+    auth_jwks_min_refresh_seconds: int = 30
+    # Bearer token for /metrics and /health/answer-cache; unset disables them
+    metrics_token: Optional[str] = None
+
     # Supabase
     supabase_url: str
     supabase_anon_key: str
     supabase_service_role_key: str
+    # Shared connection pool for all Supabase calls
+    supabase_http2: bool = True
+    supabase_pool_max_connections: int = 100
+    supabase_pool_max_keepalive: int = 20
+    supabase_pool_keepalive_expiry: float = 30
+    supabase_timeout_seconds: float = 30
 
     class Config:
         env_file = ".env"
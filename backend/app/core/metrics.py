@@ -0,0 +1,319 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Recording is a dict lookup, a bisect and a few integer adds under a lock, so
+it is safe to leave on in production. Metrics are per worker process; scrape
+each worker (or run one worker per container) as usual for Prometheus.
+
+Usage:
+    REQUESTS = counter("app_requests_total", "Requests handled", ["route"])
+    REQUESTS.labels(route="/x").inc()
+
+    with LATENCY.time(stage="embed"):
+        ...
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow LLM streams
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        key = tuple([str(labels.get(name, "")) for name in self.labelnames])
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, child in list(self._children.items()):
+            yield from self._collect_child(key, child)
+
+    def _collect_child(self, key, child) -> Iterable[str]:
+        yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        self.labels(**labels).inc(amount)
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down.
+
+    Pass `callback` to compute the samples at scrape time instead; it returns
+    (label values, value) pairs. Useful for state that already lives elsewhere,
+    like queue depths.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Iterable[Tuple[Sequence[str], float]]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float, **labels) -> None:
+        self.labels(**labels).set(value)
+
+    def collect(self) -> Iterable[str]:
+        if self.callback is None:
+            yield from super().collect()
+            return
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, value in self.callback():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf; cumulated at scrape time
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels):
+        """Context manager observing the elapsed wall time of its block."""
+        return self.labels(**labels).time()
+
+    def _collect_child(self, key, child) -> Iterable[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total, count = child.sum, child.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = _format_labels(self.labelnames, key)
+        yield f"{self.name}_sum{labels} {_format_value(total)}"
+        yield f"{self.name}_count{labels} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Re-registering (e.g. on module reload) returns the existing metric
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    callback: Optional[Callable[[], Iterable[Tuple[Sequence[str], float]]]] = None,
+) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, callback))
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# Shared metrics, defined here so every module records into the same series
+
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, including streamed bodies",
+    ["method", "route", "status"],
+)
+AUTH_VERIFY_SECONDS = histogram(
+    "auth_jwt_verify_seconds",
+    "JWT verification time",
+    ["result"],
+)
+SUPABASE_REQUEST_SECONDS = histogram(
+    "supabase_request_seconds",
+    "Supabase round trip time until response headers",
+    ["method", "target", "status"],
+)
+EMBEDDING_SECONDS = histogram(
+    "embedding_request_seconds",
+    "Embedding API call time",
+    ["provider", "kind"],
+)
+RETRIEVAL_MATCH_SECONDS = histogram(
+    "retrieval_match_seconds",
+    "Vector search RPC time",
+    ["rpc"],
+)
+RETRIEVAL_RERANK_SECONDS = histogram(
+    "retrieval_rerank_seconds",
+    "Cross-encoder rerank time",
+)
+CONTEXT_BUILD_SECONDS = histogram(
+    "chat_context_build_seconds",
+    "Packing and formatting retrieved chunks into the prompt",
+)
+LLM_TTFT_SECONDS = histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from request to first content token",
+    ["provider", "model"],
+)
+LLM_STREAM_SECONDS = histogram(
+    "llm_stream_seconds",
+    "Total LLM stream time",
+    ["provider", "model", "outcome"],
+)
+CHAT_FIRST_FRAME_SECONDS = histogram(
+    "chat_first_frame_seconds",
+    "Chat request start to first SSE frame",
+    ["source"],
+)
+INGESTION_STAGE_SECONDS = histogram(
+    "ingestion_stage_seconds",
+    "Time spent in each document ingestion stage",
+    ["stage"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+ADMISSION_REJECTED = counter(
+    "admission_rejected_total",
+    "Requests shed by admission control",
+    ["controller", "priority"],
+)
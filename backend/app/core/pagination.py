@@ -0,0 +1,78 @@
+import base64
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Query, status
+
+# Header carrying the cursor for the next page; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+@dataclass
+class Page:
+    limit: int
+    # (sort value, id) of the last row on the previous page
+    after: Optional[Tuple[str, str]] = None
+
+
+def encode_cursor(sort_value: str, row_id: str) -> str:
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        # Both parts are interpolated into the filter, so only accept the expected shapes
+        datetime.fromisoformat(sort_value)
+        uuid.UUID(row_id)
+        return sort_value, row_id
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def page_params(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+) -> Page:
+    """FastAPI dependency for `?limit=&cursor=` query parameters."""
+    return Page(limit=limit, after=decode_cursor(cursor) if cursor else None)
+
+
+def apply_keyset(query, page: Page, sort_column: str, desc: bool = True):
+    """
+    Order by (sort_column, id) and start after the page cursor.
+
+    Fetches one extra row so `finish_page` can tell whether another page exists.
+    """
+    if page.after is not None:
+        sort_value, row_id = page.after
+        op = "lt" if desc else "gt"
+        # Values are quoted because timestamps contain ':' and '+'
+        query = query.or_(
+            f'{sort_column}.{op}."{sort_value}",'
+            f'and({sort_column}.eq."{sort_value}",id.{op}.{row_id})'
+        )
+    return (
+        query.order(sort_column, desc=desc)
+        .order("id", desc=desc)
+        .limit(page.limit + 1)
+    )
+
+
+def finish_page(rows: List[dict], page: Page, sort_column: str) -> Tuple[List[dict], Optional[str]]:
+    """Trim the look-ahead row and build the cursor for the next page, if any."""
+    if len(rows) <= page.limit:
+        return rows, None
+    rows = rows[: page.limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[sort_column], last["id"])
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, fields, replace
+from datetime import datetime, timezone
+from typing import Deque, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# How often the override file's mtime is checked
+CONFIG_CHECK_SECONDS = 1.0
+# How much sample history the ring buffer keeps; longer requests are truncated
+BUFFER_SECONDS = 120
+
+
+@dataclass(frozen=True)
+class ProfilingConfig:
+    enabled: bool
+    sample_rate: float
+    slow_threshold_ms: int
+    interval_ms: int
+    output_dir: str
+    max_files: int
+
+
+_config: Optional[ProfilingConfig] = None
+_config_mtime: Optional[float] = None
+_config_checked = 0.0
+_config_lock = threading.Lock()
+
+
+def _base_config() -> ProfilingConfig:
+    return ProfilingConfig(
+        enabled=settings.profiling_enabled,
+        sample_rate=settings.profiling_sample_rate,
+        slow_threshold_ms=settings.profiling_slow_threshold_ms,
+        interval_ms=settings.profiling_interval_ms,
+        output_dir=settings.profiling_output_dir,
+        max_files=settings.profiling_max_files,
+    )
+
+
+def current_config() -> ProfilingConfig:
+    """
+    Settings, overridden by the JSON file at PROFILING_CONFIG_PATH if it exists.
+
+    The file is re-read whenever its mtime changes, so profiling can be turned
+    on or tuned on a running server, e.g.:
+        echo '{"enabled": true, "slow_threshold_ms": 2000}' > profiling.json
+    """
+    global _config, _config_mtime, _config_checked
+    now = time.monotonic()
+    if _config is not None and now - _config_checked < CONFIG_CHECK_SECONDS:
+        return _config
+
+    with _config_lock:
+        _config_checked = now
+        path = settings.profiling_config_path
+        try:
+            mtime = os.stat(path).st_mtime if path else None
+        except FileNotFoundError:
+            mtime = None
+
+        if _config is None or mtime != _config_mtime:
+            config = _base_config()
+            if mtime is not None:
+                try:
+                    with open(path) as f:
+                        overrides = json.load(f)
+                    known = {field.name for field in fields(ProfilingConfig)}
+                    config = replace(config, **{k: v for k, v in overrides.items() if k in known})
+                    logger.info(f"Loaded profiling overrides from {path}: {overrides}")
+                except (OSError, ValueError, TypeError) as e:
+                    logger.warning(f"Ignoring invalid profiling config {path}: {e}")
+            _config, _config_mtime = config, mtime
+    return _config
+
+
+class StackSampler:
+    """
+    Statistical profiler: a daemon thread that snapshots every thread's stack.
+
+    Samples go into a time-indexed ring buffer while at least one profiled
+    session is active; a session later extracts the samples inside its own
+    time window. All threads are sampled (the event loop plus to_thread
+    workers), so concurrent requests show up in each other's profiles.
+    """
+
+    def __init__(self):
+        self._samples: Deque[Tuple[float, Tuple[str, ...]]] = deque()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Frame labels by code object; formatting is the expensive part of a sample
+        self._labels: Dict[object, str] = {}
+
+    def acquire(self) -> None:
+        with self._lock:
+            self._active += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="stack-sampler", daemon=True
+                )
+                self._thread.start()
+            self._wake.set()
+
+    def release(self) -> None:
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                self._wake.clear()
+
+    def samples_between(self, start: float, end: float) -> Counter:
+        stacks: Counter = Counter()
+        for ts, sample in list(self._samples):
+            if start <= ts <= end:
+                stacks.update(sample)
+        return stacks
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = os.path.basename(code.co_filename)
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _take_sample(self) -> Tuple[str, ...]:
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(self._label(frame.f_code))
+                frame = frame.f_back
+            frames.append(names.get(thread_id, str(thread_id)))
+            frames.reverse()
+            stacks.append(";".join(frames))
+        return tuple(stacks)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            config = current_config()
+            interval = max(config.interval_ms, 1) / 1000
+            max_len = int(BUFFER_SECONDS / interval)
+
+            sample = self._take_sample()
+            now = time.monotonic()
+            self._samples.append((now, sample))
+            while len(self._samples) > max_len:
+                self._samples.popleft()
+            time.sleep(interval)
+
+
+_sampler = StackSampler()
+
+
+@dataclass
+class ProfileSession:
+    label: str
+    started: float
+    sampled: bool
+
+
+def begin(label: str) -> Optional[ProfileSession]:
+    """Start a profiled window, or return None if profiling is off."""
+    config = current_config()
+    if not config.enabled:
+        return None
+    sampled = config.sample_rate > 0 and random.random() < config.sample_rate
+    if not sampled and config.slow_threshold_ms <= 0:
+        return None
+    _sampler.acquire()
+    return ProfileSession(label=label, started=time.monotonic(), sampled=sampled)
+
+
+def end(session: Optional[ProfileSession], label: Optional[str] = None) -> Optional[str]:
+    """
+    Close the window and write a collapsed-stack file if it was sampled or slow.
+
+    Blocking file I/O; call via asyncio.to_thread from async code.
+
+    Returns:
+        Path of the written profile, or None
+    """
+    if session is None:
+        return None
+    finished = time.monotonic()
+    _sampler.release()
+
+    config = current_config()
+    elapsed_ms = (finished - session.started) * 1000
+    slow = config.slow_threshold_ms > 0 and elapsed_ms >= config.slow_threshold_ms
+    if not (session.sampled or slow):
+        return None
+
+    stacks = _sampler.samples_between(session.started, finished)
+    if not stacks:
+        return None
+    return _write_profile(config, label or session.label, elapsed_ms, stacks)
+
+
+def _write_profile(config: ProfilingConfig, label: str, elapsed_ms: float, stacks: Counter) -> str:
+    os.makedirs(config.output_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in label).strip("_")[:80]
+    path = os.path.join(config.output_dir, f"{stamp}-{safe_label}-{elapsed_ms:.0f}ms.collapsed")
+
+    # Brendan Gregg's collapsed format: "frame;frame;frame count", one stack per line.
+    # Feed to flamegraph.pl, speedscope or inferno to render.
+    with open(path, "w") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+    _rotate(config)
+    logger.info(f"Wrote profile {path} ({sum(stacks.values())} samples, {elapsed_ms:.0f}ms)")
+    return path
+
+
+def _rotate(config: ProfilingConfig) -> None:
+    try:
+        profiles = sorted(
+            entry.path
+            for entry in os.scandir(config.output_dir)
+            if entry.name.endswith(".collapsed")
+        )
+    except OSError:
+        return
+    # Timestamped names sort chronologically; drop the oldest
+    for path in profiles[: max(0, len(profiles) - config.max_files)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@asynccontextmanager
+async def profiled(label: str):
+    """Profile an async block, e.g. a background ingestion run."""
+    session = begin(label)
+    try:
+        yield
+    finally:
+        if session is not None:
+            await asyncio.to_thread(end, session)
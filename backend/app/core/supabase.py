@@ -0,0 +1,230 @@
+import logging
+import time
+from typing import Callable, Optional
+
+import httpx
+from fastapi import HTTPException, status
+from supabase import AsyncClient, Client, acreate_client, create_client
+from supabase.lib.client_options import AsyncClientOptions, SyncClientOptions
+
+from app.core.config import settings
+from app.core.metrics import SUPABASE_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# One pooled client of each kind per process, created in the app lifespan
+_sync_http: Optional[httpx.Client] = None
+_async_http: Optional[httpx.AsyncClient] = None
+_sync_client: Optional[Client] = None
+_async_client: Optional[AsyncClient] = None
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.supabase_pool_max_connections,
+        max_keepalive_connections=settings.supabase_pool_max_keepalive,
+        keepalive_expiry=settings.supabase_pool_keepalive_expiry,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.supabase_timeout_seconds, connect=5.0)
+
+
+def _target(url: httpx.URL) -> str:
+    # Low-cardinality label: the RPC or table name, never ids or object paths
+    parts = url.path.strip("/").split("/")
+    if parts[:2] == ["rest", "v1"] and len(parts) > 2:
+        return "/".join(parts[2:4]) if parts[2] == "rpc" else f"table/{parts[2]}"
+    return parts[0] if parts else ""
+
+
+def _on_request(request: httpx.Request) -> None:
+    request.extensions["started"] = time.perf_counter()
+
+
+def _on_response(response: httpx.Response) -> None:
+    request = response.request
+    started = request.extensions.get("started")
+    if started is not None:
+        SUPABASE_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            target=_target(request.url),
+            status=response.status_code,
+        )
+
+
+async def _on_request_async(request: httpx.Request) -> None:
+    _on_request(request)
+
+
+async def _on_response_async(response: httpx.Response) -> None:
+    _on_response(response)
+
+
+def _sync_http_client() -> httpx.Client:
+    global _sync_http
+    if _sync_http is None:
+        _sync_http = httpx.Client(
+            http2=settings.supabase_http2,
+            limits=_limits(),
+            timeout=_timeout(),
+            follow_redirects=True,
+            event_hooks={"request": [_on_request], "response": [_on_response]},
+        )
+    return _sync_http
+
+
+def _async_http_client() -> httpx.AsyncClient:
+    global _async_http
+    if _async_http is None:
+        _async_http = httpx.AsyncClient(
+            http2=settings.supabase_http2,
+            limits=_limits(),
+            timeout=_timeout(),
+            follow_redirects=True,
+            event_hooks={"request": [_on_request_async], "response": [_on_response_async]},
+        )
+    return _async_http
+
+
+def get_supabase() -> Client:
+    """
+    Shared service-role client backed by a keep-alive connection pool.
+
+    Created on first use if the lifespan has not run (scripts, CLIs).
+    """
+    global _sync_client
+    if _sync_client is None:
+        if not settings.supabase_url or not settings.supabase_service_role_key:
+            raise ValueError("Supabase configuration missing")
+        _sync_client = create_client(
+            settings.supabase_url,
+            settings.supabase_service_role_key,
+            options=SyncClientOptions(
+                httpx_client=_sync_http_client(),
+                auto_refresh_token=False,
+                persist_session=False,
+            ),
+        )
+    return _sync_client
+
+
+async def get_async_supabase() -> AsyncClient:
+    """Async counterpart of get_supabase(), sharing one async connection pool."""
+    global _async_client
+    if _async_client is None:
+        if not settings.supabase_url or not settings.supabase_service_role_key:
+            raise ValueError("Supabase configuration missing")
+        _async_client = await acreate_client(
+            settings.supabase_url,
+            settings.supabase_service_role_key,
+            options=AsyncClientOptions(
+                httpx_client=_async_http_client(),
+                auto_refresh_token=False,
+                persist_session=False,
+            ),
+        )
+    return _async_client
+
+
+def create_user_client(token: str) -> Client:
+    """
+    Client that acts as the user (anon key + their JWT) for RLS.
+
+    Each call gets its own client because the session is per user, but the
+    underlying connection pool is shared.
+    """
+    if not settings.supabase_url or not settings.supabase_anon_key:
+        raise ValueError("Supabase configuration missing")
+    client = create_client(
+        settings.supabase_url,
+        settings.supabase_anon_key,
+        options=SyncClientOptions(
+            httpx_client=_sync_http_client(),
+            auto_refresh_token=False,
+            persist_session=False,
+        ),
+    )
+    client.postgrest.auth(token)
+    return client
+
+
+async def download_object(
+    bucket: str,
+    path: str,
+    on_progress: Optional[Callable[[int, Optional[int]], None]] = None,
+) -> bytes:
+    """
+    Stream a storage object over the shared async pool.
+
+    Unlike storage.download(), this doesn't block the event loop and reports
+    progress as bytes arrive.
+
+    Args:
+        bucket: Storage bucket name
+        path: Object path inside the bucket
+        on_progress: Called with (bytes_downloaded, bytes_total or None)
+    """
+    if not settings.supabase_url or not settings.supabase_service_role_key:
+        raise ValueError("Supabase configuration missing")
+    key = settings.supabase_service_role_key
+    url = f"{settings.supabase_url.rstrip('/')}/storage/v1/object/{bucket}/{path}"
+
+    async with _async_http_client().stream(
+        "GET", url, headers={"Authorization": f"Bearer {key}", "apikey": key}
+    ) as response:
+        response.raise_for_status()
+        length = response.headers.get("content-length")
+        total = int(length) if length else None
+        parts = []
+        received = 0
+        async for data in response.aiter_bytes():
+            parts.append(data)
+            received += len(data)
+            if on_progress:
+                on_progress(received, total)
+    return b"".join(parts)
+
+
+async def init_supabase() -> None:
+    """Open both pools at startup so the first request doesn't pay for it."""
+    get_supabase()
+    await get_async_supabase()
+    logger.info(
+        f"Supabase clients ready (http2={settings.supabase_http2}, "
+        f"max_connections={settings.supabase_pool_max_connections})"
+    )
+
+
+async def close_supabase() -> None:
+    global _sync_http, _async_http, _sync_client, _async_client
+    if _async_http is not None:
+        await _async_http.aclose()
+    if _sync_http is not None:
+        _sync_http.close()
+    _sync_http = _async_http = None
+    _sync_client = _async_client = None
+
+
+def supabase_client() -> Client:
+    """FastAPI dependency for the shared sync client."""
+    try:
+        return get_supabase()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Database configuration missing",
+        )
+
+
+async def async_supabase_client() -> AsyncClient:
+    """FastAPI dependency for the shared async client."""
+    try:
+        return await get_async_supabase()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Database configuration missing",
+        )
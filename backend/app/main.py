@@ -1,10 +1,28 @@
+import asyncio
 import logging
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
-from app.routers import threads, chat, documents
+from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE, REGISTRY
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.core.supabase import close_supabase, init_supabase
+from app.middleware.auth import require_metrics_token, start_jwks_refresh, stop_jwks_refresh
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.routers import threads, chat, documents, evaluations
+from app.services.cache import answer_cache_stats
+from app.services.retrieval.rerank import get_reranker
+from app.services.ingestion import (
+    start_ingestion_worker,
+    start_reaper,
+    stop_ingestion_worker,
+    stop_reaper,
+)
 
 load_dotenv()
 
@@ -14,7 +32,29 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-app = FastAPI(title="RAG App API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # A missing reranker dependency or model fails the deploy instead of every query
+    if settings.rerank_enabled:
+        await asyncio.to_thread(get_reranker)
+    # Pooled keep-alive clients shared by every request and service
+    await init_supabase()
+    # Signing keys are fetched up front so no request waits on the JWKS endpoint
+    await start_jwks_refresh()
+    # Removes chunks and files of deleted documents off the request path
+    await start_reaper()
+    # Claims queued ingestion jobs; every replica runs one
+    await start_ingestion_worker()
+    yield
+    # Hands running jobs back to the queue before the pool closes
+    await stop_ingestion_worker()
+    await stop_reaper()
+    await stop_jwks_refresh()
+    await close_supabase()
+
+
+app = FastAPI(title="RAG App API", version="1.0.0", lifespan=lifespan)
 
 # CORS configuration - add your frontend URLs here
 cors_origins = [
@@ -32,13 +72,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the browser read pagination cursors on list endpoints
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Added last so they wrap everything, including CORS handling
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(threads.router)
 app.include_router(chat.router)
 app.include_router(documents.router)
+app.include_router(evaluations.router)
 
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/health/answer-cache", dependencies=[Depends(require_metrics_token)])
+async def answer_cache_health():
+    """Hit rate and latency saved by the answer cache on this worker."""
+    return answer_cache_stats()
+
+
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    """Prometheus scrape endpoint for this worker."""
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -1,19 +1,38 @@
+import asyncio
+import hashlib
+import hmac
+import logging
 import os
-from typing import Optional
+import time
+from typing import Dict, Optional, Tuple
+from cachetools import TLRUCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
-from jwt import PyJWKClient
+from jwt import PyJWK, PyJWKClient
 from pydantic import BaseModel
-from supabase import create_client, Client
+from supabase import Client
 import ssl
 import certifi
 
+from app.core.config import settings
+from app.core.metrics import AUTH_VERIFY_SECONDS
+from app.core.supabase import create_user_client
+
+logger = logging.getLogger(__name__)
+
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # Cache the JWKS client
 _jwks_client: Optional[PyJWKClient] = None
 
+# Signing keys by kid, replaced wholesale on every JWKS refresh
+_signing_keys: Dict[str, PyJWK] = {}
+_jwks_fetched_at = 0.0
+_jwks_lock: Optional[asyncio.Lock] = None
+_jwks_refresh_task: Optional[asyncio.Task] = None
+
 
 def get_jwks_client() -> PyJWKClient:
     """Get or create cached JWKS client for Supabase."""
@@ -33,46 +52,134 @@ def get_jwks_client() -> PyJWKClient:
     return _jwks_client
 
 
+async def refresh_jwks(force: bool = True) -> None:
+    """
+    Fetch the JWKS off the event loop and swap in the new keys.
+
+    Concurrent callers share one fetch. Unless forced, a fetch is skipped if
+    the keys were refreshed within auth_jwks_min_refresh_seconds, so tokens
+    with unknown kids cannot make us hammer the JWKS endpoint.
+    """
+    global _signing_keys, _jwks_fetched_at, _jwks_lock
+    if _jwks_lock is None:
+        _jwks_lock = asyncio.Lock()
+
+    requested_at = time.monotonic()
+    async with _jwks_lock:
+        if _jwks_fetched_at >= requested_at:
+            # Someone else refreshed while we waited for the lock
+            return
+        if not force and requested_at - _jwks_fetched_at < settings.auth_jwks_min_refresh_seconds:
+            return
+        jwks_client = get_jwks_client()
+        keys = await asyncio.to_thread(jwks_client.get_signing_keys, True)
+        _signing_keys = {key.key_id: key for key in keys}
+        _jwks_fetched_at = time.monotonic()
+        logger.info(f"Loaded {len(_signing_keys)} JWKS signing keys")
+
+
+async def _refresh_jwks_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.auth_jwks_refresh_seconds)
+        try:
+            await refresh_jwks()
+        except Exception as e:
+            # Keep serving with the keys we have
+            logger.warning(f"JWKS refresh failed: {e}")
+
+
+async def start_jwks_refresh() -> None:
+    """Prefetch signing keys at startup and keep them fresh in the background."""
+    global _jwks_refresh_task
+    try:
+        await refresh_jwks()
+    except Exception as e:
+        logger.warning(f"JWKS prefetch failed, will fetch on first request: {e}")
+    _jwks_refresh_task = asyncio.create_task(_refresh_jwks_periodically())
+
+
+async def stop_jwks_refresh() -> None:
+    global _jwks_refresh_task
+    if _jwks_refresh_task is not None:
+        _jwks_refresh_task.cancel()
+        try:
+            await _jwks_refresh_task
+        except asyncio.CancelledError:
+            pass
+        _jwks_refresh_task = None
+
+
+async def get_signing_key(token: str) -> PyJWK:
+    """Look up the token's signing key, refreshing the JWKS once on a miss (key rotation)."""
+    kid = jwt.get_unverified_header(token).get("kid")
+    key = _signing_keys.get(kid)
+    if key is None:
+        await refresh_jwks(force=not _signing_keys)
+        key = _signing_keys.get(kid)
+    if key is None:
+        raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+    return key
+
+
 class User(BaseModel):
     id: str
     email: Optional[str] = None
 
 
-def get_supabase_client() -> Client:
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    if not url or not key:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Supabase configuration missing",
-        )
-    return create_client(url, key)
+def _token_expiry(_key: str, value: Tuple["User", float], _now: float) -> float:
+    return value[1]
+
+
+# Verified tokens by sha256, each evicted at its own `exp`
+_verified_tokens: TLRUCache = TLRUCache(
+    maxsize=settings.auth_token_cache_size, ttu=_token_expiry, timer=time.time
+)
 
 
 def get_user_supabase_client(token: str) -> Client:
     """Create a Supabase client with user's JWT for RLS."""
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_ANON_KEY")
-    if not url or not key:
+    try:
+        return create_user_client(token)
+    except ValueError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Supabase configuration missing",
         )
-    client = create_client(url, key)
-    client.auth.set_session(token, token)
-    return client
+
+
+async def require_metrics_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+) -> None:
+    """Guard operational endpoints with settings.metrics_token; hidden entirely when it is unset."""
+    if not settings.metrics_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(
+        credentials.credentials.encode(), settings.metrics_token.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ) -> User:
     """Verify JWT and extract user information."""
+    started = time.perf_counter()
     token = credentials.credentials
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+
+    cached = _verified_tokens.get(cache_key)
+    if cached is not None:
+        AUTH_VERIFY_SECONDS.observe(time.perf_counter() - started, result="cache_hit")
+        return cached[0]
 
+    result = "rejected"
     try:
-        # Get signing key from Supabase JWKS endpoint
-        jwks_client = get_jwks_client()
-        signing_key = jwks_client.get_signing_key_from_jwt(token)
+        # Get signing key from the prefetched Supabase JWKS
+        signing_key = await get_signing_key(token)
 
         # Decode and verify the token
         payload = jwt.decode(
@@ -91,7 +198,11 @@ async def get_current_user(
                 detail="Invalid token: missing user ID",
             )
 
-        return User(id=user_id, email=email)
+        user = User(id=user_id, email=email)
+        if payload.get("exp"):
+            _verified_tokens[cache_key] = (user, float(payload["exp"]))
+        result = "verified"
+        return user
 
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -108,3 +219,5 @@ async def get_current_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Token verification failed: {str(e)}",
         )
+    finally:
+        AUTH_VERIFY_SECONDS.observe(time.perf_counter() - started, result=result)
@@ -0,0 +1,42 @@
+import time
+
+from app.core.metrics import HTTP_REQUEST_SECONDS
+
+
+class MetricsMiddleware:
+    """
+    Records request latency labelled by route template (e.g. /api/threads/{thread_id}).
+
+    Plain ASGI rather than BaseHTTPMiddleware so streamed responses are not
+    buffered, and the timing covers the whole SSE body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners can't blow up cardinality
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=path,
+                status=status_code,
+            )
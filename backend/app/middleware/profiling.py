@@ -0,0 +1,31 @@
+import asyncio
+
+from app.core import profiling
+
+
+class ProfilingMiddleware:
+    """
+    Captures a stack-sample profile for a fraction of requests, or any request
+    slower than the threshold (see app.core.profiling). Does nothing while
+    profiling is disabled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        session = profiling.begin(scope["path"])
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            label = f"{scope['method']} {getattr(route, 'path', None) or scope['path']}"
+            await asyncio.to_thread(profiling.end, session, label)
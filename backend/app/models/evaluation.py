@@ -0,0 +1,84 @@
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, model_validator
+
+from app.models.retrieval import RetrievalFilters
+
+
+class EvaluationCase(BaseModel):
+    """A question and what retrieval should find for it."""
+
+    question: str = Field(min_length=1)
+    # Relevance is judged on chunks when given, otherwise on documents
+    expected_chunk_ids: Optional[List[str]] = None
+    expected_document_ids: Optional[List[str]] = None
+    # With generation: terms the answer should mention (case-insensitive)
+    expected_answer_terms: Optional[List[str]] = None
+
+    @model_validator(mode="after")
+    def _has_expectation(self):
+        if not self.expected_chunk_ids and not self.expected_document_ids:
+            raise ValueError("Each case needs expected_chunk_ids or expected_document_ids")
+        return self
+
+
+class EvaluationRequest(BaseModel):
+    cases: List[EvaluationCase] = Field(min_length=1)
+    # Every combination is scored; retrieval runs once at the largest count
+    match_counts: List[int] = Field(default=[5], min_length=1)
+    similarity_thresholds: List[float] = Field(default=[0.3], min_length=1)
+    filters: Optional[RetrievalFilters] = None
+    # Also answer each question, using the first match count and threshold
+    generate: bool = False
+    concurrency: int = Field(default=4, ge=1)
+    include_cases: bool = False
+
+    @model_validator(mode="after")
+    def _valid_sweep(self):
+        if any(k < 1 for k in self.match_counts):
+            raise ValueError("match_counts must be positive")
+        if any(not -1 <= t <= 1 for t in self.similarity_thresholds):
+            raise ValueError("similarity_thresholds must be between -1 and 1")
+        return self
+
+
+class LatencySummary(BaseModel):
+    count: int
+    mean_ms: float
+    p50_ms: float
+    p90_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+class ConfigResult(BaseModel):
+    match_count: int
+    similarity_threshold: float
+    recall_at_k: float
+    hit_rate: float
+    mrr: float
+    mean_results: float
+
+
+class CaseResult(BaseModel):
+    """Per-question detail for the first match count and threshold."""
+
+    question: str
+    retrieved_chunk_ids: List[str]
+    retrieved_document_ids: List[str]
+    first_relevant_rank: Optional[int] = None
+    recall: float
+    answer: Optional[str] = None
+    answer_term_coverage: Optional[float] = None
+    error: Optional[str] = None
+
+
+class EvaluationReport(BaseModel):
+    cases: int
+    failed_cases: int
+    rerank_enabled: bool
+    configs: List[ConfigResult]
+    # Per stage: embed (per batch), match, rerank, generate_first_token, generate, total
+    latency: Dict[str, LatencySummary]
+    # Mean share of expected_answer_terms found in the answers
+    answer_term_coverage: Optional[float] = None
+    case_results: Optional[List[CaseResult]] = None
@@ -0,0 +1,28 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from pydantic import BaseModel
+
+
+class RetrievalFilters(BaseModel):
+    """Restrict retrieval to a subset of the user's chunks. All filters are ANDed."""
+
+    document_ids: Optional[List[UUID]] = None
+    filenames: Optional[List[str]] = None
+    # Compared against when the chunk was indexed
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    # Chunk metadata must contain these key/value pairs (JSONB @>)
+    metadata: Optional[Dict[str, Any]] = None
+
+    def to_rpc_params(self) -> dict:
+        """Map filters onto the match_chunks function arguments."""
+        return {
+            "filter_document_ids": (
+                [str(d) for d in self.document_ids] if self.document_ids is not None else None
+            ),
+            "filter_filenames": self.filenames,
+            "filter_created_after": self.created_after.isoformat() if self.created_after else None,
+            "filter_created_before": self.created_before.isoformat() if self.created_before else None,
+            "filter_metadata": self.metadata,
+        }
@@ -1,5 +1,6 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+from uuid import UUID
 from pydantic import BaseModel
 
 
@@ -47,3 +48,7 @@ class Message(MessageBase):
 
     class Config:
         from_attributes = True
+
+
+class ThreadDocumentSet(BaseModel):
+    document_ids: List[UUID]
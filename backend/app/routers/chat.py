@@ -1,133 +1,373 @@
-import os
+import asyncio
 import logging
+import time
+from contextlib import aclosing
+
+import anyio
 from fastapi import APIRouter, Depends, HTTPException, status
 from sse_starlette.sse import EventSourceResponse
+from typing import List, Optional, Tuple
 from pydantic import BaseModel
-from supabase import create_client
+from starlette.background import BackgroundTask
+from supabase import AsyncClient
 
+from app.core.config import settings
+from app.core.metrics import CHAT_FIRST_FRAME_SECONDS, CONTEXT_BUILD_SECONDS
+from app.core.supabase import async_supabase_client
 from app.middleware.auth import get_current_user, User
-from app.services.llm import stream_chat, ChatMessage
-from app.services.retrieval import retrieve_context
-from app.services.retrieval.search import format_context_for_prompt
+from app.models.retrieval import RetrievalFilters
+from app.services.admission import (
+    AdmissionRejected,
+    Priority,
+    embedding_admission,
+    llm_admission,
+    to_http_exception,
+)
+from app.services.cache import (
+    PrefetchResult,
+    lookup_answer,
+    normalize_query,
+    record_replay,
+    record_scope_changed,
+    start_prefetch,
+    store_answer,
+    take_prefetched,
+)
+from app.services.ingestion.embeddings import generate_embedding_async
+from app.services.llm import StreamInfo, expected_model, stream_chat_async
+from app.services.llm.streaming import coalesce_deltas, encode_sse_data, replay_text
+from app.services.llm.history import fit_history, update_summary
+from app.services.retrieval import retrieve_context_async, pack_chunks
+from app.services.retrieval.search import RetrievedChunk, format_context_for_prompt
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/threads", tags=["chat"])
 
+# Strong references to fire-and-forget tasks so they are not garbage collected
+_background_tasks = set()
+
+
+# Retrieval settings for chat turns, shared with the prefetch
+CHAT_MATCH_COUNT = 5
+CHAT_SIMILARITY_THRESHOLD = 0.3
+
 
 class ChatRequest(BaseModel):
     content: str
+    filters: Optional[RetrievalFilters] = None
 
+    def filters_key(self) -> str:
+        return self.filters.model_dump_json() if self.filters else ""
 
-def get_supabase_client():
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    if not url or not key:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database configuration missing",
+
+async def embed_query(query: str, user_id: str) -> Optional[List[float]]:
+    """Embed the user's message. Returns None if embedding fails or is shed."""
+    try:
+        async with embedding_admission.slot(user_id, Priority.INTERACTIVE):
+            return await generate_embedding_async(query)
+    except AdmissionRejected as e:
+        logger.warning(f"Query embedding shed, answering without context: {e}")
+        return None
+    except Exception as e:
+        logger.error(f"Query embedding failed: {e}", exc_info=True)
+        return None
+
+
+async def retrieve_chunks(
+    client,
+    request: ChatRequest,
+    user_id: str,
+    scope_document_ids: Optional[List[str]],
+    query_embedding: Optional[List[float]],
+) -> List[RetrievedChunk]:
+    """Retrieve chunks for the prompt. Returns an empty list if retrieval fails."""
+    if not query_embedding:
+        return []
+    try:
+        logger.info(f"Retrieving context for user_id={user_id}, query={request.content[:50]}...")
+        chunks = await retrieve_context_async(
+            query=request.content,
+            user_id=user_id,
+            match_count=CHAT_MATCH_COUNT,
+            similarity_threshold=CHAT_SIMILARITY_THRESHOLD,
+            filters=request.filters,
+            scope_document_ids=scope_document_ids,
+            client=client,
+            query_embedding=query_embedding,
         )
-    return create_client(url, key)
+        logger.info(f"Retrieved {len(chunks)} chunks")
+        return chunks
+    except Exception as e:
+        logger.error(f"Retrieval failed: {e}", exc_info=True)
+        # If retrieval fails, continue without context
+        return []
+
+
+async def prefetch_retrieval(
+    client, thread_id: str, user_id: str, request: ChatRequest
+) -> Optional[PrefetchResult]:
+    """Retrieve for a draft exactly as the chat turn would. None if the thread is not the user's."""
+    thread_response, documents_response = await asyncio.gather(
+        client.table("threads").select("id").eq("id", thread_id).eq("user_id", user_id).execute(),
+        client.table("thread_documents").select("document_id").eq("thread_id", thread_id).execute(),
+    )
+    if not thread_response.data:
+        return None
+    scope_document_ids = [row["document_id"] for row in documents_response.data] or None
+
+    async with embedding_admission.slot(user_id, Priority.BACKGROUND):
+        query_embedding = await generate_embedding_async(request.content)
+    chunks = await retrieve_context_async(
+        query=request.content,
+        user_id=user_id,
+        match_count=CHAT_MATCH_COUNT,
+        similarity_threshold=CHAT_SIMILARITY_THRESHOLD,
+        filters=request.filters,
+        scope_document_ids=scope_document_ids,
+        client=client,
+        query_embedding=query_embedding,
+    )
+    return PrefetchResult(query_embedding, chunks, scope_document_ids)
+
+
+@router.post("/{thread_id}/prefetch", status_code=status.HTTP_202_ACCEPTED)
+async def prefetch(
+    thread_id: str,
+    request: ChatRequest,
+    user: User = Depends(get_current_user),
+    client: AsyncClient = Depends(async_supabase_client),
+):
+    """
+    Start retrieval for a message the user is still typing, so that sending
+    it can skip the query embedding and vector search. Call it debounced;
+    it returns at once and the result is kept briefly on this worker.
+    """
+    if not settings.prefetch_enabled or len(normalize_query(request.content)) < settings.prefetch_min_chars:
+        return {"prefetching": False}
+    started = start_prefetch(
+        user.id,
+        thread_id,
+        request.content,
+        request.filters_key(),
+        lambda: prefetch_retrieval(client, thread_id, user.id, request),
+    )
+    return {"prefetching": started}
+
+
+async def prepare_query(
+    request: ChatRequest, user_id: str, thread_id: str
+) -> Tuple[Optional[List[float]], Optional[PrefetchResult]]:
+    """
+    Pick up retrieval prefetched for this message, or embed it.
+
+    Returns:
+        (query embedding or None, prefetched result or None)
+    """
+    hit = None
+    if settings.prefetch_enabled:
+        hit = await take_prefetched(user_id, thread_id, request.content, request.filters_key())
+    if hit is None:
+        return await embed_query(request.content, user_id), None
+    if hit.exact:
+        return hit.result.query_embedding, hit.result
+    # A near-identical draft's chunks are fine for the prompt, but the
+    # answer cache is keyed on the question actually asked
+    if settings.answer_cache_enabled:
+        return await embed_query(request.content, user_id), hit.result
+    return None, hit.result
 
 
 @router.post("/{thread_id}/chat")
 async def chat(
-    thread_id: str, request: ChatRequest, user: User = Depends(get_current_user)
+    thread_id: str,
+    request: ChatRequest,
+    user: User = Depends(get_current_user),
+    client: AsyncClient = Depends(async_supabase_client),
 ):
     """
     Send a message and stream the AI response via SSE.
     Uses RAG to retrieve relevant context from user's documents.
     """
-    client = get_supabase_client()
-
-    # Verify thread belongs to user
-    thread_response = (
-        client.table("threads")
-        .select("*")
-        .eq("id", thread_id)
-        .eq("user_id", user.id)
-        .execute()
+    received = time.perf_counter()
+
+    # Reject before touching the database so a 429 has no side effects
+    try:
+        ticket = await llm_admission.acquire(user.id, Priority.INTERACTIVE)
+    except AdmissionRejected as e:
+        raise to_http_exception(e)
+
+    try:
+        return await _start_chat(client, thread_id, request, user, ticket, received)
+    except BaseException:
+        ticket.release()
+        raise
+
+
+async def _start_chat(
+    client: AsyncClient,
+    thread_id: str,
+    request: ChatRequest,
+    user: User,
+    ticket,
+    received: float,
+):
+    # One round trip verifies ownership, saves the user message and returns the
+    # bounded history and attached documents; the query embeds meanwhile
+    # (or a prefetch for it is picked up)
+    turn_response, (query_embedding, prefetched) = await asyncio.gather(
+        client.rpc(
+            "begin_chat_turn",
+            {
+                "p_thread_id": thread_id,
+                "p_user_id": user.id,
+                "p_content": request.content,
+                "p_history_limit": settings.history_fetch_limit,
+            },
+        ).execute(),
+        prepare_query(request, user.id, thread_id),
     )
-    if not thread_response.data:
+    turn = turn_response.data
+    if not turn:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Thread not found"
         )
 
-    # Save user message
-    client.table("messages").insert(
-        {
-            "thread_id": thread_id,
-            "user_id": user.id,
-            "role": "user",
-            "content": request.content,
-        }
-    ).execute()
-
-    # Get conversation history
-    messages_response = (
-        client.table("messages")
-        .select("role, content")
-        .eq("thread_id", thread_id)
-        .order("created_at", desc=False)
-        .execute()
-    )
-    messages = messages_response.data
+    thread_metadata = turn["thread"]["metadata"] or {}
 
-    # Convert to ChatMessage objects
-    chat_messages = [
-        ChatMessage(role=m["role"], content=m["content"])
-        for m in messages
-    ]
+    # Documents attached to this thread narrow the search space
+    scope_document_ids = turn["document_ids"] or None
 
-    # Retrieve relevant context from user's documents
-    context = None
-    try:
-        logger.info(f"Retrieving context for user_id={user.id}, query={request.content[:50]}...")
-        chunks = retrieve_context(
-            query=request.content,
-            user_id=user.id,
-            match_count=5,
-            similarity_threshold=0.3,
+    if prefetched and set(prefetched.scope_document_ids or []) != set(scope_document_ids or []):
+        # Documents were attached or detached since the prefetch
+        record_scope_changed()
+        prefetched = None
+        if query_embedding is None:
+            query_embedding = await embed_query(request.content, user.id)
+
+    if prefetched:
+        chunks = prefetched.chunks
+        logger.info(f"Using {len(chunks)} prefetched chunks")
+    else:
+        chunks = await retrieve_chunks(
+            client, request, user.id, scope_document_ids, query_embedding
         )
-        logger.info(f"Retrieved {len(chunks)} chunks")
-        context = format_context_for_prompt(chunks)
-        logger.info(f"Context length: {len(context) if context else 0} chars")
-    except Exception as e:
-        logger.error(f"Retrieval failed: {e}", exc_info=True)
-        # If retrieval fails, continue without context
-        pass
+    with CONTEXT_BUILD_SECONDS.time():
+        passages = pack_chunks(chunks)
+        context = format_context_for_prompt(passages)
+    logger.info(f"Packed into {len(passages)} passages")
+    logger.info(f"Context length: {len(context) if context else 0} chars")
+
+    # Keep recent turns within the token budget; older turns live in the summary
+    history = fit_history(
+        turn["history"],
+        thread_metadata,
+        truncated=turn["history_truncated"],
+    )
+    is_first_message = len(turn["history"]) == 1 and not history.summary
+
+    # Cached answers ignore conversation history, so only standalone questions use them
+    cacheable = settings.answer_cache_enabled and is_first_message
+    cached = None
+    if cacheable:
+        cached = await lookup_answer(client, user.id, expected_model(), query_embedding, chunks)
+
+    async def save_assistant_message(
+        content: str, metadata: Optional[dict] = None, title: Optional[str] = None
+    ):
+        await client.rpc(
+            "finish_chat_turn",
+            {
+                "p_thread_id": thread_id,
+                "p_user_id": user.id,
+                "p_content": content,
+                "p_metadata": metadata or {},
+                "p_title": title,
+            },
+        ).execute()
 
     async def generate():
-        full_response = ""
+        parts = []
+        saved = False
+        # With the router on, the answer can come from any backend's model
+        answered_by = StreamInfo()
         logger.info(f"Starting stream_chat with context={context is not None}, context_len={len(context) if context else 0}")
 
         try:
-            for chunk in stream_chat(messages=chat_messages, context=context):
-                full_response += chunk
-                # Encode newlines for SSE transmission (SSE uses \n as delimiter)
-                encoded_chunk = chunk.replace("\n", "\\n").replace("\r", "\\r")
-                yield {"event": "message", "data": encoded_chunk}
-
-            # Save assistant message
-            client.table("messages").insert(
-                {
-                    "thread_id": thread_id,
-                    "user_id": user.id,
-                    "role": "assistant",
-                    "content": full_response,
-                }
-            ).execute()
-
-            # Update thread title if it's the first message
-            if len(messages) == 1:
+            started = time.perf_counter()
+            if cached:
+                stream = replay_text(cached.answer)
+            else:
+                stream = coalesce_deltas(
+                    stream_chat_async(
+                        messages=history.messages,
+                        context=context,
+                        summary=history.summary,
+                        info=answered_by,
+                    )
+                )
+            # aclosing() guarantees the upstream stream is closed as soon as this
+            # generator stops, including when sse-starlette cancels it on disconnect
+            async with aclosing(stream):
+                async for frame in stream:
+                    if not parts:
+                        CHAT_FIRST_FRAME_SECONDS.observe(
+                            time.perf_counter() - received,
+                            source="cache" if cached else "llm",
+                        )
+                    parts.append(frame)
+                    yield {"event": "message", "data": encode_sse_data(frame)}
+
+            full_response = "".join(parts)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            # Save assistant message, and set the thread title if it's the first message
+            title = None
+            if is_first_message:
                 title = request.content[:50] + ("..." if len(request.content) > 50 else "")
-                client.table("threads").update({"title": title}).eq(
-                    "id", thread_id
-                ).execute()
+            metadata = {"answer_cache_id": cached.id} if cached else None
+            await save_assistant_message(full_response, metadata, title=title)
+            saved = True
+
+            if cached:
+                record_replay(cached, elapsed_ms)
+            elif cacheable and answered_by.model:
+                await store_answer(
+                    client,
+                    user.id,
+                    answered_by.model,
+                    request.content,
+                    query_embedding,
+                    chunks,
+                    full_response,
+                    int(elapsed_ms),
+                )
+
+            # Fold turns that left the window into the summary off the request path
+            if history.needs_summary_update:
+                task = asyncio.create_task(
+                    update_summary(client, thread_id, thread_metadata, history)
+                )
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
 
             yield {"event": "done", "data": ""}
 
+        except asyncio.CancelledError:
+            logger.info(f"Client disconnected from thread {thread_id} after {len(parts)} frames")
+            raise
         except Exception as e:
             yield {"event": "error", "data": str(e)}
+        finally:
+            ticket.release()
+            if not saved and parts:
+                # Keep what the user already saw; shielded because the surrounding
+                # task may be cancelled
+                with anyio.CancelScope(shield=True):
+                    try:
+                        await save_assistant_message("".join(parts), {"partial": True})
+                    except Exception as e:
+                        logger.error(f"Failed to save partial response: {e}", exc_info=True)
 
-    return EventSourceResponse(generate())
+    # The background task covers a client that leaves before generate() starts
+    return EventSourceResponse(generate(), background=BackgroundTask(ticket.release))
@@ -2,15 +2,29 @@ import os
 import uuid
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from supabase import create_client
-
+from supabase import Client
+
+from app.core.pagination import (
+    NEXT_CURSOR_HEADER,
+    Page,
+    apply_keyset,
+    finish_page,
+    page_params,
+)
+from app.core.supabase import supabase_client
 from app.middleware.auth import get_current_user, User
+from app.services.ingestion import JobAlreadyQueued, enqueue_document, wake_reaper
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
 ALLOWED_EXTENSIONS = {".txt", ".md", ".pdf", ".json", ".csv"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_BULK_DELETE = 500
+
+# Columns DocumentResponse needs
+DOCUMENT_COLUMNS = "id, filename, status, error_message, chunk_count, created_at, progress"
 
 
 class DocumentResponse(BaseModel):
@@ -20,17 +34,42 @@ class DocumentResponse(BaseModel):
     error_message: Optional[str] = None
     chunk_count: int
     created_at: str
+    # Stage, counters, ETA and stage timings while processing (see ProgressReporter)
+    progress: Optional[dict] = None
 
 
-def get_supabase_client():
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    if not url or not key:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database configuration missing",
-        )
-    return create_client(url, key)
+class BulkDeleteRequest(BaseModel):
+    document_ids: List[str]
+
+
+class BulkDeleteResponse(BaseModel):
+    deleted: List[str]
+    not_found: List[str]
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+        return True
+    except ValueError:
+        return False
+
+
+def tombstone_documents(client: Client, user: User, document_ids: List[str]) -> List[str]:
+    """
+    Tombstone the user's documents and wake the reaper.
+
+    Returns:
+        IDs that were tombstoned; missing, foreign and already deleted ids are skipped
+    """
+    response = client.rpc(
+        "tombstone_documents",
+        {"p_user_id": user.id, "p_document_ids": document_ids},
+    ).execute()
+    deleted = [str(doc_id) for doc_id in response.data or []]
+    if deleted:
+        wake_reaper()
+    return deleted
 
 
 def validate_file(file: UploadFile) -> None:
@@ -53,12 +92,11 @@ def validate_file(file: UploadFile) -> None:
 async def upload_document(
     file: UploadFile = File(...),
     user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
 ):
     """Upload a document for processing."""
     validate_file(file)
 
-    client = get_supabase_client()
-
     # Read file content
     content = await file.read()
     if len(content) > MAX_FILE_SIZE:
@@ -112,45 +150,49 @@ async def upload_document(
         error_message=doc.get("error_message"),
         chunk_count=doc.get("chunk_count", 0),
         created_at=doc["created_at"],
+        progress=doc.get("progress"),
     )
 
 
 @router.get("", response_model=List[DocumentResponse])
-async def list_documents(user: User = Depends(get_current_user)):
-    """List all documents for the current user."""
-    client = get_supabase_client()
+async def list_documents(
+    page: Page = Depends(page_params),
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
+):
+    """
+    List the current user's documents, newest first.
 
-    response = (
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
+    query = (
         client.table("documents")
-        .select("*")
+        .select(DOCUMENT_COLUMNS)
         .eq("user_id", user.id)
-        .order("created_at", desc=True)
-        .execute()
+        .is_("deleted_at", "null")
     )
+    response = apply_keyset(query, page, "created_at").execute()
+    rows, next_cursor = finish_page(response.data, page, "created_at")
 
-    return [
-        DocumentResponse(
-            id=doc["id"],
-            filename=doc["filename"],
-            status=doc["status"],
-            error_message=doc.get("error_message"),
-            chunk_count=doc.get("chunk_count", 0),
-            created_at=doc["created_at"],
-        )
-        for doc in response.data
-    ]
+    for doc in rows:
+        doc["chunk_count"] = doc["chunk_count"] or 0
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return JSONResponse(rows, headers=headers)
 
 
 @router.get("/{document_id}", response_model=DocumentResponse)
-async def get_document(document_id: str, user: User = Depends(get_current_user)):
+async def get_document(
+    document_id: str,
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
+):
     """Get a specific document."""
-    client = get_supabase_client()
-
     response = (
         client.table("documents")
         .select("*")
         .eq("id", document_id)
         .eq("user_id", user.id)
+        .is_("deleted_at", "null")
         .execute()
     )
 
@@ -168,86 +210,83 @@ async def get_document(document_id: str, user: User = Depends(get_current_user))
         error_message=doc.get("error_message"),
         chunk_count=doc.get("chunk_count", 0),
         created_at=doc["created_at"],
+        progress=doc.get("progress"),
     )
 
 
 @router.delete("/{document_id}")
-async def delete_document(document_id: str, user: User = Depends(get_current_user)):
-    """Delete a document and its chunks."""
-    client = get_supabase_client()
-
-    # Get document to verify ownership and get storage path
-    response = (
-        client.table("documents")
-        .select("*")
-        .eq("id", document_id)
-        .eq("user_id", user.id)
-        .execute()
-    )
-
-    if not response.data:
+async def delete_document(
+    document_id: str,
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
+):
+    """
+    Delete a document.
+
+    The document disappears from listings and retrieval immediately; its
+    chunks and file are removed by the background reaper.
+    """
+    deleted = tombstone_documents(client, user, [document_id])
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Document not found",
         )
 
-    doc = response.data[0]
-
-    # Delete from storage
-    try:
-        client.storage.from_("documents").remove([doc["storage_path"]])
-    except Exception:
-        pass  # Continue even if storage deletion fails
-
-    # Delete document (chunks cascade delete automatically)
-    client.table("documents").delete().eq("id", document_id).execute()
-
     return {"message": "Document deleted"}
 
 
-@router.post("/{document_id}/process")
-async def process_document(document_id: str, user: User = Depends(get_current_user)):
-    """Trigger processing for a document."""
-    from app.services.ingestion import process_document as ingest_document
-
-    client = get_supabase_client()
+@router.post("/delete", response_model=BulkDeleteResponse)
+async def delete_documents(
+    request: BulkDeleteRequest,
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
+):
+    """Delete several documents at once. Unknown or foreign ids are reported, not an error."""
+    document_ids = list(dict.fromkeys(request.document_ids))
+    if len(document_ids) > MAX_BULK_DELETE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many documents. Maximum is {MAX_BULK_DELETE} per request",
+        )
 
-    # Get document to verify ownership
-    response = (
-        client.table("documents")
-        .select("*")
-        .eq("id", document_id)
-        .eq("user_id", user.id)
-        .execute()
+    valid_ids = [doc_id for doc_id in document_ids if _is_uuid(doc_id)]
+    deleted = set(tombstone_documents(client, user, valid_ids)) if valid_ids else set()
+    return BulkDeleteResponse(
+        deleted=[doc_id for doc_id in document_ids if doc_id in deleted],
+        not_found=[doc_id for doc_id in document_ids if doc_id not in deleted],
     )
 
-    if not response.data:
+
+@router.post("/{document_id}/process", status_code=status.HTTP_202_ACCEPTED)
+async def process_document(
+    document_id: str,
+    user: User = Depends(get_current_user),
+):
+    """
+    Queue a document for processing.
+
+    Any replica's ingestion worker may pick it up; follow the document's
+    status and progress for the outcome.
+    """
+    if not _is_uuid(document_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Document not found",
         )
 
-    doc = response.data[0]
-
-    if doc["status"] == "processing":
+    try:
+        job_id = await enqueue_document(document_id, user.id)
+    except JobAlreadyQueued:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Document is already being processed",
         )
 
-    # Update status to processing
-    client.table("documents").update({"status": "processing"}).eq("id", document_id).execute()
-
-    # Process document (this runs synchronously for now)
-    try:
-        await ingest_document(document_id, user.id)
-        return {"message": "Document processed successfully"}
-    except Exception as e:
-        # Update status to failed
-        client.table("documents").update(
-            {"status": "failed", "error_message": str(e)}
-        ).eq("id", document_id).execute()
+    if job_id is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Processing failed: {str(e)}",
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found",
         )
+
+    return {"message": "Document queued for processing", "job_id": job_id}
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from supabase import AsyncClient
+
+from app.core.supabase import async_supabase_client
+from app.middleware.auth import get_current_user, User
+from app.models.evaluation import EvaluationReport, EvaluationRequest
+from app.services.admission import AdmissionRejected, to_http_exception
+from app.services.evaluation import run_evaluation
+
+router = APIRouter(prefix="/api/evaluations", tags=["evaluations"])
+
+
+@router.post("", response_model=EvaluationReport)
+async def evaluate_retrieval(
+    request: EvaluationRequest,
+    user: User = Depends(get_current_user),
+    client: AsyncClient = Depends(async_supabase_client),
+):
+    """
+    Score retrieval over the user's documents for a set of questions with
+    known relevant chunks or documents, across every combination of the
+    given match counts and similarity thresholds.
+    """
+    try:
+        return await run_evaluation(request, user.id, client)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except AdmissionRejected as e:
+        raise to_http_exception(e)
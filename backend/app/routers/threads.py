@@ -1,44 +1,62 @@
-import os
+from uuid import UUID
+
 from fastapi import APIRouter, Depends, HTTPException, status
-from supabase import create_client
+from fastapi.responses import JSONResponse
+from supabase import Client
+from app.core.pagination import (
+    NEXT_CURSOR_HEADER,
+    Page,
+    apply_keyset,
+    finish_page,
+    page_params,
+)
+from app.core.supabase import supabase_client
 from app.middleware.auth import get_current_user, User
-from app.models.thread import Thread, ThreadCreate, ThreadUpdate, Message
+from app.models.thread import (
+    Thread,
+    ThreadCreate,
+    ThreadUpdate,
+    Message,
+    ThreadDocumentSet,
+)
 
 router = APIRouter(prefix="/api/threads", tags=["threads"])
 
+# Columns the response models need; avoids shipping anything added later
+THREAD_COLUMNS = "id, user_id, title, openai_thread_id, vector_store_id, created_at, updated_at"
+MESSAGE_COLUMNS = "id, thread_id, user_id, role, content, metadata, created_at"
 
-def get_user_client(user: User):
-    """Create a Supabase client for database operations."""
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    if not url or not key:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Database configuration missing",
-        )
-    return create_client(url, key)
+
+def _page_response(rows: list, next_cursor) -> JSONResponse:
+    # Rows are already in the response model's shape, so skip re-validating them
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return JSONResponse(rows, headers=headers)
 
 
 @router.get("", response_model=list[Thread])
-async def list_threads(user: User = Depends(get_current_user)):
-    """List all threads for the current user."""
-    client = get_user_client(user)
-    response = (
-        client.table("threads")
-        .select("*")
-        .eq("user_id", user.id)
-        .order("updated_at", desc=True)
-        .execute()
-    )
-    return response.data
+async def list_threads(
+    page: Page = Depends(page_params),
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
+):
+    """
+    List the current user's threads, most recently updated first.
+
+    Pass the X-Next-Cursor response header back as `cursor` for the next page.
+    """
+    query = client.table("threads").select(THREAD_COLUMNS).eq("user_id", user.id)
+    response = apply_keyset(query, page, "updated_at").execute()
+    rows, next_cursor = finish_page(response.data, page, "updated_at")
+    return _page_response(rows, next_cursor)
 
 
 @router.post("", response_model=Thread, status_code=status.HTTP_201_CREATED)
 async def create_thread(
-    thread_data: ThreadCreate, user: User = Depends(get_current_user)
+    thread_data: ThreadCreate,
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
 ):
     """Create a new thread."""
-    client = get_user_client(user)
     response = (
         client.table("threads")
         .insert({"user_id": user.id, "title": thread_data.title})
@@ -53,9 +71,12 @@ async def create_thread(
 
 
 @router.get("/{thread_id}", response_model=Thread)
-async def get_thread(thread_id: str, user: User = Depends(get_current_user)):
+async def get_thread(
+    thread_id: str,
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
+):
     """Get a specific thread."""
-    client = get_user_client(user)
     response = (
         client.table("threads")
         .select("*")
@@ -72,10 +93,12 @@ async def get_thread(thread_id: str, user: User = Depends(get_current_user)):
 
 @router.patch("/{thread_id}", response_model=Thread)
 async def update_thread(
-    thread_id: str, thread_data: ThreadUpdate, user: User = Depends(get_current_user)
+    thread_id: str,
+    thread_data: ThreadUpdate,
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
 ):
     """Update a thread."""
-    client = get_user_client(user)
     update_data = thread_data.model_dump(exclude_unset=True)
     if not update_data:
         raise HTTPException(
@@ -97,9 +120,12 @@ async def update_thread(
 
 
 @router.delete("/{thread_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_thread(thread_id: str, user: User = Depends(get_current_user)):
+async def delete_thread(
+    thread_id: str,
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
+):
     """Delete a thread."""
-    client = get_user_client(user)
     response = (
         client.table("threads")
         .delete()
@@ -115,9 +141,17 @@ async def delete_thread(thread_id: str, user: User = Depends(get_current_user)):
 
 
 @router.get("/{thread_id}/messages", response_model=list[Message])
-async def get_messages(thread_id: str, user: User = Depends(get_current_user)):
-    """Get all messages for a thread."""
-    client = get_user_client(user)
+async def get_messages(
+    thread_id: str,
+    page: Page = Depends(page_params),
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
+):
+    """
+    Get a thread's most recent messages in chronological order.
+
+    Pages go backwards in time: X-Next-Cursor fetches the messages before these.
+    """
 
     # First verify the thread belongs to the user
     thread_response = (
@@ -132,11 +166,90 @@ async def get_messages(thread_id: str, user: User = Depends(get_current_user)):
             status_code=status.HTTP_404_NOT_FOUND, detail="Thread not found"
         )
 
+    query = client.table("messages").select(MESSAGE_COLUMNS).eq("thread_id", thread_id)
+    response = apply_keyset(query, page, "created_at").execute()
+    rows, next_cursor = finish_page(response.data, page, "created_at")
+    rows.reverse()
+    return _page_response(rows, next_cursor)
+
+
+def _verify_thread_owner(client, thread_id: str, user: User) -> None:
+    thread_response = (
+        client.table("threads")
+        .select("id")
+        .eq("id", thread_id)
+        .eq("user_id", user.id)
+        .execute()
+    )
+    if not thread_response.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Thread not found"
+        )
+
+
+@router.get("/{thread_id}/documents", response_model=ThreadDocumentSet)
+async def get_thread_documents(
+    thread_id: str,
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
+):
+    """Get the document set attached to a thread."""
+    _verify_thread_owner(client, thread_id, user)
+
     response = (
-        client.table("messages")
-        .select("*")
+        client.table("thread_documents")
+        .select("document_id")
         .eq("thread_id", thread_id)
-        .order("created_at", desc=False)
         .execute()
     )
-    return response.data
+    return ThreadDocumentSet(document_ids=[row["document_id"] for row in response.data])
+
+
+@router.put("/{thread_id}/documents", response_model=ThreadDocumentSet)
+async def set_thread_documents(
+    thread_id: str,
+    document_set: ThreadDocumentSet,
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
+):
+    """Replace the document set attached to a thread. An empty set searches all documents."""
+    _verify_thread_owner(client, thread_id, user)
+
+    document_ids = [str(doc_id) for doc_id in dict.fromkeys(document_set.document_ids)]
+
+    # Ownership check, delete and insert run in one transaction
+    response = client.rpc(
+        "set_thread_documents",
+        {"p_thread_id": thread_id, "p_user_id": user.id, "p_document_ids": document_ids},
+    ).execute()
+    missing = [str(doc_id) for doc_id in response.data or []]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Documents not found: {', '.join(missing)}",
+        )
+
+    return ThreadDocumentSet(document_ids=document_ids)
+
+
+@router.delete("/{thread_id}/documents/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def detach_thread_document(
+    thread_id: str,
+    document_id: UUID,
+    user: User = Depends(get_current_user),
+    client: Client = Depends(supabase_client),
+):
+    """Detach a single document from a thread."""
+    response = (
+        client.table("thread_documents")
+        .delete()
+        .eq("thread_id", thread_id)
+        .eq("document_id", str(document_id))
+        .eq("user_id", user.id)
+        .execute()
+    )
+    if not response.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Document not attached to thread"
+        )
+    return None
@@ -0,0 +1,267 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import ADMISSION_REJECTED, gauge
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    # Lower value is served first
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def to_http_exception(error: AdmissionRejected) -> HTTPException:
+    """Turn a rejection into a 429 with a Retry-After header."""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(error),
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))},
+    )
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    user_id: str = field(compare=False)
+    weight: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class Ticket:
+    """A granted slot. Releasing is idempotent."""
+
+    def __init__(self, controller: "AdmissionController", user_id: str, weight: int):
+        self._controller = controller
+        self.user_id = user_id
+        self.weight = weight
+        self.granted_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+
+class AdmissionController:
+    """
+    Weighted concurrency limits, global and per user, with priority queues.
+
+    Requests that cannot run immediately wait in a bounded queue ordered by
+    priority then arrival. When the queue for a priority is full, or a waiter
+    times out, the request is rejected with an estimated Retry-After.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        global_capacity: int,
+        per_user_capacity: int,
+        max_queue: Dict[Priority, int],
+        max_wait_seconds: Dict[Priority, float],
+    ):
+        self.name = name
+        self.global_capacity = global_capacity
+        self.per_user_capacity = per_user_capacity
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+
+        self.in_use = 0
+        self.user_in_use: Dict[str, int] = {}
+        self._waiters: List[_Waiter] = []
+        self._queued: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._seq = itertools.count()
+        # Rolling average of how long a slot is held, for Retry-After estimates
+        self._hold_seconds = 1.0
+
+    def queue_depth(self, priority: Optional[Priority] = None) -> int:
+        if priority is None:
+            return sum(self._queued.values())
+        return self._queued[priority]
+
+    def _user_fits(self, user_id: str, weight: int) -> bool:
+        return self.user_in_use.get(user_id, 0) + weight <= self.per_user_capacity
+
+    def _fits(self, user_id: str, weight: int) -> bool:
+        return self.in_use + weight <= self.global_capacity and self._user_fits(user_id, weight)
+
+    def _grant(self, user_id: str, weight: int) -> Ticket:
+        self.in_use += weight
+        self.user_in_use[user_id] = self.user_in_use.get(user_id, 0) + weight
+        return Ticket(self, user_id, weight)
+
+    def _retry_after(self) -> float:
+        waiting = self.queue_depth() + 1
+        return max(1.0, self._hold_seconds * waiting / max(1, self.global_capacity))
+
+    async def acquire(
+        self,
+        user_id: str,
+        priority: Priority = Priority.INTERACTIVE,
+        weight: int = 1,
+    ) -> Ticket:
+        """Wait for a slot. Raises AdmissionRejected if the queue is full or the wait times out."""
+        weight = max(1, min(weight, self.per_user_capacity, self.global_capacity))
+
+        # Only jump in directly if nobody of equal or higher priority is waiting
+        # for global capacity. Waiters held back by their own per-user limit
+        # don't count, or one busy user would queue everyone behind them.
+        ahead = any(
+            w.priority <= priority and self._user_fits(w.user_id, w.weight)
+            for w in self._waiters
+        )
+        if not ahead and self._fits(user_id, weight):
+            return self._grant(user_id, weight)
+
+        if self._queued[priority] >= self.max_queue[priority]:
+            ADMISSION_REJECTED.inc(controller=self.name, priority=priority.name.lower())
+            raise AdmissionRejected(
+                f"{self.name} is at capacity, try again later",
+                retry_after=self._retry_after(),
+            )
+
+        waiter = _Waiter(
+            priority=priority,
+            seq=next(self._seq),
+            user_id=user_id,
+            weight=weight,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        heapq.heappush(self._waiters, waiter)
+        self._queued[priority] += 1
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(waiter.future), timeout=self.max_wait_seconds[priority]
+            )
+        except asyncio.TimeoutError:
+            if waiter.future.done():
+                # Granted right at the deadline
+                return waiter.future.result()
+            self._abandon(waiter)
+            ADMISSION_REJECTED.inc(controller=self.name, priority=priority.name.lower())
+            raise AdmissionRejected(
+                f"Timed out waiting for {self.name} capacity",
+                retry_after=self._retry_after(),
+            )
+        except asyncio.CancelledError:
+            if waiter.future.done():
+                # Granted just as the caller went away: hand the slot back
+                waiter.future.result().release()
+            else:
+                self._abandon(waiter)
+            raise
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        user_id: str,
+        priority: Priority = Priority.INTERACTIVE,
+        weight: int = 1,
+    ):
+        ticket = await self.acquire(user_id, priority, weight)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        waiter.future.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            return
+        heapq.heapify(self._waiters)
+        self._queued[Priority(waiter.priority)] -= 1
+
+    def _release(self, ticket: Ticket) -> None:
+        held = time.monotonic() - ticket.granted_at
+        self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * held
+
+        self.in_use -= ticket.weight
+        remaining = self.user_in_use.get(ticket.user_id, 0) - ticket.weight
+        if remaining > 0:
+            self.user_in_use[ticket.user_id] = remaining
+        else:
+            self.user_in_use.pop(ticket.user_id, None)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant queued waiters in priority order, skipping users at their own limit."""
+        if not self._waiters:
+            return
+        still_waiting = []
+        for waiter in sorted(self._waiters):
+            if self.in_use >= self.global_capacity:
+                still_waiting.append(waiter)
+                continue
+            if self._fits(waiter.user_id, waiter.weight):
+                self._queued[Priority(waiter.priority)] -= 1
+                waiter.future.set_result(self._grant(waiter.user_id, waiter.weight))
+            else:
+                still_waiting.append(waiter)
+        self._waiters = still_waiting
+        heapq.heapify(self._waiters)
+
+
+def _build(name: str, global_capacity: int, per_user_capacity: int) -> AdmissionController:
+    return AdmissionController(
+        name=name,
+        global_capacity=global_capacity,
+        per_user_capacity=per_user_capacity,
+        max_queue={
+            Priority.INTERACTIVE: settings.admission_max_queue_interactive,
+            Priority.BACKGROUND: settings.admission_max_queue_background,
+        },
+        max_wait_seconds={
+            Priority.INTERACTIVE: settings.admission_max_wait_seconds,
+            Priority.BACKGROUND: settings.admission_background_max_wait_seconds,
+        },
+    )
+
+
+# Shared by the chat router and the ingestion pipeline
+llm_admission = _build(
+    "LLM", settings.llm_max_concurrency, settings.llm_max_concurrency_per_user
+)
+embedding_admission = _build(
+    "Embeddings", settings.embedding_max_concurrency, settings.embedding_max_concurrency_per_user
+)
+
+
+gauge(
+    "admission_queue_depth",
+    "Requests waiting for an admission slot",
+    ["controller", "priority"],
+    callback=lambda: [
+        ((c.name, p.name.lower()), c.queue_depth(p))
+        for c in (llm_admission, embedding_admission)
+        for p in Priority
+    ],
+)
+gauge(
+    "admission_slots_in_use",
+    "Admission slots currently held",
+    ["controller"],
+    callback=lambda: [((c.name,), c.in_use) for c in (llm_admission, embedding_admission)],
+)
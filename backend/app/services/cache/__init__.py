@@ -0,0 +1,25 @@
+from app.services.cache.answer_cache import (
+    answer_cache_stats,
+    lookup_answer,
+    record_replay,
+    store_answer,
+)
+from app.services.cache.prefetch import (
+    PrefetchResult,
+    normalize_query,
+    record_scope_changed,
+    start_prefetch,
+    take_prefetched,
+)
+
+__all__ = [
+    "PrefetchResult",
+    "answer_cache_stats",
+    "lookup_answer",
+    "normalize_query",
+    "record_replay",
+    "record_scope_changed",
+    "start_prefetch",
+    "store_answer",
+    "take_prefetched",
+]
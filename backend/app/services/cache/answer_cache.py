@@ -0,0 +1,157 @@
+import logging
+import threading
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    id: str
+    answer: str
+    similarity: float
+    generation_ms: Optional[int] = None
+
+
+@dataclass
+class AnswerCacheStats:
+    lookups: int = 0
+    hits: int = 0
+    stores: int = 0
+    # Generation time of the original answers minus time spent replaying them
+    latency_saved_ms: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+_stats = AnswerCacheStats()
+_stats_lock = threading.Lock()
+
+
+def answer_cache_stats() -> dict:
+    """Snapshot of this worker's cache counters."""
+    with _stats_lock:
+        return {**asdict(_stats), "hit_rate": _stats.hit_rate}
+
+
+def _stats_samples():
+    stats = answer_cache_stats()
+    return [((name,), stats[name]) for name in ("lookups", "hits", "stores", "latency_saved_ms")]
+
+
+gauge(
+    "answer_cache_counters",
+    "Answer cache lookups, hits, stores and latency saved (ms) on this worker",
+    ["counter"],
+    callback=_stats_samples,
+)
+
+
+def record_replay(entry: CachedAnswer, replay_ms: float) -> None:
+    """Account for the latency a cache hit saved."""
+    if entry.generation_ms is None:
+        return
+    with _stats_lock:
+        _stats.latency_saved_ms += max(0.0, entry.generation_ms - replay_ms)
+
+
+def cache_key_chunk_ids(chunks: List) -> List[str]:
+    return sorted({c.id for c in chunks})
+
+
+async def lookup_answer(
+    client,
+    user_id: str,
+    model: str,
+    query_embedding: List[float],
+    chunks: List,
+) -> Optional[CachedAnswer]:
+    """
+    Find a cached answer for a near-identical question over the same chunks.
+
+    Args:
+        client: Async Supabase client
+        user_id: The user asking
+        model: LLM the answer would come from (see expected_model)
+        query_embedding: Embedding of the question
+        chunks: Chunks retrieved for this question (the set must match exactly)
+
+    Returns:
+        The cached answer, or None on a miss
+    """
+    if not chunks or not query_embedding:
+        return None
+
+    try:
+        response = await client.rpc(
+            "match_answer_cache",
+            {
+                "p_user_id": user_id,
+                "p_model": model,
+                "p_query_embedding": query_embedding,
+                "p_chunk_ids": cache_key_chunk_ids(chunks),
+                "p_min_similarity": settings.answer_cache_min_similarity,
+                "p_max_age": f"{settings.answer_cache_ttl_hours} hours",
+            },
+        ).execute()
+    except Exception as e:
+        logger.error(f"Answer cache lookup failed: {e}", exc_info=True)
+        return None
+
+    with _stats_lock:
+        _stats.lookups += 1
+        if response.data:
+            _stats.hits += 1
+
+    if not response.data:
+        return None
+
+    row = response.data[0]
+    logger.info(f"Answer cache hit {row['id']} (similarity={row['similarity']:.3f})")
+    return CachedAnswer(
+        id=row["id"],
+        answer=row["answer"],
+        similarity=row["similarity"],
+        generation_ms=row.get("generation_ms"),
+    )
+
+
+async def store_answer(
+    client,
+    user_id: str,
+    model: str,
+    query: str,
+    query_embedding: List[float],
+    chunks: List,
+    answer: str,
+    generation_ms: int,
+) -> None:
+    """Cache a freshly generated answer under the model that wrote it. Failures are logged, never raised."""
+    if not chunks or not query_embedding or not answer:
+        return
+
+    try:
+        await client.table("answer_cache").insert(
+            {
+                "user_id": user_id,
+                "model": model,
+                "query": query,
+                "query_embedding": query_embedding,
+                "chunk_ids": cache_key_chunk_ids(chunks),
+                "document_ids": sorted({c.document_id for c in chunks}),
+                "answer": answer,
+                "generation_ms": generation_ms,
+            }
+        ).execute()
+    except Exception as e:
+        logger.error(f"Answer cache store failed: {e}", exc_info=True)
+        return
+
+    with _stats_lock:
+        _stats.stores += 1
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import counter, gauge
+from app.services.retrieval.search import RetrievedChunk
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_STARTED = counter(
+    "chat_prefetch_started_total",
+    "Retrievals started speculatively while the user was typing",
+)
+PREFETCH_LOOKUPS = counter(
+    "chat_prefetch_lookups_total",
+    "Chat turns that looked for prefetched retrieval, by result",
+    ["result"],
+)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+@dataclass
+class PrefetchResult:
+    query_embedding: List[float]
+    chunks: List[RetrievedChunk]
+    # Thread documents the search was scoped to, to detect a changed scope
+    scope_document_ids: Optional[List[str]]
+
+
+@dataclass
+class PrefetchHit:
+    result: PrefetchResult
+    # Same query after normalization, as opposed to a near-identical one
+    exact: bool
+
+
+@dataclass
+class _Entry:
+    thread_id: str
+    query: str  # normalized
+    filters_key: str
+    task: asyncio.Task
+    created_at: float
+
+
+# Per user, oldest first; a user's entries are few, so lookups scan them
+_entries: Dict[str, "OrderedDict[Tuple[str, str, str], _Entry]"] = {}
+_last_sweep = 0.0
+
+gauge(
+    "chat_prefetch_entries",
+    "Prefetched or in-flight retrievals held by this worker",
+    callback=lambda: [((), sum(len(e) for e in _entries.values()))],
+)
+
+
+def normalize_query(text: str) -> str:
+    """Casefold, drop punctuation and collapse whitespace, so trivial edits still match."""
+    text = _PUNCTUATION_RE.sub(" ", text.casefold())
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def _evict(entries: "OrderedDict[Tuple[str, str, str], _Entry]", key: Tuple[str, str, str]) -> None:
+    entry = entries.pop(key)
+    if not entry.task.done():
+        entry.task.cancel()
+
+
+def _prune(user_id: str) -> "OrderedDict[Tuple[str, str, str], _Entry]":
+    entries = _entries.setdefault(user_id, OrderedDict())
+    cutoff = time.monotonic() - settings.prefetch_ttl_seconds
+    for key in [k for k, e in entries.items() if e.created_at < cutoff]:
+        _evict(entries, key)
+    return entries
+
+
+def _sweep() -> None:
+    """Drop expired entries of users who stopped chatting."""
+    global _last_sweep
+    now = time.monotonic()
+    if now - _last_sweep < settings.prefetch_ttl_seconds:
+        return
+    _last_sweep = now
+    for user_id in list(_entries):
+        if not _prune(user_id):
+            del _entries[user_id]
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Retrieval prefetch failed: {task.exception()}")
+
+
+def start_prefetch(
+    user_id: str,
+    thread_id: str,
+    query: str,
+    filters_key: str,
+    fetch: Callable[[], Awaitable[Optional[PrefetchResult]]],
+) -> bool:
+    """
+    Run `fetch` in the background and keep its result for
+    prefetch_ttl_seconds, unless the same query is already cached or running.
+
+    An in-flight prefetch for an earlier draft in the same thread is
+    cancelled, since the user has typed past it; finished ones are kept in
+    case the message is sent as it was then.
+
+    Returns:
+        Whether a new prefetch was started
+    """
+    _sweep()
+    normalized = normalize_query(query)
+    entries = _prune(user_id)
+    key = (thread_id, normalized, filters_key)
+    if key in entries:
+        return False
+
+    for other_key, entry in list(entries.items()):
+        if entry.thread_id == thread_id and not entry.task.done():
+            _evict(entries, other_key)
+
+    task = asyncio.create_task(asyncio.wait_for(fetch(), settings.prefetch_ttl_seconds))
+    task.add_done_callback(_log_failure)
+    entries[key] = _Entry(thread_id, normalized, filters_key, task, time.monotonic())
+    while len(entries) > settings.prefetch_max_entries_per_user:
+        _evict(entries, next(iter(entries)))
+    PREFETCH_STARTED.inc()
+    return True
+
+
+def _find(user_id: str, thread_id: str, normalized: str, filters_key: str) -> Tuple[Optional[_Entry], bool]:
+    if user_id not in _entries:
+        return None, False
+    entries = _prune(user_id)
+    exact = entries.get((thread_id, normalized, filters_key))
+    if exact is not None:
+        return exact, True
+
+    best, best_ratio = None, settings.prefetch_min_similarity
+    for entry in entries.values():
+        if entry.thread_id != thread_id or entry.filters_key != filters_key:
+            continue
+        ratio = SequenceMatcher(None, entry.query, normalized).ratio()
+        # Later drafts win ties; they are closer to what was sent
+        if ratio >= best_ratio:
+            best, best_ratio = entry, ratio
+    return best, False
+
+
+async def take_prefetched(
+    user_id: str, thread_id: str, query: str, filters_key: str
+) -> Optional[PrefetchHit]:
+    """
+    Get prefetched retrieval for this query, waiting for it if it is still
+    running (it started earlier than anything we could start now).
+
+    Returns:
+        The hit, or None if nothing usable was prefetched
+    """
+    entry, exact = _find(user_id, thread_id, normalize_query(query), filters_key)
+    if entry is None:
+        PREFETCH_LOOKUPS.inc(result="miss")
+        return None
+    try:
+        result = await asyncio.shield(entry.task)
+    except asyncio.CancelledError:
+        if not entry.task.cancelled():
+            # We were cancelled, not the prefetch
+            raise
+        result = None
+    except Exception:
+        result = None
+    if result is None:
+        PREFETCH_LOOKUPS.inc(result="failed")
+        return None
+    PREFETCH_LOOKUPS.inc(result="exact" if exact else "near")
+    return PrefetchHit(result, exact)
+
+
+def record_scope_changed() -> None:
+    """The thread's documents changed after the prefetch; its chunks were not used."""
+    PREFETCH_LOOKUPS.inc(result="scope_changed")
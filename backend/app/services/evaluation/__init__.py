@@ -0,0 +1,3 @@
+from app.services.evaluation.runner import run_evaluation, score_case, select_results
+
+__all__ = ["run_evaluation", "score_case", "select_results"]
@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from contextlib import aclosing, contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.models.evaluation import (
+    CaseResult,
+    ConfigResult,
+    EvaluationCase,
+    EvaluationReport,
+    EvaluationRequest,
+    LatencySummary,
+)
+from app.services.admission import Priority, embedding_admission, llm_admission
+from app.services.ingestion.embeddings import generate_embeddings_async, get_embedding_state_async
+from app.services.llm import ChatMessage, stream_chat_async
+from app.services.retrieval.packer import pack_chunks
+from app.services.retrieval.rerank import rerank_chunks
+from app.services.retrieval.search import (
+    RetrievedChunk,
+    candidate_count,
+    format_context_for_prompt,
+    match_candidates_async,
+)
+
+logger = logging.getLogger(__name__)
+
+# The match functions scan this many candidates at most per question
+MAX_MATCH_COUNT = 100
+
+Config = Tuple[int, float]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize_latencies(samples_ms: List[float]) -> LatencySummary:
+    return LatencySummary(
+        count=len(samples_ms),
+        mean_ms=round(sum(samples_ms) / len(samples_ms), 1),
+        p50_ms=round(percentile(samples_ms, 50), 1),
+        p90_ms=round(percentile(samples_ms, 90), 1),
+        p99_ms=round(percentile(samples_ms, 99), 1),
+        max_ms=round(max(samples_ms), 1),
+    )
+
+
+class _Timings:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def add(self, stage: str, started: float) -> None:
+        self.samples[stage].append((time.perf_counter() - started) * 1000)
+
+    @contextmanager
+    def time(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, started)
+
+
+@dataclass
+class _CaseOutcome:
+    case: EvaluationCase
+    results: Dict[Config, List[RetrievedChunk]] = field(default_factory=dict)
+    answer: Optional[str] = None
+    error: Optional[str] = None
+
+
+def select_results(
+    question: str,
+    candidates: List[RetrievedChunk],
+    match_count: int,
+    similarity_threshold: float,
+) -> List[RetrievedChunk]:
+    """
+    What retrieve_context_async returns for these settings, derived from the
+    candidates of a search at an equal or larger match count.
+
+    The match functions return candidates by similarity, so the candidates
+    for a smaller count are a prefix of those for a larger one.
+    """
+    pool = candidates[: candidate_count(match_count)]
+    chunks = [c for c in pool if c.similarity >= similarity_threshold]
+    if settings.rerank_enabled:
+        return rerank_chunks(question, chunks, min(settings.rerank_top_n, match_count))
+    return chunks
+
+
+def _ranked_ids(chunks: List[RetrievedChunk], by_chunk: bool) -> List[str]:
+    if by_chunk:
+        return [c.id for c in chunks]
+    # A document's rank is that of its best chunk
+    return list(dict.fromkeys(c.document_id for c in chunks))
+
+
+def score_case(case: EvaluationCase, chunks: List[RetrievedChunk]) -> Tuple[float, Optional[int]]:
+    """
+    Score one question's results against its expectations.
+
+    Returns:
+        (recall, 1-based rank of the first relevant result or None)
+    """
+    by_chunk = bool(case.expected_chunk_ids)
+    relevant = set(case.expected_chunk_ids if by_chunk else case.expected_document_ids)
+    ranked = _ranked_ids(chunks, by_chunk)
+    first = next((rank for rank, id in enumerate(ranked, 1) if id in relevant), None)
+    return len(relevant.intersection(ranked)) / len(relevant), first
+
+
+def answer_term_coverage(case: EvaluationCase, answer: Optional[str]) -> Optional[float]:
+    if not case.expected_answer_terms or answer is None:
+        return None
+    text = answer.lower()
+    found = sum(1 for term in case.expected_answer_terms if term.lower() in text)
+    return found / len(case.expected_answer_terms)
+
+
+async def _embed_questions(
+    questions: List[str], user_id: str, concurrency: int, timings: _Timings
+) -> Dict[str, List[float]]:
+    """Embed each distinct question once, many per request."""
+    unique = list(dict.fromkeys(questions))
+    size = settings.evaluation_embedding_batch_size
+    batches = [unique[i : i + size] for i in range(0, len(unique), size)]
+    state = await get_embedding_state_async()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def embed(batch: List[str]) -> List[List[float]]:
+        async with semaphore, embedding_admission.slot(user_id, Priority.BACKGROUND):
+            with timings.time("embed"):
+                return await generate_embeddings_async(batch, state.model, state.dimensions)
+
+    vectors = await asyncio.gather(*(embed(batch) for batch in batches))
+    return {
+        question: vector
+        for batch, batch_vectors in zip(batches, vectors)
+        for question, vector in zip(batch, batch_vectors)
+    }
+
+
+async def _generate(question: str, chunks: List[RetrievedChunk], user_id: str, timings: _Timings) -> str:
+    context = format_context_for_prompt(pack_chunks(chunks))
+    parts: List[str] = []
+    async with llm_admission.slot(user_id, Priority.BACKGROUND):
+        started = time.perf_counter()
+        stream = stream_chat_async([ChatMessage(role="user", content=question)], context=context)
+        async with aclosing(stream):
+            async for delta in stream:
+                if not parts:
+                    timings.add("generate_first_token", started)
+                parts.append(delta)
+        timings.add("generate", started)
+    return "".join(parts)
+
+
+async def _evaluate_case(
+    case: EvaluationCase,
+    embedding: List[float],
+    request: EvaluationRequest,
+    configs: List[Config],
+    user_id: str,
+    client,
+    semaphore: asyncio.Semaphore,
+    timings: _Timings,
+) -> _CaseOutcome:
+    outcome = _CaseOutcome(case)
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            with timings.time("match"):
+                candidates = await match_candidates_async(
+                    case.question,
+                    user_id,
+                    max(request.match_counts),
+                    request.filters,
+                    client=client,
+                    query_embedding=embedding,
+                )
+            for match_count, threshold in configs:
+                if settings.rerank_enabled:
+                    # The cross-encoder is CPU bound
+                    with timings.time("rerank"):
+                        outcome.results[(match_count, threshold)] = await asyncio.to_thread(
+                            select_results, case.question, candidates, match_count, threshold
+                        )
+                else:
+                    outcome.results[(match_count, threshold)] = select_results(
+                        case.question, candidates, match_count, threshold
+                    )
+            if request.generate:
+                outcome.answer = await _generate(case.question, outcome.results[configs[0]], user_id, timings)
+        except Exception as e:
+            logger.warning(f"Evaluation case failed ({case.question[:50]}): {e}")
+            outcome.error = str(e)
+            return outcome
+        timings.add("total", started)
+    return outcome
+
+
+def _config_result(config: Config, outcomes: List[_CaseOutcome]) -> ConfigResult:
+    recalls, ranks, counts = [], [], []
+    for outcome in outcomes:
+        chunks = outcome.results[config]
+        recall, first = score_case(outcome.case, chunks)
+        recalls.append(recall)
+        ranks.append(first)
+        counts.append(len(chunks))
+    n = len(outcomes) or 1
+    return ConfigResult(
+        match_count=config[0],
+        similarity_threshold=config[1],
+        recall_at_k=round(sum(recalls) / n, 4),
+        hit_rate=round(sum(1 for r in ranks if r is not None) / n, 4),
+        mrr=round(sum(1 / r for r in ranks if r is not None) / n, 4),
+        mean_results=round(sum(counts) / n, 2),
+    )
+
+
+def _case_result(outcome: _CaseOutcome, config: Config) -> CaseResult:
+    chunks = outcome.results.get(config, [])
+    recall, first = score_case(outcome.case, chunks)
+    return CaseResult(
+        question=outcome.case.question,
+        retrieved_chunk_ids=[c.id for c in chunks],
+        retrieved_document_ids=_ranked_ids(chunks, by_chunk=False),
+        first_relevant_rank=first,
+        recall=0.0 if outcome.error else round(recall, 4),
+        answer=outcome.answer,
+        answer_term_coverage=answer_term_coverage(outcome.case, outcome.answer),
+        error=outcome.error,
+    )
+
+
+async def run_evaluation(request: EvaluationRequest, user_id: str, client=None) -> EvaluationReport:
+    """
+    Run a set of questions through retrieval (and optionally generation) and
+    score the results against the expected chunks or documents.
+
+    Questions are embedded together in batches, and each is searched once
+    at the largest match count; every match count and threshold combination
+    is then scored from those candidates, so a sweep costs little more than
+    a single configuration.
+
+    Args:
+        request: Cases, the retrieval settings to sweep and run options
+        user_id: Whose documents are searched
+        client: Optional AsyncClient to reuse
+
+    Returns:
+        Recall@k, hit rate and MRR per configuration, plus latency
+        distributions per stage
+
+    Raises:
+        ValueError: If the request exceeds the evaluation limits
+    """
+    if len(request.cases) > settings.evaluation_max_cases:
+        raise ValueError(f"At most {settings.evaluation_max_cases} cases per evaluation")
+    if max(request.match_counts) > MAX_MATCH_COUNT:
+        raise ValueError(f"match_counts must be at most {MAX_MATCH_COUNT}")
+
+    # Deduplicated, in request order; the first is also the one used for generation
+    configs = [
+        (k, t)
+        for k in dict.fromkeys(request.match_counts)
+        for t in dict.fromkeys(request.similarity_thresholds)
+    ]
+    concurrency = min(request.concurrency, settings.evaluation_max_concurrency)
+    timings = _Timings()
+
+    embeddings = await _embed_questions(
+        [case.question for case in request.cases], user_id, concurrency, timings
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = await asyncio.gather(
+        *(
+            _evaluate_case(
+                case, embeddings[case.question], request, configs, user_id, client, semaphore, timings
+            )
+            for case in request.cases
+        )
+    )
+
+    succeeded = [o for o in outcomes if o.error is None]
+    coverages = [
+        c for c in (answer_term_coverage(o.case, o.answer) for o in succeeded) if c is not None
+    ]
+    return EvaluationReport(
+        cases=len(outcomes),
+        failed_cases=len(outcomes) - len(succeeded),
+        rerank_enabled=settings.rerank_enabled,
+        configs=[_config_result(config, succeeded) for config in configs],
+        latency={stage: summarize_latencies(samples) for stage, samples in timings.samples.items()},
+        answer_term_coverage=round(sum(coverages) / len(coverages), 4) if coverages else None,
+        case_results=[_case_result(o, configs[0]) for o in outcomes] if request.include_cases else None,
+    )
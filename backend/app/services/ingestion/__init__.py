@@ -1,3 +1,19 @@
+from app.services.ingestion.jobs import (
+    JobAlreadyQueued,
+    enqueue_document,
+    start_ingestion_worker,
+    stop_ingestion_worker,
+)
 from app.services.ingestion.pipeline import process_document
+from app.services.ingestion.reaper import start_reaper, stop_reaper, wake_reaper
 
-__all__ = ["process_document"]
+__all__ = [
+    "JobAlreadyQueued",
+    "enqueue_document",
+    "process_document",
+    "start_ingestion_worker",
+    "start_reaper",
+    "stop_ingestion_worker",
+    "stop_reaper",
+    "wake_reaper",
+]
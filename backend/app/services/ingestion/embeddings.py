@@ -1,10 +1,102 @@
-from typing import List
+import logging
+import time
+from dataclasses import dataclass
+from typing import List, Optional
 import openai
 
 from app.services.llm.config import get_provider_config
 from app.core.config import settings
+from app.core.metrics import EMBEDDING_SECONDS
+from app.core.supabase import get_async_supabase, get_supabase
 
+logger = logging.getLogger(__name__)
+
+# What chunks were embedded with before embedding_config existed (migration
+# 015); also the fallback when that table cannot be read
 EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+
+_async_client = None
+
+
+@dataclass(frozen=True)
+class EmbeddingState:
+    """The model chunks are embedded with, and the one being migrated to, if any."""
+
+    model: str
+    dimensions: int
+    target_model: Optional[str] = None
+    target_dimensions: Optional[int] = None
+
+    @property
+    def migrating(self) -> bool:
+        return self.target_model is not None
+
+
+_state = EmbeddingState(EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+_state_loaded_at: Optional[float] = None
+
+
+def _state_is_fresh() -> bool:
+    return (
+        _state_loaded_at is not None
+        and time.monotonic() - _state_loaded_at < settings.embedding_state_ttl_seconds
+    )
+
+
+def _store_state(rows: Optional[list]) -> EmbeddingState:
+    global _state, _state_loaded_at
+    if rows:
+        row = rows[0]
+        state = EmbeddingState(
+            model=row["model"],
+            dimensions=row["dimensions"],
+            target_model=row.get("target_model"),
+            target_dimensions=row.get("target_dimensions"),
+        )
+        if state != _state:
+            logger.info(f"Embedding model state changed: {state}")
+        _state = state
+    _state_loaded_at = time.monotonic()
+    return _state
+
+
+def _state_query(client):
+    return client.table("embedding_config").select(
+        "model, dimensions, target_model, target_dimensions"
+    ).limit(1)
+
+
+def get_embedding_state(refresh: bool = False) -> EmbeddingState:
+    """
+    Get the active embedding model, cached for embedding_state_ttl_seconds.
+
+    Args:
+        refresh: Skip the cache, e.g. after the database rejected a vector
+
+    Returns:
+        The current EmbeddingState (the last known one if the read fails)
+    """
+    if not refresh and _state_is_fresh():
+        return _state
+    try:
+        return _store_state(_state_query(get_supabase()).execute().data)
+    except Exception as e:
+        # Keep serving with what we have; retried after another TTL
+        logger.warning(f"Failed to load embedding model state: {e}")
+        return _store_state(None)
+
+
+async def get_embedding_state_async(refresh: bool = False) -> EmbeddingState:
+    """Async variant of get_embedding_state."""
+    if not refresh and _state_is_fresh():
+        return _state
+    try:
+        client = await get_async_supabase()
+        return _store_state((await _state_query(client).execute()).data)
+    except Exception as e:
+        logger.warning(f"Failed to load embedding model state: {e}")
+        return _store_state(None)
 
 
 def get_embedding_client() -> openai.OpenAI:
@@ -17,7 +109,7 @@ def get_embedding_client() -> openai.OpenAI:
     if settings.llm_provider == "openrouter":
         return openai.OpenAI(
             api_key=config.api_key,
-            base_url="https://openrouter.ai/api/v1",
+            base_url=settings.openrouter_base_url,
             default_headers=config.extra_headers,
         )
 
@@ -29,12 +121,56 @@ def get_embedding_client() -> openai.OpenAI:
     )
 
 
-def generate_embeddings(texts: List[str]) -> List[List[float]]:
+def get_async_embedding_client() -> openai.AsyncOpenAI:
+    """Get a shared AsyncOpenAI client configured for embeddings."""
+    global _async_client
+    if _async_client is None:
+        config = get_provider_config()
+        base_url = config.base_url
+        if settings.llm_provider == "openrouter":
+            base_url = settings.openrouter_base_url
+        _async_client = openai.AsyncOpenAI(
+            api_key=config.api_key,
+            base_url=base_url,
+            default_headers=config.extra_headers,
+        )
+    return _async_client
+
+
+def get_embedding_model(model: Optional[str] = None) -> str:
+    """Provider-specific name of `model`, the active model by default."""
+    model = model or get_embedding_state().model
+    # OpenRouter uses different model names for embeddings
+    if settings.llm_provider == "openrouter" and "/" not in model:
+        return f"openai/{model}"
+    return model
+
+
+def _kind(texts: List[str]) -> str:
+    # Single texts are chat queries; lists are ingestion batches
+    return "query" if len(texts) == 1 else "batch"
+
+
+def _request_params(texts: List[str], model: str, dimensions: Optional[int]) -> dict:
+    params = {"model": get_embedding_model(model), "input": texts}
+    # Only the text-embedding-3 family can shorten its vectors
+    if dimensions and "text-embedding-3" in model:
+        params["dimensions"] = dimensions
+    return params
+
+
+def generate_embeddings(
+    texts: List[str],
+    model: Optional[str] = None,
+    dimensions: Optional[int] = None,
+) -> List[List[float]]:
     """
     Generate embeddings for a list of texts.
 
     Args:
         texts: List of text strings to embed
+        model: Embedding model; defaults to the active model
+        dimensions: Vector size; defaults to the active model's
 
     Returns:
         List of embedding vectors (each is a list of floats)
@@ -42,32 +178,87 @@ def generate_embeddings(texts: List[str]) -> List[List[float]]:
     if not texts:
         return []
 
-    client = get_embedding_client()
+    if model is None:
+        state = get_embedding_state()
+        model, dimensions = state.model, state.dimensions
 
-    # OpenRouter uses different model names for embeddings
-    model = EMBEDDING_MODEL
-    if settings.llm_provider == "openrouter":
-        model = "openai/text-embedding-3-small"
+    client = get_embedding_client()
 
-    response = client.embeddings.create(
-        model=model,
-        input=texts,
-    )
+    with EMBEDDING_SECONDS.time(provider=settings.llm_provider, kind=_kind(texts)):
+        response = client.embeddings.create(**_request_params(texts, model, dimensions))
 
     # Sort by index to ensure order matches input
     sorted_data = sorted(response.data, key=lambda x: x.index)
     return [item.embedding for item in sorted_data]
 
 
-def generate_embedding(text: str) -> List[float]:
+def generate_embedding(
+    text: str,
+    model: Optional[str] = None,
+    dimensions: Optional[int] = None,
+) -> List[float]:
     """
     Generate embedding for a single text.
 
     Args:
         text: Text string to embed
+        model: Embedding model; defaults to the active model
+        dimensions: Vector size; defaults to the active model's
+
+    Returns:
+        Embedding vector as a list of floats
+    """
+    embeddings = generate_embeddings([text], model, dimensions)
+    return embeddings[0] if embeddings else []
+
+
+async def generate_embeddings_async(
+    texts: List[str],
+    model: Optional[str] = None,
+    dimensions: Optional[int] = None,
+) -> List[List[float]]:
+    """
+    Async variant of generate_embeddings.
+
+    Args:
+        texts: List of text strings to embed
+        model: Embedding model; defaults to the active model
+        dimensions: Vector size; defaults to the active model's
+
+    Returns:
+        List of embedding vectors (each is a list of floats)
+    """
+    if not texts:
+        return []
+
+    if model is None:
+        state = await get_embedding_state_async()
+        model, dimensions = state.model, state.dimensions
+
+    client = get_async_embedding_client()
+
+    with EMBEDDING_SECONDS.time(provider=settings.llm_provider, kind=_kind(texts)):
+        response = await client.embeddings.create(**_request_params(texts, model, dimensions))
+
+    sorted_data = sorted(response.data, key=lambda x: x.index)
+    return [item.embedding for item in sorted_data]
+
+
+async def generate_embedding_async(
+    text: str,
+    model: Optional[str] = None,
+    dimensions: Optional[int] = None,
+) -> List[float]:
+    """
+    Async variant of generate_embedding.
+
+    Args:
+        text: Text string to embed
+        model: Embedding model; defaults to the active model
+        dimensions: Vector size; defaults to the active model's
 
     Returns:
         Embedding vector as a list of floats
     """
-    embeddings = generate_embeddings([text])
+    embeddings = await generate_embeddings_async([text], model, dimensions)
     return embeddings[0] if embeddings else []
@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import counter, gauge
+from app.core.supabase import get_async_supabase
+from app.services.admission import AdmissionRejected
+from app.services.ingestion.pipeline import JobLease, LeaseLost, process_document
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process in ingestion_jobs.locked_by
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+JOBS_FINISHED = counter(
+    "ingestion_jobs_finished_total",
+    "Ingestion jobs finished by this worker",
+    ["outcome"],
+)
+JOBS_SWEPT = counter(
+    "ingestion_jobs_swept_total",
+    "Jobs with expired leases requeued or failed by this worker's sweeper",
+)
+
+_running: Dict[str, asyncio.Task] = {}
+_worker_task: Optional[asyncio.Task] = None
+_sweeper_task: Optional[asyncio.Task] = None
+_wake: Optional[asyncio.Event] = None
+
+gauge(
+    "ingestion_jobs_running",
+    "Ingestion jobs currently held by this worker",
+    callback=lambda: [((), len(_running))],
+)
+
+
+class JobAlreadyQueued(Exception):
+    def __init__(self, job_id: str):
+        super().__init__("Document is already queued or being processed")
+        self.job_id = job_id
+
+
+async def enqueue_document(document_id: str, user_id: str) -> Optional[str]:
+    """
+    Queue a document for ingestion on whichever replica claims it first.
+
+    Returns:
+        The new job's ID, or None if the document was not found
+
+    Raises:
+        JobAlreadyQueued: If the document already has a queued or running job
+    """
+    client = await get_async_supabase()
+    response = await client.rpc(
+        "enqueue_ingestion_job",
+        {
+            "p_document_id": document_id,
+            "p_user_id": user_id,
+            "p_max_attempts": settings.ingestion_max_attempts,
+        },
+    ).execute()
+    if not response.data:
+        return None
+
+    job = response.data[0]
+    if not job["created"]:
+        raise JobAlreadyQueued(job["job_id"])
+    wake_worker()
+    return job["job_id"]
+
+
+def wake_worker() -> None:
+    """Claim now instead of at the next poll, e.g. right after an enqueue on this replica."""
+    if _wake is not None:
+        _wake.set()
+
+
+async def _finish(client, job_id: str, outcome: str, error: Optional[str] = None, retry_after: float = 0) -> None:
+    try:
+        held = await client.rpc(
+            "finish_ingestion_job",
+            {
+                "p_job_id": job_id,
+                "p_worker_id": WORKER_ID,
+                "p_status": outcome,
+                "p_error": error,
+                "p_retry_after_seconds": retry_after,
+            },
+        ).execute()
+        if not held.data:
+            logger.warning(f"Job {job_id} finished as {outcome} after its lease was lost")
+    except Exception as e:
+        # The lease will expire and the sweeper takes it from there
+        logger.warning(f"Failed to finish job {job_id}: {e}")
+    JOBS_FINISHED.inc(outcome=outcome)
+
+
+async def _heartbeat(client, job_id: str, work: asyncio.Task) -> None:
+    """
+    Extend the lease until the work is done; cancel the work if the lease is lost.
+
+    If heartbeats keep failing for a whole lease period, the lease has expired
+    and the sweeper may already have handed the job to another replica, so the
+    work is cancelled then too (its chunk writes are fenced by the lease anyway).
+    """
+    lease = settings.ingestion_lease_seconds
+    interval = lease / 3
+    # The claim itself started the lease
+    last_renewed = time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        attempted = time.monotonic()
+        try:
+            response = await client.rpc(
+                "heartbeat_ingestion_job",
+                {
+                    "p_job_id": job_id,
+                    "p_worker_id": WORKER_ID,
+                    "p_lease_seconds": settings.ingestion_lease_seconds,
+                },
+            ).execute()
+        except Exception as e:
+            if time.monotonic() - last_renewed >= lease:
+                logger.warning(
+                    f"No heartbeat for job {job_id} in {lease}s, stopping it; "
+                    f"another worker may own it now: {e}"
+                )
+                work.cancel()
+                return
+            # Transient; the lease has slack until a full period passes
+            logger.warning(f"Heartbeat failed for job {job_id}: {e}")
+            continue
+        if response.data:
+            # Renewed as of when the request was sent, not when it returned
+            last_renewed = attempted
+        else:
+            logger.warning(f"Lost the lease on job {job_id}; another worker may own it now")
+            work.cancel()
+            return
+
+
+async def _run_job(client, job: dict) -> None:
+    job_id = job["id"]
+    logger.info(f"Claimed job {job_id} for document {job['document_id']} (attempt {job['attempts']})")
+    lease = JobLease(job_id=job_id, worker_id=WORKER_ID)
+    work = asyncio.create_task(process_document(job["document_id"], job["user_id"], lease))
+    heartbeat = asyncio.create_task(_heartbeat(client, job_id, work))
+    try:
+        await asyncio.shield(work)
+    except LeaseLost as e:
+        # A chunk write was refused; the job and its document belong to another worker now
+        logger.warning(f"{e}; abandoning document {job['document_id']}")
+    except AdmissionRejected as e:
+        # Shed under load; runnable again once the backlog has had time to drain
+        await _finish(client, job_id, "queued", str(e), retry_after=e.retry_after)
+    except asyncio.CancelledError:
+        if heartbeat.done() and work.cancelled():
+            # The heartbeat stopped the work after losing the lease; the job is not ours
+            return
+        # Shutdown: stop the work and hand the job back so another replica picks it up now
+        work.cancel()
+        try:
+            await work
+        except BaseException:
+            pass
+        await _finish(client, job_id, "queued", "Worker shut down")
+        raise
+    except Exception as e:
+        # The pipeline already marked the document failed
+        await _finish(client, job_id, "failed", str(e))
+    else:
+        await _finish(client, job_id, "completed")
+    finally:
+        heartbeat.cancel()
+        _running.pop(job_id, None)
+        wake_worker()
+
+
+async def _claim_periodically() -> None:
+    while True:
+        free = settings.ingestion_worker_concurrency - len(_running)
+        if free > 0:
+            try:
+                client = await get_async_supabase()
+                response = await client.rpc(
+                    "claim_ingestion_jobs",
+                    {
+                        "p_worker_id": WORKER_ID,
+                        "p_limit": free,
+                        "p_lease_seconds": settings.ingestion_lease_seconds,
+                    },
+                ).execute()
+                for job in response.data or []:
+                    _running[job["id"]] = asyncio.create_task(_run_job(client, job))
+            except Exception as e:
+                logger.warning(f"Claiming ingestion jobs failed: {e}")
+
+        # Finished jobs and local enqueues wake us early; other replicas' enqueues wait for the poll
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=settings.ingestion_poll_interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+
+
+async def _sweep_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.ingestion_sweep_interval_seconds)
+        try:
+            client = await get_async_supabase()
+            response = await client.rpc("requeue_expired_ingestion_jobs", {}).execute()
+            swept = response.data or 0
+            if swept:
+                JOBS_SWEPT.inc(swept)
+                logger.info(f"Requeued {swept} ingestion jobs with expired leases")
+                wake_worker()
+        except Exception as e:
+            logger.warning(f"Ingestion lease sweep failed: {e}")
+
+
+async def start_ingestion_worker() -> None:
+    """Claim and run ingestion jobs in the background of this replica."""
+    global _worker_task, _sweeper_task, _wake
+    if not settings.ingestion_worker_enabled:
+        logger.info("Ingestion worker disabled on this replica")
+        return
+    _wake = asyncio.Event()
+    _worker_task = asyncio.create_task(_claim_periodically())
+    _sweeper_task = asyncio.create_task(_sweep_periodically())
+    logger.info(f"Ingestion worker {WORKER_ID} started (concurrency={settings.ingestion_worker_concurrency})")
+
+
+async def stop_ingestion_worker() -> None:
+    """Stop claiming and hand running jobs back to the queue."""
+    global _worker_task, _sweeper_task
+    for task in (_worker_task, _sweeper_task, *_running.values()):
+        if task is not None:
+            task.cancel()
+    for task in (_worker_task, _sweeper_task, *list(_running.values())):
+        if task is not None:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    _worker_task = _sweeper_task = None
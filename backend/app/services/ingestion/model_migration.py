@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from app.core.config import settings
+from app.core.supabase import get_async_supabase
+from app.services.admission import Priority, embedding_admission
+from app.services.ingestion.embeddings import generate_embeddings_async, get_embedding_state_async
+
+logger = logging.getLogger(__name__)
+
+# Admission "user" the backfill is accounted to, so it has its own per-user cap
+BACKFILL_USER = "embedding-backfill"
+
+# Called with (chunks_backfilled_so_far, chunks_in_last_batch) after each batch
+BatchCallback = Callable[[int, int], None]
+
+# pgvector's HNSW index on `vector` supports at most this many dimensions
+MAX_INDEXED_DIMENSIONS = 2000
+
+# CREATE INDEX CONCURRENTLY cannot run inside a function, so these are run
+# from psql or the SQL editor, one at a time, any time before finalize
+SHADOW_INDEX_STATEMENTS = (
+    "CREATE INDEX CONCURRENTLY idx_chunks_embedding_next "
+    "ON chunks USING hnsw (embedding_next vector_cosine_ops);",
+    "CREATE INDEX CONCURRENTLY idx_chunks_embedding_backfill "
+    "ON chunks (id) WHERE embedding_next IS NULL;",
+)
+
+
+@dataclass
+class MigrationStatus:
+    model: str
+    dimensions: int
+    target_model: Optional[str]
+    target_dimensions: Optional[int]
+    total_chunks: int
+    remaining_chunks: int
+
+    @property
+    def migrating(self) -> bool:
+        return self.target_model is not None
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of chunks that have a vector from the target model."""
+        if not self.total_chunks:
+            return 1.0
+        return 1 - self.remaining_chunks / self.total_chunks
+
+
+async def migration_status() -> MigrationStatus:
+    """Get the active and target models and how far the backfill has come."""
+    client = await get_async_supabase()
+    response = await client.rpc("embedding_migration_status", {}).execute()
+    row = response.data[0]
+    return MigrationStatus(
+        model=row["model"],
+        dimensions=row["dimensions"],
+        target_model=row["target_model"],
+        target_dimensions=row["target_dimensions"],
+        total_chunks=row["total_chunks"],
+        remaining_chunks=row["remaining_chunks"],
+    )
+
+
+async def begin_migration(model: str, dimensions: int) -> None:
+    """
+    Start migrating to another embedding model.
+
+    Adds the shadow column only; its indexes are built concurrently with
+    SHADOW_INDEX_STATEMENTS so ingestion inserts are never blocked. From the
+    next state refresh on, ingestion writes vectors from both models;
+    retrieval keeps using the active one until the migration is finalized.
+
+    Raises:
+        ValueError: If dimensions is not within 1..MAX_INDEXED_DIMENSIONS
+        Exception: If a migration is already in progress (raised by Postgres)
+    """
+    if not 1 <= dimensions <= MAX_INDEXED_DIMENSIONS:
+        raise ValueError(
+            f"Invalid dimensions: {dimensions} (HNSW indexes support 1 to "
+            f"{MAX_INDEXED_DIMENSIONS}; use the model's shortened vectors)"
+        )
+    client = await get_async_supabase()
+    await client.rpc(
+        "begin_embedding_migration", {"p_model": model, "p_dimensions": dimensions}
+    ).execute()
+    await get_embedding_state_async(refresh=True)
+    logger.info(f"Began embedding migration to {model} ({dimensions} dimensions)")
+
+
+async def shadow_indexes_ready() -> bool:
+    """Whether both shadow indexes have been built, so finalize can run."""
+    client = await get_async_supabase()
+    response = await client.rpc("embedding_migration_indexes_ready", {}).execute()
+    return bool(response.data)
+
+
+async def backfill_shadow_embeddings(on_batch: Optional[BatchCallback] = None) -> int:
+    """
+    Embed every chunk that has no target-model vector yet, in throttled batches.
+
+    Sweeps the chunks in id order and starts over until a full sweep finds
+    nothing left, which also picks up chunks inserted behind the cursor
+    before their replica noticed the migration. Each batch is embedded at
+    background priority and followed by embedding_backfill_pause_ms (or
+    longer, to stay under embedding_backfill_max_chunks_per_second), so chat
+    and new uploads keep the provider's capacity.
+
+    Args:
+        on_batch: Called after each batch, e.g. to report progress
+
+    Returns:
+        Number of chunks backfilled
+
+    Raises:
+        ValueError: If no migration is in progress
+    """
+    state = await get_embedding_state_async(refresh=True)
+    if not state.migrating:
+        raise ValueError("No embedding migration in progress")
+
+    client = await get_async_supabase()
+    batch_size = settings.embedding_backfill_batch_size
+    max_rate = settings.embedding_backfill_max_chunks_per_second
+    total = 0
+    after_id: Optional[str] = None
+
+    while True:
+        started = time.monotonic()
+        response = await client.rpc(
+            "next_chunks_to_backfill", {"p_after_id": after_id, "p_limit": batch_size}
+        ).execute()
+        rows = response.data or []
+        if not rows:
+            if after_id is None:
+                return total
+            # End of a sweep that found work; start over from the beginning
+            after_id = None
+            continue
+
+        async with embedding_admission.slot(BACKFILL_USER, Priority.BACKGROUND):
+            embeddings = await generate_embeddings_async(
+                [row["content"] for row in rows], state.target_model, state.target_dimensions
+            )
+        await client.rpc(
+            "set_shadow_embeddings",
+            {
+                "p_rows": [
+                    {"id": row["id"], "embedding": embedding}
+                    for row, embedding in zip(rows, embeddings)
+                ]
+            },
+        ).execute()
+
+        total += len(rows)
+        after_id = rows[-1]["id"]
+        if on_batch:
+            on_batch(total, len(rows))
+
+        pause = settings.embedding_backfill_pause_ms / 1000
+        if max_rate > 0:
+            pause = max(pause, len(rows) / max_rate - (time.monotonic() - started))
+        await asyncio.sleep(pause)
+
+
+async def finalize_migration() -> None:
+    """
+    Switch retrieval to the target model and drop the old vectors.
+
+    Postgres checks coverage and swaps the columns in one transaction, so it
+    either fails without changing anything or every reader moves over at
+    once; replicas still holding the old model are told so by the match
+    functions and re-embed their query.
+
+    Raises:
+        Exception: If chunks are left to backfill, the shadow indexes are
+            not built, or no migration is in progress (raised by Postgres)
+    """
+    client = await get_async_supabase()
+    await client.rpc("finalize_embedding_migration", {}).execute()
+    state = await get_embedding_state_async(refresh=True)
+    logger.info(f"Finalized embedding migration; chunks now use {state.model}")
+
+
+async def abort_migration() -> None:
+    """Drop the shadow vectors and keep the active model."""
+    client = await get_async_supabase()
+    await client.rpc("abort_embedding_migration", {}).execute()
+    await get_embedding_state_async(refresh=True)
+    logger.info("Aborted embedding migration")
@@ -1,17 +1,34 @@
+import asyncio
 import io
 import os
-from supabase import create_client
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
 
-from app.services.ingestion.chunker import chunk_text
-from app.services.ingestion.embeddings import generate_embeddings
+from app.core.profiling import profiled
+from app.core.supabase import download_object, get_async_supabase
+from app.services.admission import AdmissionRejected, Priority, embedding_admission
+from app.services.ingestion.chunker import Chunk, chunk_text
+from app.services.ingestion.embeddings import (
+    EmbeddingState,
+    generate_embeddings,
+    get_embedding_state_async,
+)
+from app.services.ingestion.progress import ProgressReporter
 
+# Called with (pages_done, pages_total) as PDF pages are extracted
+PageCallback = Callable[[int, int], None]
 
-def get_supabase_client():
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    if not url or not key:
-        raise ValueError("Supabase configuration missing")
-    return create_client(url, key)
+
+@dataclass(frozen=True)
+class JobLease:
+    """The ingestion job lease a document is processed under; fences its chunk writes."""
+
+    job_id: str
+    worker_id: str
+
+
+class LeaseLost(Exception):
+    """The job's lease expired; another worker may be processing the document now."""
 
 
 def sanitize_text(text: str) -> str:
@@ -24,22 +41,27 @@ def sanitize_text(text: str) -> str:
     return text
 
 
-def extract_text_from_pdf(content: bytes) -> str:
+def extract_text_from_pdf(content: bytes, on_page: Optional[PageCallback] = None) -> str:
     """Extract text from a PDF file using pypdf."""
     from pypdf import PdfReader
 
     reader = PdfReader(io.BytesIO(content))
     text_parts = []
+    total = len(reader.pages)
 
-    for page in reader.pages:
+    for number, page in enumerate(reader.pages, start=1):
         page_text = page.extract_text()
         if page_text:
             text_parts.append(page_text)
+        if on_page:
+            on_page(number, total)
 
     return "\n\n".join(text_parts)
 
 
-def extract_text_from_file(content: bytes, filename: str) -> str:
+def extract_text_from_file(
+    content: bytes, filename: str, on_page: Optional[PageCallback] = None
+) -> str:
     """Extract text content from a file based on its extension."""
     ext = os.path.splitext(filename)[1].lower()
 
@@ -50,7 +72,7 @@ def extract_text_from_file(content: bytes, filename: str) -> str:
     elif ext == ".csv":
         text = content.decode("utf-8")
     elif ext == ".pdf":
-        text = extract_text_from_pdf(content)
+        text = extract_text_from_pdf(content, on_page)
     else:
         raise ValueError(f"Unsupported file type: {ext}")
 
@@ -58,18 +80,137 @@ def extract_text_from_file(content: bytes, filename: str) -> str:
     return sanitize_text(text)
 
 
-async def process_document(document_id: str, user_id: str) -> None:
+def build_chunk_records(
+    chunks: List[Chunk],
+    embeddings: List[List[float]],
+    document_id: str,
+    user_id: str,
+    filename: str,
+    shadow_embeddings: Optional[List[List[float]]] = None,
+) -> List[dict]:
+    """
+    Build rows for the chunks table from chunks and their embeddings.
+
+    Args:
+        chunks: Chunks in the batch
+        embeddings: One embedding per chunk, in the same order
+        document_id: The ID of the source document
+        user_id: The ID of the user who owns the document
+        filename: Stored in each chunk's metadata for citations
+        shadow_embeddings: Embeddings from the migration target model, if
+            an embedding migration is in progress
+
+    Returns:
+        List of row dicts ready for insert
+    """
+    records = [
+        {
+            "document_id": document_id,
+            "user_id": user_id,
+            "content": chunk.content,
+            "embedding": embedding,
+            "metadata": {
+                **chunk.metadata,
+                "filename": filename,
+            },
+            "chunk_index": chunk.index,
+        }
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
+    if shadow_embeddings is not None:
+        for record, shadow in zip(records, shadow_embeddings):
+            record["embedding_next"] = shadow
+    return records
+
+
+async def embed_batch(
+    texts: List[str], user_id: str, state: EmbeddingState
+) -> Tuple[List[List[float]], Optional[List[List[float]]]]:
+    """
+    Embed chunk texts with the active model, and with the target model too
+    while an embedding migration runs, so new chunks never need a backfill.
+
+    Returns:
+        (embeddings, shadow_embeddings); the latter is None outside a migration
+    """
+    # Background priority so chat queries for the same provider are served first
+    async with embedding_admission.slot(user_id, Priority.BACKGROUND):
+        embeddings = await asyncio.to_thread(
+            generate_embeddings, texts, state.model, state.dimensions
+        )
+        shadow = None
+        if state.migrating:
+            shadow = await asyncio.to_thread(
+                generate_embeddings, texts, state.target_model, state.target_dimensions
+            )
+    return embeddings, shadow
+
+
+async def write_chunks(
+    client,
+    document_id: str,
+    records: List[dict],
+    lease: Optional[JobLease] = None,
+    replace: bool = False,
+) -> None:
+    """
+    Insert chunk rows, first deleting the document's existing chunks if `replace`.
+
+    Under a job lease the write goes through write_document_chunks, which
+    refuses once the lease is no longer held, so a worker that fell behind on
+    heartbeats cannot write alongside the replica that took the job over.
+
+    Raises:
+        LeaseLost: If the lease is no longer held
+    """
+    if lease is None:
+        if replace:
+            await client.table("chunks").delete().eq("document_id", document_id).execute()
+        if records:
+            await client.table("chunks").insert(records).execute()
+        return
+
+    try:
+        await client.rpc(
+            "write_document_chunks",
+            {
+                "p_job_id": lease.job_id,
+                "p_worker_id": lease.worker_id,
+                "p_rows": records,
+                "p_replace": replace,
+            },
+        ).execute()
+    except Exception as e:
+        if "Lost the lease" in str(e):
+            raise LeaseLost(f"Lost the lease on ingestion job {lease.job_id}") from e
+        raise
+
+
+async def process_document(
+    document_id: str, user_id: str, lease: Optional[JobLease] = None
+) -> None:
     """
     Process a document: download, chunk, embed, and store in pgvector.
 
     Args:
         document_id: The ID of the document to process
         user_id: The ID of the user who owns the document
+        lease: The job lease it runs under; chunk writes fail once it is lost
+
+    Raises:
+        LeaseLost: If the lease was lost; the document is left to its new owner
     """
-    client = get_supabase_client()
+    async with profiled(f"process_document-{document_id}"):
+        await _process_document(document_id, user_id, lease)
+
+
+async def _process_document(document_id: str, user_id: str, lease: Optional[JobLease]) -> None:
+    # Every replica runs this next to chat streams and the job heartbeat, so
+    # database calls are async and CPU-bound steps run in worker threads
+    client = await get_async_supabase()
 
     # Get document record
-    doc_response = (
+    doc_response = await (
         client.table("documents")
         .select("*")
         .eq("id", document_id)
@@ -80,60 +221,92 @@ async def process_document(document_id: str, user_id: str) -> None:
         raise ValueError("Document not found")
 
     doc = doc_response.data[0]
+    if doc.get("deleted_at"):
+        # Tombstoned while queued; the reaper owns it now
+        raise ValueError("Document was deleted")
+    progress = ProgressReporter(client, document_id)
 
     try:
         # Download file from storage
-        file_content = client.storage.from_("documents").download(doc["storage_path"])
+        progress.stage("download")
+        file_content = await download_object(
+            "documents",
+            doc["storage_path"],
+            on_progress=lambda done, total: progress.update(
+                bytes_downloaded=done, bytes_total=total
+            ),
+        )
+        progress.update(bytes_downloaded=len(file_content), bytes_total=len(file_content))
 
         # Extract text
-        text = extract_text_from_file(file_content, doc["filename"])
+        progress.stage("extract")
+        text = await asyncio.to_thread(
+            extract_text_from_file,
+            file_content,
+            doc["filename"],
+            lambda done, total: progress.update(pages_extracted=done, pages_total=total),
+        )
 
         if not text.strip():
             raise ValueError("No text content extracted from file")
 
         # Chunk the text
-        chunks = chunk_text(text)
+        progress.stage("chunk")
+        chunks = await asyncio.to_thread(chunk_text, text)
 
         if not chunks:
             raise ValueError("No chunks created from text")
 
         # Delete existing chunks for this document (in case of reprocessing)
-        client.table("chunks").delete().eq("document_id", document_id).execute()
+        await write_chunks(client, document_id, [], lease, replace=True)
 
         # Generate embeddings in batches
         batch_size = 100
         total_chunks = 0
+        progress.stage(
+            "embedding", chunks_total=len(chunks), chunks_embedded=0, chunks_inserted=0
+        )
 
+        # Start every document from the current model; batches then use the cached state
+        await get_embedding_state_async(refresh=True)
         for i in range(0, len(chunks), batch_size):
             batch = chunks[i : i + batch_size]
             texts = [c.content for c in batch]
 
             # Generate embeddings for batch
-            embeddings = generate_embeddings(texts)
-
-            # Prepare chunk records
-            chunk_records = []
-            for j, (chunk, embedding) in enumerate(zip(batch, embeddings)):
-                chunk_records.append(
-                    {
-                        "document_id": document_id,
-                        "user_id": user_id,
-                        "content": chunk.content,
-                        "embedding": embedding,
-                        "metadata": {
-                            **chunk.metadata,
-                            "filename": doc["filename"],
-                        },
-                        "chunk_index": chunk.index,
-                    }
-                )
+            state = await get_embedding_state_async()
+            embeddings, shadow = await embed_batch(texts, user_id, state)
+            progress.update(chunks_embedded=i + len(batch))
 
             # Insert chunks
-            client.table("chunks").insert(chunk_records).execute()
+            chunk_records = build_chunk_records(
+                batch, embeddings, document_id, user_id, doc["filename"], shadow
+            )
+            try:
+                await write_chunks(client, document_id, chunk_records, lease)
+            except LeaseLost:
+                raise
+            except Exception:
+                # A migration began or was finalized since the state was
+                # loaded, so the vector columns differ; embed again to match
+                fresh = await get_embedding_state_async(refresh=True)
+                if fresh == state:
+                    raise
+                embeddings, shadow = await embed_batch(texts, user_id, fresh)
+                chunk_records = build_chunk_records(
+                    batch, embeddings, document_id, user_id, doc["filename"], shadow
+                )
+                await write_chunks(client, document_id, chunk_records, lease)
             total_chunks += len(chunk_records)
+            progress.update(
+                chunks_inserted=total_chunks,
+                eta_seconds=progress.estimate_eta(total_chunks, len(chunks)),
+            )
+
+        await progress.finish()
 
         # Update document status to completed
-        client.table("documents").update(
+        await client.table("documents").update(
             {
                 "status": "completed",
                 "chunk_count": total_chunks,
@@ -141,9 +314,19 @@ async def process_document(document_id: str, user_id: str) -> None:
             }
         ).eq("id", document_id).execute()
 
+    except LeaseLost:
+        # Not a processing error, and the document's status belongs to the new owner
+        await progress.discard()
+        raise
+    except AdmissionRejected:
+        # Shed under load, not a processing error; it can be retried later
+        await progress.finish("queued")
+        await client.table("documents").update({"status": "pending"}).eq("id", document_id).execute()
+        raise
     except Exception as e:
+        await progress.finish("failed")
         # Update document status to failed
-        client.table("documents").update(
+        await client.table("documents").update(
             {
                 "status": "failed",
                 "error_message": str(e),
@@ -0,0 +1,123 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import INGESTION_STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressReporter:
+    """
+    Tracks ingestion progress for one document and writes it to `documents.progress`.
+
+    Updates are merged in memory and written at most once per `min_interval`
+    seconds. Stage changes and the final state are written right away (or by
+    the write already in flight), so the stored progress never lags more than
+    one interval behind.
+
+    Writes go through the async client from a single writer task, so
+    reporting never blocks the event loop and lands in order. `update()` may
+    be called from worker threads (e.g. PDF extraction in asyncio.to_thread);
+    those calls are handed to the loop.
+
+    Stored shape:
+        {
+            "stage": "embedding",
+            "bytes_total": 1048576, "bytes_downloaded": 1048576,
+            "pages_total": 40, "pages_extracted": 40,
+            "chunks_total": 300, "chunks_embedded": 200, "chunks_inserted": 100,
+            "eta_seconds": 12.5,
+            "timings": {"download": 0.41, "extract": 2.10, ...}
+        }
+    """
+
+    def __init__(self, client, document_id: str, min_interval: Optional[float] = None):
+        # Async Supabase client; must be created on the running loop
+        self.client = client
+        self.document_id = document_id
+        self.min_interval = (
+            min_interval if min_interval is not None else settings.ingestion_progress_interval_seconds
+        )
+        self.state: Dict = {"stage": None, "timings": {}}
+        self._stage_started = time.monotonic()
+        self._last_write = 0.0
+        self._dirty = False
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._writer: Optional[asyncio.Task] = None
+
+    def stage(self, name: str, **fields) -> None:
+        """Close the current stage's timing, start a new one and write right away."""
+        self._close_stage()
+        self.state["stage"] = name
+        self.state.update(fields)
+        self._dirty = True
+        self._schedule_write()
+
+    def update(self, **fields) -> None:
+        """Record progress; written only if the throttle interval has passed."""
+        if threading.get_ident() != self._loop_thread:
+            self._loop.call_soon_threadsafe(functools.partial(self.update, **fields))
+            return
+        self.state.update(fields)
+        self._dirty = True
+        if time.monotonic() - self._last_write >= self.min_interval:
+            self._schedule_write()
+
+    def estimate_eta(self, done: int, total: int) -> Optional[float]:
+        """Seconds left in the current stage, extrapolated from its rate so far."""
+        elapsed = time.monotonic() - self._stage_started
+        if done <= 0 or elapsed <= 0:
+            return None
+        return round((total - done) * elapsed / done, 1)
+
+    async def finish(self, stage: str = "done") -> None:
+        self._close_stage()
+        self.state["stage"] = stage
+        self.state["eta_seconds"] = None
+        self._dirty = True
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write any pending progress and wait until it is stored."""
+        self._schedule_write()
+        if self._writer is not None:
+            await self._writer
+
+    async def discard(self) -> None:
+        """Drop unwritten progress and wait for a write already in flight."""
+        self._dirty = False
+        if self._writer is not None:
+            await self._writer
+
+    def _schedule_write(self) -> None:
+        if self._dirty and (self._writer is None or self._writer.done()):
+            self._writer = asyncio.create_task(self._write_pending())
+
+    async def _write_pending(self) -> None:
+        # Updates made while a write is in flight are picked up by the next pass
+        while self._dirty:
+            snapshot = {**self.state, "timings": dict(self.state["timings"])}
+            self._dirty = False
+            self._last_write = time.monotonic()
+            try:
+                await self.client.table("documents").update({"progress": snapshot}).eq(
+                    "id", self.document_id
+                ).execute()
+            except Exception as e:
+                # Progress is best effort; never fail ingestion over it
+                logger.warning(f"Progress update failed for document {self.document_id}: {e}")
+
+    def _close_stage(self) -> None:
+        now = time.monotonic()
+        current = self.state["stage"]
+        if current is not None:
+            elapsed = now - self._stage_started
+            self.state["timings"][current] = round(elapsed, 3)
+            INGESTION_STAGE_SECONDS.observe(elapsed, stage=current)
+        self._stage_started = now
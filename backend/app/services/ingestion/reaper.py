@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.metrics import counter
+from app.core.supabase import get_async_supabase
+from app.services.ingestion.jobs import WORKER_ID
+
+logger = logging.getLogger(__name__)
+
+# Storage accepts at most this many paths per remove call
+STORAGE_REMOVE_LIMIT = 1000
+
+CHUNKS_REAPED = counter(
+    "reaper_chunks_deleted_total",
+    "Chunks of tombstoned documents deleted by the reaper",
+)
+DOCUMENTS_REAPED = counter(
+    "reaper_documents_deleted_total",
+    "Tombstoned documents fully removed by the reaper",
+)
+
+_reaper_task: Optional[asyncio.Task] = None
+_wake: Optional[asyncio.Event] = None
+
+
+async def reap_document_chunks(client, document_id: str) -> int:
+    """
+    Delete a tombstoned document's chunks in bounded batches.
+
+    Each batch is its own short statement, so the HNSW index updates and row
+    locks never pile up in a single long transaction. Each batch also extends
+    this replica's lease on the tombstone, and fails once the lease is lost.
+
+    Args:
+        client: Async Supabase client
+        document_id: The ID of a tombstoned document claimed by this replica
+
+    Returns:
+        Number of chunks deleted
+    """
+    batch_size = settings.reaper_chunk_batch_size
+    total = 0
+    while True:
+        response = await client.rpc(
+            "reap_document_chunks",
+            {
+                "p_document_id": document_id,
+                "p_worker_id": WORKER_ID,
+                "p_batch_size": batch_size,
+                "p_lease_seconds": settings.reaper_lease_seconds,
+            },
+        ).execute()
+        deleted = response.data or 0
+        total += deleted
+        CHUNKS_REAPED.inc(deleted)
+        if deleted < batch_size:
+            return total
+        await asyncio.sleep(settings.reaper_batch_pause_ms / 1000)
+
+
+async def reap_once() -> int:
+    """
+    Fully remove one pass worth of tombstoned documents.
+
+    Tombstones are claimed under a lease first, so replicas reaping at the
+    same time work on different documents. Chunks go first, then the storage
+    objects in one bulk call, then the document rows (which cascades to the
+    tombstones and thread attachments).
+
+    Returns:
+        Number of documents removed
+    """
+    client = await get_async_supabase()
+    response = await client.rpc(
+        "claim_tombstones",
+        {
+            "p_worker_id": WORKER_ID,
+            "p_limit": settings.reaper_documents_per_pass,
+            "p_lease_seconds": settings.reaper_lease_seconds,
+        },
+    ).execute()
+    tombstones = response.data or []
+    if not tombstones:
+        return 0
+
+    reaped: List[dict] = []
+    for tombstone in tombstones:
+        try:
+            chunks = await reap_document_chunks(client, tombstone["document_id"])
+            reaped.append(tombstone)
+            logger.info(f"Reaped {chunks} chunks of document {tombstone['document_id']}")
+        except Exception as e:
+            # Left in place; retried here or elsewhere once the lease expires
+            logger.warning(f"Failed to reap chunks of {tombstone['document_id']}: {e}")
+
+    if not reaped:
+        return 0
+
+    paths = [t["storage_path"] for t in reaped]
+    for i in range(0, len(paths), STORAGE_REMOVE_LIMIT):
+        batch = paths[i : i + STORAGE_REMOVE_LIMIT]
+        try:
+            await client.storage.from_("documents").remove(batch)
+        except Exception as e:
+            # An orphaned object is harmless; a stuck tombstone is not
+            logger.warning(f"Failed to remove {len(batch)} storage objects: {e}")
+
+    # Only rows this replica still holds; a lost lease means another replica finishes them
+    response = await client.rpc(
+        "finish_reaped_documents",
+        {"p_worker_id": WORKER_ID, "p_document_ids": [t["document_id"] for t in reaped]},
+    ).execute()
+    removed = len(response.data or [])
+    DOCUMENTS_REAPED.inc(removed)
+    return removed
+
+
+def wake_reaper() -> None:
+    """Start a pass now instead of at the next interval, e.g. right after a delete."""
+    if _wake is not None:
+        _wake.set()
+
+
+async def _reap_periodically() -> None:
+    while True:
+        try:
+            reaped = await reap_once()
+        except Exception as e:
+            logger.warning(f"Reaper pass failed: {e}")
+            reaped = 0
+        if reaped >= settings.reaper_documents_per_pass:
+            # Backlog left; keep going without waiting
+            continue
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=settings.reaper_interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+
+
+async def start_reaper() -> None:
+    """Run the tombstone reaper in the background of this worker."""
+    global _reaper_task, _wake
+    _wake = asyncio.Event()
+    _reaper_task = asyncio.create_task(_reap_periodically())
+
+
+async def stop_reaper() -> None:
+    global _reaper_task
+    if _reaper_task is not None:
+        _reaper_task.cancel()
+        try:
+            await _reaper_task
+        except asyncio.CancelledError:
+            pass
+        _reaper_task = None
@@ -1,4 +1,12 @@
-from app.services.llm.client import stream_chat, get_client
-from app.services.llm.types import ChatMessage
+from app.services.llm.client import stream_chat, stream_chat_async, get_client, get_async_client, expected_model
+from app.services.llm.types import ChatMessage, StreamInfo
 
-__all__ = ["stream_chat", "get_client", "ChatMessage"]
+__all__ = [
+    "stream_chat",
+    "stream_chat_async",
+    "get_client",
+    "get_async_client",
+    "expected_model",
+    "ChatMessage",
+    "StreamInfo",
+]
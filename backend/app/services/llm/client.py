@@ -1,16 +1,21 @@
+import asyncio
 import logging
-from typing import Generator, List, Optional
+import time
+from typing import AsyncGenerator, Generator, List, Optional
 import openai
 from langsmith.wrappers import wrap_openai
 from langsmith import traceable
 
 from app.core.config import settings
+from app.core.metrics import LLM_STREAM_SECONDS, LLM_TTFT_SECONDS
 from app.services.llm.config import get_provider_config
-from app.services.llm.types import ChatMessage
+from app.services.llm.router import get_router
+from app.services.llm.types import ChatMessage, StreamInfo
 
 logger = logging.getLogger(__name__)
 
 _client = None
+_async_client = None
 
 
 def get_client() -> openai.OpenAI:
@@ -29,6 +34,22 @@ def get_client() -> openai.OpenAI:
     return _client
 
 
+def get_async_client() -> openai.AsyncOpenAI:
+    global _async_client
+    if _async_client is None:
+        config = get_provider_config()
+        base_client = openai.AsyncOpenAI(
+            api_key=config.api_key,
+            base_url=config.base_url,
+            default_headers=config.extra_headers,
+        )
+        if settings.langsmith_enabled and settings.langsmith_api_key:
+            _async_client = wrap_openai(base_client)
+        else:
+            _async_client = base_client
+    return _async_client
+
+
 SYSTEM_PROMPT = """You are a helpful AI assistant. You can help users with a variety of tasks including answering questions, providing information, and assisting with problem-solving.
 
 Be concise but thorough in your responses. If you're unsure about something, say so. If a question is unclear, ask for clarification.
@@ -53,6 +74,39 @@ Instructions:
 - Be concise but thorough"""
 
 
+def build_messages(
+    messages: List[ChatMessage],
+    context: Optional[str] = None,
+    summary: Optional[str] = None,
+) -> List[dict]:
+    """Build the provider message list, including the system prompt."""
+    # Use context-aware system prompt if context is provided
+    if context:
+        system_content = SYSTEM_PROMPT_WITH_CONTEXT.format(context=context)
+        logger.info(f"Using RAG context in system prompt ({len(context)} chars)")
+    else:
+        system_content = SYSTEM_PROMPT
+        logger.info("No RAG context provided, using default system prompt")
+
+    full_messages = [{"role": "system", "content": system_content}]
+    if summary:
+        full_messages.append(
+            {"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}
+        )
+    full_messages.extend({"role": m.role, "content": m.content} for m in messages)
+    return full_messages
+
+
+def expected_model() -> str:
+    """The model the next completion should come from: the router's top-ranked backend, if routing."""
+    router = get_router()
+    if router is not None:
+        ranked = router.ranked()
+        if ranked:
+            return ranked[0].model
+    return settings.llm_model
+
+
 @traceable(name="chat_completion")
 def stream_chat(
     messages: List[ChatMessage],
@@ -66,25 +120,70 @@ def stream_chat(
     """
     client = get_client()
 
-    # Use context-aware system prompt if context is provided
-    if context:
-        system_content = SYSTEM_PROMPT_WITH_CONTEXT.format(context=context)
-        logger.info(f"Using RAG context in system prompt ({len(context)} chars)")
-    else:
-        system_content = SYSTEM_PROMPT
-        logger.info("No RAG context provided, using default system prompt")
-
-    full_messages = [
-        {"role": "system", "content": system_content},
-        *[{"role": m.role, "content": m.content} for m in messages],
-    ]
-
     stream = client.chat.completions.create(
         model=settings.llm_model,
-        messages=full_messages,
+        messages=build_messages(messages, context),
         stream=True,
     )
 
     for chunk in stream:
         if chunk.choices and chunk.choices[0].delta.content:
             yield chunk.choices[0].delta.content
+
+
+@traceable(name="chat_completion")
+async def stream_chat_async(
+    messages: List[ChatMessage],
+    context: Optional[str] = None,
+    summary: Optional[str] = None,
+    info: Optional[StreamInfo] = None,
+) -> AsyncGenerator[str, None]:
+    """Stream chat completion without blocking the event loop. Returns content chunks.
+
+    Closing the generator (or cancelling the task consuming it) closes the
+    HTTP response, which aborts the upstream completion. When
+    LLM_ROUTER_PROVIDERS is set, the request goes through the provider router.
+
+    Args:
+        messages: List of chat messages
+        context: Optional RAG context to include in the system prompt
+        summary: Optional rolling summary of turns no longer in `messages`
+        info: Filled in with the provider and model that answered
+    """
+    full_messages = build_messages(messages, context, summary)
+
+    router = get_router()
+    if router is not None:
+        async for delta in router.stream(full_messages, info):
+            yield delta
+        return
+
+    if info is not None:
+        info.provider, info.model = settings.llm_provider, settings.llm_model
+
+    client = get_async_client()
+    labels = {"provider": settings.llm_provider, "model": settings.llm_model}
+    started = time.perf_counter()
+    first = True
+    outcome = "error"
+
+    try:
+        stream = await client.chat.completions.create(
+            model=settings.llm_model,
+            messages=full_messages,
+            stream=True,
+        )
+
+        async with stream:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first:
+                        LLM_TTFT_SECONDS.observe(time.perf_counter() - started, **labels)
+                        first = False
+                    yield chunk.choices[0].delta.content
+        outcome = "ok"
+    except (asyncio.CancelledError, GeneratorExit):
+        outcome = "cancelled"
+        raise
+    finally:
+        LLM_STREAM_SECONDS.observe(time.perf_counter() - started, outcome=outcome, **labels)
@@ -10,18 +10,21 @@ class ProviderConfig:
     extra_headers: Optional[Dict[str, str]] = None
 
 
-def get_provider_config() -> ProviderConfig:
-    if settings.llm_provider == "openai":
+def get_provider_config(provider: Optional[str] = None) -> ProviderConfig:
+    """Build the connection config for a provider (defaults to settings.llm_provider)."""
+    provider = provider or settings.llm_provider
+
+    if provider == "openai":
         if not settings.openai_api_key:
             raise ValueError(
                 "OPENAI_API_KEY is required when LLM_PROVIDER=openai. "
                 "Add it to your .env file."
             )
         return ProviderConfig(
-            base_url="https://api.openai.com/v1",
+            base_url=settings.openai_base_url,
             api_key=settings.openai_api_key,
         )
-    elif settings.llm_provider == "openrouter":
+    elif provider == "openrouter":
         if not settings.openrouter_api_key:
             raise ValueError(
                 "OPENROUTER_API_KEY is required when LLM_PROVIDER=openrouter. "
@@ -33,22 +36,22 @@ def get_provider_config() -> ProviderConfig:
         if settings.openrouter_app_name:
             headers["X-Title"] = settings.openrouter_app_name
         return ProviderConfig(
-            base_url="https://openrouter.ai/api/v1",
+            base_url=settings.openrouter_base_url,
             api_key=settings.openrouter_api_key,
             extra_headers=headers or None,
         )
-    elif settings.llm_provider == "ollama":
+    elif provider == "ollama":
         return ProviderConfig(
             base_url=settings.ollama_base_url,
             api_key="ollama",
         )
-    elif settings.llm_provider == "lmstudio":
+    elif provider == "lmstudio":
         return ProviderConfig(
             base_url=settings.lmstudio_base_url,
             api_key="lm-studio",
         )
     else:
         raise ValueError(
-            f"Unknown LLM provider: {settings.llm_provider}. "
+            f"Unknown LLM provider: {provider}. "
             f"Valid options: openai, openrouter, ollama, lmstudio"
         )
@@ -0,0 +1,210 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+from app.core.config import settings
+from app.services.llm.client import get_async_client
+from app.services.llm.router import get_router
+from app.services.llm.tokens import CHARS_PER_TOKEN, estimate_tokens
+from app.services.llm.types import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+# Per-message overhead (role, separators) added by chat completion formatting
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an AI assistant.
+
+Update the existing summary with the new messages below. Keep facts, decisions, names, numbers and open questions. Drop pleasantries. Write at most {max_words} words in plain prose.
+
+## EXISTING SUMMARY
+
+{summary}
+
+## NEW MESSAGES
+
+{messages}"""
+
+
+@dataclass
+class ConversationHistory:
+    messages: List[ChatMessage]
+    summary: Optional[str] = None
+    # Messages that fell out of the token window and are not in the summary yet
+    overflow: List[dict] = field(default_factory=list)
+    # Oldest message row kept verbatim in the window
+    oldest_kept: Optional[dict] = None
+    # The fetch hit history_fetch_limit, so older unsummarized messages may exist
+    truncated: bool = False
+
+    @property
+    def needs_summary_update(self) -> bool:
+        return bool(self.overflow) or self.truncated
+
+
+def fit_history(
+    rows: List[dict],
+    thread_metadata: Optional[dict],
+    truncated: bool = False,
+    token_budget: Optional[int] = None,
+) -> ConversationHistory:
+    """
+    Keep the most recent messages that fit in the token budget.
+
+    Args:
+        rows: Message rows in chronological order, newest last
+        thread_metadata: The thread's metadata (may hold the rolling summary)
+        truncated: Whether the fetch was cut off by history_fetch_limit
+        token_budget: Defaults to settings.history_token_budget
+
+    Returns:
+        The messages to send, the current summary, and the rows that overflowed
+    """
+    budget = token_budget if token_budget is not None else settings.history_token_budget
+    summary = (thread_metadata or {}).get("summary")
+    if summary:
+        budget -= estimate_tokens(summary) + MESSAGE_OVERHEAD_TOKENS
+
+    kept = []
+    used = 0
+    for row in reversed(rows):
+        cost = estimate_tokens(row["content"]) + MESSAGE_OVERHEAD_TOKENS
+        # Always keep the latest message, even if it alone is over budget
+        if kept and used + cost > budget:
+            break
+        kept.append(row)
+        used += cost
+    kept.reverse()
+
+    overflow = rows[: len(rows) - len(kept)]
+    return ConversationHistory(
+        messages=[ChatMessage(role=r["role"], content=r["content"]) for r in kept],
+        summary=summary,
+        overflow=overflow,
+        oldest_kept=kept[0] if kept else None,
+        truncated=truncated,
+    )
+
+
+async def summarize(previous_summary: Optional[str], rows: List[dict], max_words: int = 250) -> str:
+    """
+    Fold new messages into the previous summary with a single completion.
+
+    When LLM_ROUTER_PROVIDERS is set, the completion goes through the provider
+    router (with each backend's own model) so it gets the same failover as chat.
+    """
+    transcript = "\n".join(f"{r['role'].upper()}: {r['content']}" for r in rows)
+    messages = [
+        {
+            "role": "user",
+            "content": SUMMARY_PROMPT.format(
+                max_words=max_words,
+                summary=previous_summary or "(none yet)",
+                messages=transcript,
+            ),
+        }
+    ]
+
+    router = get_router()
+    if router is not None:
+        return "".join([delta async for delta in router.stream(messages)]).strip()
+
+    client = get_async_client()
+    response = await client.chat.completions.create(
+        model=settings.history_summary_model or settings.llm_model,
+        messages=messages,
+    )
+    return (response.choices[0].message.content or "").strip()
+
+
+def _summary_batches(rows: List[dict], token_budget: int) -> Iterator[List[dict]]:
+    """Split rows, oldest first, into runs that fit one summarize() call."""
+    batch: List[dict] = []
+    used = 0
+    for row in rows:
+        cost = estimate_tokens(row["content"]) + MESSAGE_OVERHEAD_TOKENS
+        if cost > token_budget:
+            # A single huge message is cut rather than blowing the context window
+            row = {**row, "content": row["content"][: token_budget * CHARS_PER_TOKEN]}
+            cost = token_budget
+        if batch and used + cost > token_budget:
+            yield batch
+            batch, used = [], 0
+        batch.append(row)
+        used += cost
+    if batch:
+        yield batch
+
+
+async def _fetch_gap_page(client, thread_id: str, since: Optional[str], until: str) -> List[dict]:
+    """Read the oldest unsummarized messages before the kept window, one page at a time."""
+    query = (
+        client.table("messages")
+        .select("id, role, content, created_at")
+        .eq("thread_id", thread_id)
+        .lt("created_at", until)
+    )
+    if since:
+        query = query.gt("created_at", since)
+    response = await (
+        query.order("created_at", desc=False).limit(settings.history_fetch_limit).execute()
+    )
+    return response.data
+
+
+async def update_summary(
+    client,
+    thread_id: str,
+    thread_metadata: Optional[dict],
+    history: ConversationHistory,
+) -> None:
+    """
+    Fold messages that left the window into the thread's rolling summary.
+
+    Only the messages between the previous summary and the oldest kept
+    message are summarized, so each turn does incremental work. Long gaps
+    (threads that predate summaries) are folded in bounded batches, oldest
+    first, and `summary_through` is saved after each one, so a turn that
+    stops at history_summary_max_batches leaves the rest for the next turn.
+    """
+    if not history.needs_summary_update or history.oldest_kept is None:
+        return
+
+    metadata = thread_metadata or {}
+    batches_left = settings.history_summary_max_batches
+    folded = 0
+
+    while batches_left > 0:
+        if history.truncated:
+            # The window was cut by the fetch limit; page through the gap up to the oldest kept message
+            rows = await _fetch_gap_page(
+                client, thread_id, metadata.get("summary_through"), history.oldest_kept["created_at"]
+            )
+        else:
+            rows = history.overflow
+        if not rows:
+            break
+
+        for batch in _summary_batches(rows, settings.history_summary_batch_tokens):
+            if batches_left == 0:
+                break
+            try:
+                summary = await summarize(metadata.get("summary"), batch)
+            except Exception as e:
+                logger.error(f"Summary update failed for thread {thread_id}: {e}", exc_info=True)
+                return
+
+            metadata = {
+                **metadata,
+                "summary": summary,
+                "summary_through": batch[-1]["created_at"],
+            }
+            await client.table("threads").update({"metadata": metadata}).eq("id", thread_id).execute()
+            batches_left -= 1
+            folded += len(batch)
+
+        if not history.truncated or len(rows) < settings.history_fetch_limit:
+            break
+
+    if folded:
+        logger.info(f"Folded {folded} messages into summary for thread {thread_id}")
@@ -0,0 +1,349 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, List, Optional
+
+import openai
+
+from app.core.config import settings
+from app.core.metrics import LLM_STREAM_SECONDS, LLM_TTFT_SECONDS
+from app.services.llm.config import get_provider_config
+from app.services.llm.types import StreamInfo
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest time-to-first-token sample in the rolling average
+TTFT_EWMA_ALPHA = 0.3
+# Number of recent requests used for the error rate
+ERROR_WINDOW = 20
+
+_router: Optional["ProviderRouter"] = None
+_router_built = False
+
+
+class NoBackendAvailable(Exception):
+    pass
+
+
+@dataclass
+class BackendStats:
+    ttft_ewma: Optional[float] = None
+    outcomes: deque = field(default_factory=lambda: deque(maxlen=ERROR_WINDOW))
+    consecutive_failures: int = 0
+    opened_until: float = 0.0
+    # Past the cooldown, one request probes the backend before it takes traffic again
+    probing: bool = False
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class ProviderBackend:
+    """One OpenAI-compatible endpoint with its own health statistics."""
+
+    def __init__(self, name: str, model: str, client: openai.AsyncOpenAI):
+        self.name = name
+        self.model = model
+        self.client = client
+        self.stats = BackendStats()
+
+    def is_available(self, now: float) -> bool:
+        # Closed, or past the cooldown with no probe in flight (half-open)
+        return now >= self.stats.opened_until and not self.stats.probing
+
+    def claim(self, now: float) -> bool:
+        """
+        Reserve a request on this backend.
+
+        A half-open backend admits a single probe; everyone else is refused
+        until it succeeds (closing the circuit) or fails (reopening it). An
+        open backend is only handed out when every backend is open, so it is
+        not refused here.
+        """
+        stats = self.stats
+        if stats.opened_until == 0.0 or now < stats.opened_until:
+            return True
+        if stats.probing:
+            return False
+        stats.probing = True
+        logger.info(f"Probing LLM backend {self.name} after its cooldown")
+        return True
+
+    def score(self) -> float:
+        # Lower is better, in seconds. Backends with no samples yet score 0 so
+        # they get tried; errors both scale the latency and add a flat penalty.
+        ttft = self.stats.ttft_ewma or 0.0
+        error_rate = self.stats.error_rate
+        return ttft * (1 + 4 * error_rate) + error_rate
+
+    def _observe_ttft(self, ttft: float) -> None:
+        stats = self.stats
+        stats.ttft_ewma = ttft if stats.ttft_ewma is None else (
+            TTFT_EWMA_ALPHA * ttft + (1 - TTFT_EWMA_ALPHA) * stats.ttft_ewma
+        )
+
+    def record_slow(self, elapsed: float) -> None:
+        # Missed the hedge deadline: its first token takes at least `elapsed`
+        self._observe_ttft(elapsed)
+
+    def release_probe(self, task: asyncio.Task) -> None:
+        # A cancelled probe (possibly before it even started) proves nothing;
+        # let the next request probe instead
+        if task.cancelled():
+            self.stats.probing = False
+
+    def record_success(self, ttft: float) -> None:
+        stats = self.stats
+        self._observe_ttft(ttft)
+        stats.outcomes.append(True)
+        stats.consecutive_failures = 0
+        stats.opened_until = 0.0
+        stats.probing = False
+
+    def record_failure(self, failure_threshold: int, cooldown: float, probe: bool = False) -> None:
+        stats = self.stats
+        stats.outcomes.append(False)
+        stats.consecutive_failures += 1
+        if probe:
+            # A failed probe reopens the circuit: the count is still past the threshold
+            stats.probing = False
+        if stats.consecutive_failures >= failure_threshold:
+            stats.opened_until = time.monotonic() + cooldown
+            logger.warning(
+                f"Circuit open for LLM backend {self.name} for {cooldown:.0f}s "
+                f"after {stats.consecutive_failures} consecutive failures"
+            )
+
+
+@dataclass
+class _OpenedStream:
+    backend: ProviderBackend
+    stream: openai.AsyncStream
+    first_text: str
+
+
+class ProviderRouter:
+    """
+    Routes each completion to the fastest healthy backend.
+
+    Backends are ranked by rolling time-to-first-token, penalized by recent
+    error rate. If the first token does not arrive within `hedge_ms`, a second
+    request goes to the next backend and whichever answers first wins. A
+    backend that fails `failure_threshold` times in a row is skipped for
+    `cooldown_seconds`, then gets a single probe request before it takes
+    traffic again.
+    """
+
+    def __init__(
+        self,
+        backends: List[ProviderBackend],
+        hedge_ms: int = 0,
+        failure_threshold: int = 3,
+        cooldown_seconds: float = 30,
+    ):
+        if not backends:
+            raise ValueError("ProviderRouter needs at least one backend")
+        self.backends = backends
+        self.hedge = hedge_ms / 1000
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown_seconds
+
+    def ranked(self) -> List[ProviderBackend]:
+        now = time.monotonic()
+        healthy = [b for b in self.backends if b.is_available(now)]
+        if healthy:
+            return sorted(healthy, key=lambda b: b.score())
+        # Everything is open: try the backend whose cooldown ends first, unless
+        # it is already being probed
+        idle = [b for b in self.backends if not b.stats.probing]
+        return sorted(idle, key=lambda b: b.stats.opened_until)
+
+    async def _open(
+        self, backend: ProviderBackend, messages: List[dict], probe: bool = False
+    ) -> _OpenedStream:
+        """Start a completion and wait for its first content delta."""
+        started = time.monotonic()
+        stream = None
+        try:
+            stream = await backend.client.chat.completions.create(
+                model=backend.model,
+                messages=messages,
+                stream=True,
+            )
+            first_text = ""
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    first_text = chunk.choices[0].delta.content
+                    break
+        except asyncio.CancelledError:
+            # Lost a hedge race or the client went away; not a failure, and
+            # says nothing about latency (the hedge deadline records that)
+            if stream is not None:
+                await stream.close()
+            raise
+        except Exception:
+            if stream is not None:
+                await stream.close()
+            backend.record_failure(self.failure_threshold, self.cooldown, probe)
+            raise
+
+        ttft = time.monotonic() - started
+        backend.record_success(ttft)
+        LLM_TTFT_SECONDS.observe(ttft, provider=backend.name, model=backend.model)
+        return _OpenedStream(backend=backend, stream=stream, first_text=first_text)
+
+    async def _acquire(self, candidates: List[ProviderBackend], messages: List[dict]) -> _OpenedStream:
+        """
+        Get a stream that has produced its first token.
+
+        Starts with the best candidate. If it has not produced a token within
+        the hedge deadline, one hedged request goes to the next candidate. Any
+        request that fails is replaced by the next untried candidate.
+        """
+        queue = list(candidates)
+        tasks = {}
+        hedged = False
+        last_error: Optional[BaseException] = None
+
+        def launch() -> Optional[ProviderBackend]:
+            # Skips half-open backends whose single probe another request holds
+            while queue:
+                backend = queue.pop(0)
+                if backend.claim(time.monotonic()):
+                    # claim() only sets probing for the request that holds the probe
+                    probe = backend.stats.probing
+                    task = asyncio.create_task(self._open(backend, messages, probe))
+                    if probe:
+                        task.add_done_callback(backend.release_probe)
+                    tasks[task] = backend
+                    return backend
+            return None
+
+        if launch() is None:
+            raise NoBackendAvailable("All LLM backends are open and being probed")
+        try:
+            while tasks:
+                timeout = self.hedge if self.hedge > 0 and queue and not hedged else None
+                done, _ = await asyncio.wait(
+                    tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    hedged = True
+                    for slow_backend in tasks.values():
+                        slow_backend.record_slow(self.hedge)
+                    slow = ", ".join(b.name for b in tasks.values())
+                    backend = launch()
+                    if backend is None:
+                        continue
+                    logger.info(
+                        f"No first token from {slow} after {self.hedge * 1000:.0f}ms, "
+                        f"hedging to {backend.name}"
+                    )
+                    continue
+
+                winner = None
+                for task in done:
+                    backend = tasks.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        logger.warning(f"LLM backend {backend.name} failed before first token: {last_error}")
+                        launch()
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        await task.result().stream.close()
+
+                if winner is not None:
+                    return winner
+
+            raise NoBackendAvailable(f"All LLM backends failed: {last_error}") from last_error
+        finally:
+            # Cancel the losing request; if it finished anyway, close its stream
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.wait(tasks)
+                for task in tasks:
+                    if not task.cancelled() and task.exception() is None:
+                        await task.result().stream.close()
+
+    async def stream(
+        self, messages: List[dict], info: Optional[StreamInfo] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Stream content deltas, failing over before the first token if needed.
+
+        `info`, if given, is filled in with the backend that won before the
+        first delta is yielded.
+        """
+        started = time.perf_counter()
+        opened = await self._acquire(self.ranked(), messages)
+
+        backend = opened.backend
+        if info is not None:
+            info.provider, info.model = backend.name, backend.model
+        logger.info(f"Streaming from LLM backend {backend.name} ({backend.model})")
+        outcome = "error"
+        try:
+            if opened.first_text:
+                yield opened.first_text
+            async for chunk in opened.stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+            outcome = "ok"
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        except Exception:
+            # Tokens were already sent, so there is no failover mid-stream
+            backend.record_failure(self.failure_threshold, self.cooldown)
+            raise
+        finally:
+            await opened.stream.close()
+            LLM_STREAM_SECONDS.observe(
+                time.perf_counter() - started,
+                provider=backend.name,
+                model=backend.model,
+                outcome=outcome,
+            )
+
+
+def build_router() -> Optional[ProviderRouter]:
+    """Build a router from settings, or None if routing is not configured."""
+    names = [n.strip() for n in settings.llm_router_providers.split(",") if n.strip()]
+    if not names:
+        return None
+
+    backends = []
+    for name in names:
+        config = get_provider_config(name)
+        client = openai.AsyncOpenAI(
+            api_key=config.api_key,
+            base_url=config.base_url,
+            default_headers=config.extra_headers,
+            # The router does its own failover, so don't retry inside the SDK
+            max_retries=0,
+        )
+        model = settings.llm_router_models.get(name, settings.llm_model)
+        backends.append(ProviderBackend(name=name, model=model, client=client))
+
+    return ProviderRouter(
+        backends,
+        hedge_ms=settings.llm_router_hedge_ms,
+        failure_threshold=settings.llm_router_failure_threshold,
+        cooldown_seconds=settings.llm_router_cooldown_seconds,
+    )
+
+
+def get_router() -> Optional[ProviderRouter]:
+    global _router, _router_built
+    if not _router_built:
+        _router = build_router()
+        _router_built = True
+    return _router
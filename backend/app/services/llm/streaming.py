@@ -0,0 +1,88 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+import anyio
+
+from app.core.config import settings
+
+# SSE uses \n as its delimiter, so newlines are escaped in one translate pass
+_SSE_ESCAPES = str.maketrans({"\n": "\\n", "\r": "\\r"})
+
+
+def encode_sse_data(text: str) -> str:
+    """Escape newlines so a frame fits on a single SSE data line."""
+    return text.translate(_SSE_ESCAPES)
+
+
+async def replay_text(text: str, frame_chars: Optional[int] = None) -> AsyncIterator[str]:
+    """Stream stored text back in frame-sized pieces, like a live response."""
+    size = frame_chars or settings.sse_coalesce_max_chars
+    for start in range(0, len(text), size):
+        yield text[start : start + size]
+        await asyncio.sleep(0)
+
+
+async def coalesce_deltas(
+    deltas: AsyncIterator[str],
+    window_ms: Optional[int] = None,
+    max_chars: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    Group provider deltas into larger frames.
+
+    The first delta is sent immediately so time-to-first-token is unchanged.
+    After that, deltas are buffered and the frame is flushed by the first
+    delta that arrives once `window_ms` has passed since the buffer started,
+    or as soon as the buffer reaches `max_chars`; the end of the stream
+    flushes whatever is left. A window of 0 passes deltas through untouched.
+
+    Deadlines are checked as deltas arrive rather than with a timer, so the
+    source is read in this one loop with no extra task or wakeup per frame;
+    the cost is that buffered text can wait one provider gap past the window.
+
+    Args:
+        deltas: Source of text deltas (e.g. stream_chat_async)
+        window_ms: Coalescing window; defaults to settings.sse_coalesce_window_ms
+        max_chars: Flush threshold; defaults to settings.sse_coalesce_max_chars
+    """
+    window = (window_ms if window_ms is not None else settings.sse_coalesce_window_ms) / 1000
+    limit = max_chars if max_chars is not None else settings.sse_coalesce_max_chars
+
+    try:
+        if window <= 0:
+            async for delta in deltas:
+                yield delta
+            return
+
+        clock = asyncio.get_running_loop().time
+        buffer = []
+        size = 0
+        deadline = 0.0
+        first = True
+
+        async for delta in deltas:
+            if first:
+                first = False
+                yield delta
+                continue
+
+            if not buffer:
+                deadline = clock() + window
+            buffer.append(delta)
+            size += len(delta)
+
+            if size >= limit or clock() >= deadline:
+                frame = "".join(buffer)
+                buffer.clear()
+                size = 0
+                yield frame
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        # Make sure the source unwinds (closing any upstream HTTP stream) even
+        # when the consumer is cancelled mid-read
+        aclose = getattr(deltas, "aclose", None)
+        if aclose is not None:
+            with anyio.CancelScope(shield=True):
+                await aclose()
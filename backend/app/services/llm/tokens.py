@@ -0,0 +1,28 @@
+from functools import lru_cache
+
+# Rough characters-per-token ratio for English text with OpenAI-style tokenizers
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def _get_encoder():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Count tokens in a string.
+
+    Uses tiktoken when it is installed, otherwise falls back to a
+    characters-per-token estimate.
+    """
+    if not text:
+        return 0
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
@@ -1,7 +1,16 @@
+from dataclasses import dataclass
 from pydantic import BaseModel
-from typing import Literal
+from typing import Literal, Optional
 
 
 class ChatMessage(BaseModel):
     role: Literal["user", "assistant"]
     content: str
+
+
+@dataclass
+class StreamInfo:
+    """Filled in by stream_chat_async with the backend that actually answered."""
+
+    provider: Optional[str] = None
+    model: Optional[str] = None
@@ -1,3 +1,4 @@
-from app.services.retrieval.search import retrieve_context
+from app.services.retrieval.search import retrieve_context, retrieve_context_async
+from app.services.retrieval.packer import pack_chunks
 
-__all__ = ["retrieve_context"]
+__all__ = ["retrieve_context", "retrieve_context_async", "pack_chunks"]
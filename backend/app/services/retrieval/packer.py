@@ -0,0 +1,187 @@
+import re
+from collections import defaultdict
+from dataclasses import replace
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.services.llm.tokens import CHARS_PER_TOKEN, estimate_tokens
+from app.services.retrieval.search import RetrievedChunk
+
+# Tokens taken by the "[Source N: filename]" header and separator around each passage
+PASSAGE_OVERHEAD_TOKENS = 16
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _span(chunk: RetrievedChunk) -> tuple:
+    start = chunk.metadata.get("start_char")
+    end = chunk.metadata.get("end_char")
+    return start, end
+
+
+def _sort_key(chunk: RetrievedChunk) -> tuple:
+    start, _ = _span(chunk)
+    index = chunk.chunk_index if chunk.chunk_index is not None else 0
+    return (start if start is not None else index, index)
+
+
+def _is_neighbor(current: RetrievedChunk, current_end: Optional[int], chunk: RetrievedChunk) -> bool:
+    start, _ = _span(chunk)
+    if current_end is not None and start is not None:
+        return start <= current_end
+    if current.chunk_index is not None and chunk.chunk_index is not None:
+        return chunk.chunk_index - current.metadata.get("last_chunk_index", current.chunk_index) == 1
+    return False
+
+
+def _stitch(left: str, right: str, overlap: int) -> str:
+    """Join two chunk texts, dropping the characters they share."""
+    # The chunker's last chunk can claim offsets past the end of the document, so a
+    # trailing chunk that sits entirely inside the previous one is only visible by text
+    if right in left[-(max(overlap, len(right)) + 1):]:
+        return left
+    if overlap > 0:
+        # chunk_text strips each chunk, so the shared run can be off by a character
+        max_k = min(len(left), len(right), overlap + 1)
+        min_k = max(1, overlap // 2)
+        for k in range(max_k, min_k - 1, -1):
+            if left.endswith(right[:k]):
+                return left + right[k:]
+        return f"{left} … {right}"
+    return f"{left} {right}"
+
+
+def merge_neighbors(chunks: List[RetrievedChunk]) -> List[RetrievedChunk]:
+    """
+    Merge overlapping or contiguous chunks of the same document into single passages.
+
+    Uses the `start_char`/`end_char` offsets written by the chunker, falling back
+    to consecutive `chunk_index` values when offsets are missing.
+    """
+    by_document: Dict[str, List[RetrievedChunk]] = defaultdict(list)
+    for chunk in chunks:
+        by_document[chunk.document_id].append(chunk)
+
+    merged = []
+    for doc_chunks in by_document.values():
+        doc_chunks.sort(key=_sort_key)
+
+        current = None
+        current_end = None
+        for chunk in doc_chunks:
+            start, end = _span(chunk)
+
+            if current is not None and _is_neighbor(current, current_end, chunk):
+                if end is not None and current_end is not None and end <= current_end:
+                    content = current.content  # fully contained in the current passage
+                else:
+                    overlap = current_end - start if current_end is not None and start is not None else 0
+                    content = _stitch(current.content, chunk.content, overlap)
+
+                current = replace(
+                    current,
+                    content=content,
+                    similarity=max(current.similarity, chunk.similarity),
+                    rerank_score=max(
+                        (s for s in (current.rerank_score, chunk.rerank_score) if s is not None),
+                        default=None,
+                    ),
+                    metadata={
+                        **current.metadata,
+                        "end_char": max(current_end or 0, end or 0) if end is not None else current_end,
+                        "last_chunk_index": chunk.chunk_index,
+                        "chunk_ids": current.metadata["chunk_ids"] + [chunk.id],
+                    },
+                )
+                current_end = current.metadata["end_char"]
+                continue
+
+            if current is not None:
+                merged.append(current)
+            current = replace(
+                chunk,
+                metadata={
+                    **chunk.metadata,
+                    "last_chunk_index": chunk.chunk_index,
+                    "chunk_ids": [chunk.id],
+                },
+            )
+            current_end = end
+
+        if current is not None:
+            merged.append(current)
+
+    return merged
+
+
+def _relevance(chunk: RetrievedChunk) -> float:
+    return chunk.rerank_score if chunk.rerank_score is not None else chunk.similarity
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def pack_chunks(
+    chunks: List[RetrievedChunk],
+    token_budget: Optional[int] = None,
+    mmr_lambda: Optional[float] = None,
+) -> List[RetrievedChunk]:
+    """
+    Build the set of passages that goes into the prompt.
+
+    Merges neighboring chunks, then picks passages with maximal marginal
+    relevance (relevance traded off against lexical overlap with passages
+    already picked) until the token budget is full.
+
+    Args:
+        chunks: Retrieved chunks, in any order
+        token_budget: Maximum prompt tokens for the context; defaults to settings.context_token_budget
+        mmr_lambda: 1.0 ranks purely by relevance, lower values favor diversity
+
+    Returns:
+        Passages in the order they should appear in the prompt
+    """
+    if not chunks:
+        return []
+
+    budget = token_budget if token_budget is not None else settings.context_token_budget
+    lam = mmr_lambda if mmr_lambda is not None else settings.context_mmr_lambda
+
+    passages = merge_neighbors(chunks)
+
+    # Normalize relevance so cross-encoder and cosine scores behave the same
+    scores = [_relevance(p) for p in passages]
+    low, high = min(scores), max(scores)
+    spread = (high - low) or 1.0
+    relevance = [(s - low) / spread for s in scores]
+
+    words = [set(_WORD_RE.findall(p.content.lower())) for p in passages]
+    costs = [estimate_tokens(p.content) + PASSAGE_OVERHEAD_TOKENS for p in passages]
+
+    selected: List[int] = []
+    remaining = set(range(len(passages)))
+    used = 0
+
+    while remaining:
+        best, best_score = None, None
+        for i in remaining:
+            redundancy = max((_jaccard(words[i], words[j]) for j in selected), default=0.0)
+            score = lam * relevance[i] - (1 - lam) * redundancy
+            if best_score is None or score > best_score:
+                best, best_score = i, score
+
+        remaining.discard(best)
+        if used + costs[best] <= budget:
+            selected.append(best)
+            used += costs[best]
+        elif not selected:
+            # Always include something: trim the best passage to fit
+            keep_chars = max(0, budget - PASSAGE_OVERHEAD_TOKENS) * CHARS_PER_TOKEN
+            passages[best] = replace(passages[best], content=passages[best].content[:keep_chars])
+            selected.append(best)
+            break
+
+    return [passages[i] for i in selected]
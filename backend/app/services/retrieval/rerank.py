@@ -0,0 +1,141 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from cachetools import LRUCache
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_model = None
+_model_lock = threading.Lock()
+
+_score_cache: Optional[LRUCache] = None
+_cache_lock = threading.Lock()
+
+# Rolling estimate of how long one batch takes, used to stop before the budget is blown
+_batch_seconds: Optional[float] = None
+
+
+def get_reranker():
+    """Load the cross-encoder from disk once and keep it on CPU."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                if not settings.rerank_model_path:
+                    raise ValueError(
+                        "RERANK_MODEL_PATH is required when RERANK_ENABLED=true. "
+                        "Point it at a local cross-encoder model directory."
+                    )
+                try:
+                    from sentence_transformers import CrossEncoder
+                except ImportError as e:
+                    raise RuntimeError(
+                        "RERANK_ENABLED=true needs sentence-transformers. "
+                        "Install it with `pip install -r requirements-rerank.txt`."
+                    ) from e
+
+                _model = CrossEncoder(settings.rerank_model_path, device="cpu")
+                logger.info(f"Loaded reranker from {settings.rerank_model_path}")
+    return _model
+
+
+def _get_score_cache() -> LRUCache:
+    global _score_cache
+    if _score_cache is None:
+        _score_cache = LRUCache(maxsize=settings.rerank_cache_size)
+    return _score_cache
+
+
+def _query_key(query: str) -> str:
+    return hashlib.sha1(query.encode("utf-8")).hexdigest()
+
+
+def score_pairs(query: str, chunks: List, budget_ms: Optional[int] = None) -> Optional[List[float]]:
+    """
+    Score (query, chunk) pairs with the cross-encoder in batches.
+
+    Args:
+        query: The search query
+        chunks: Candidate chunks (anything with `id` and `content`)
+        budget_ms: Latency budget; defaults to settings.rerank_latency_budget_ms
+
+    Returns:
+        One score per chunk, or None if the budget ran out before all pairs were scored
+    """
+    global _batch_seconds
+
+    budget = (budget_ms if budget_ms is not None else settings.rerank_latency_budget_ms) / 1000
+    started = time.perf_counter()
+    cache = _get_score_cache()
+    query_key = _query_key(query)
+
+    scores: List[Optional[float]] = [None] * len(chunks)
+    missing = []
+    with _cache_lock:
+        for i, chunk in enumerate(chunks):
+            cached = cache.get((query_key, chunk.id))
+            if cached is None:
+                missing.append(i)
+            else:
+                scores[i] = cached
+
+    if missing:
+        model = get_reranker()
+        batch_size = settings.rerank_batch_size
+
+        for b in range(0, len(missing), batch_size):
+            elapsed = time.perf_counter() - started
+            if elapsed + (_batch_seconds or 0) > budget:
+                logger.info(
+                    f"Rerank budget exceeded after {elapsed * 1000:.0f}ms "
+                    f"({b}/{len(missing)} pairs scored), skipping rerank"
+                )
+                return None
+
+            batch = missing[b : b + batch_size]
+            batch_started = time.perf_counter()
+            batch_scores = model.predict(
+                [(query, chunks[i].content) for i in batch],
+                batch_size=batch_size,
+                show_progress_bar=False,
+            )
+            took = time.perf_counter() - batch_started
+            _batch_seconds = took if _batch_seconds is None else 0.8 * _batch_seconds + 0.2 * took
+
+            with _cache_lock:
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = float(score)
+                    cache[(query_key, chunks[i].id)] = scores[i]
+
+    return scores
+
+
+def rerank_chunks(query: str, chunks: List, top_n: int) -> List:
+    """
+    Reorder retrieved chunks by cross-encoder relevance and keep the best `top_n`.
+
+    Falls back to the original vector-similarity order if scoring fails or
+    exceeds the latency budget.
+    """
+    if len(chunks) <= 1:
+        return chunks[:top_n]
+
+    try:
+        scores = score_pairs(query, chunks)
+    except Exception as e:
+        logger.error(f"Rerank failed, using vector order: {e}", exc_info=True)
+        scores = None
+
+    if scores is None:
+        return chunks[:top_n]
+
+    for chunk, score in zip(chunks, scores):
+        chunk.rerank_score = score
+
+    ranked = sorted(chunks, key=lambda c: c.rerank_score, reverse=True)
+    return ranked[:top_n]
@@ -1,9 +1,19 @@
-import os
-from typing import List, Optional
+import asyncio
+from typing import List, Optional, Tuple
+from uuid import UUID
 from dataclasses import dataclass
-from supabase import create_client
 
-from app.services.ingestion.embeddings import generate_embedding
+from app.core.config import settings
+from app.core.metrics import RETRIEVAL_MATCH_SECONDS, RETRIEVAL_RERANK_SECONDS
+from app.core.supabase import get_async_supabase, get_supabase
+from app.models.retrieval import RetrievalFilters
+from app.services.ingestion.embeddings import (
+    generate_embedding,
+    generate_embedding_async,
+    get_embedding_state,
+    get_embedding_state_async,
+)
+from app.services.retrieval.rerank import rerank_chunks
 
 
 @dataclass
@@ -13,14 +23,79 @@ class RetrievedChunk:
     content: str
     metadata: dict
     similarity: float
+    chunk_index: Optional[int] = None
+    rerank_score: Optional[float] = None
 
 
-def get_supabase_client():
-    url = os.getenv("SUPABASE_URL")
-    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    if not url or not key:
-        raise ValueError("Supabase configuration missing")
-    return create_client(url, key)
+def _resolve_scope(
+    filters: Optional[RetrievalFilters],
+    scope_document_ids: Optional[List[str]],
+) -> Tuple[Optional[str], Optional[RetrievalFilters]]:
+    """Pick the match function and fold the thread's document set into the filters.
+
+    Returns (None, None) when the scope and filters exclude every document.
+    """
+    if not scope_document_ids:
+        return "match_chunks", filters
+
+    scope = {UUID(doc_id) for doc_id in scope_document_ids}
+    if filters and filters.document_ids is not None:
+        scope &= set(filters.document_ids)
+    if not scope:
+        return None, None
+    filters = (filters or RetrievalFilters()).model_copy(
+        update={"document_ids": sorted(scope)}
+    )
+    return "match_chunks_scoped", filters
+
+
+def candidate_count(match_count: int) -> int:
+    """Chunks fetched from the vector search to return `match_count` of them."""
+    if settings.rerank_enabled:
+        return match_count * settings.rerank_candidate_multiplier
+    return match_count
+
+
+def _build_match_params(
+    query_embedding: List[float],
+    query_model: str,
+    user_id: str,
+    match_count: int,
+    filters: Optional[RetrievalFilters],
+) -> dict:
+    params = {
+        "query_embedding": query_embedding,
+        "query_model": query_model,
+        "match_count": candidate_count(match_count),
+        "filter_user_id": user_id,
+    }
+    if filters:
+        params.update(filters.to_rpc_params())
+    return params
+
+
+def _is_model_mismatch(error: Exception) -> bool:
+    # Raised by the match functions when the chunks were re-embedded with
+    # another model after our cached state was loaded
+    return "Embedding model mismatch" in str(error)
+
+
+def _rows_to_chunks(rows: Optional[list], similarity_threshold: float) -> List[RetrievedChunk]:
+    """Filter by similarity threshold and convert to dataclass."""
+    chunks = []
+    for row in rows or []:
+        if row["similarity"] >= similarity_threshold:
+            chunks.append(
+                RetrievedChunk(
+                    id=row["id"],
+                    document_id=row["document_id"],
+                    content=row["content"],
+                    metadata=row["metadata"] or {},
+                    similarity=row["similarity"],
+                    chunk_index=row.get("chunk_index"),
+                )
+            )
+    return chunks
 
 
 def retrieve_context(
@@ -28,52 +103,145 @@ def retrieve_context(
     user_id: str,
     match_count: int = 5,
     similarity_threshold: float = 0.5,
+    filters: Optional[RetrievalFilters] = None,
+    scope_document_ids: Optional[List[str]] = None,
 ) -> List[RetrievedChunk]:
     """
     Retrieve relevant context from the vector store.
 
+    When reranking is enabled, `match_count * rerank_candidate_multiplier`
+    candidates are fetched and the cross-encoder keeps the best
+    `rerank_top_n` of them.
+
     Args:
         query: The search query
         user_id: The user ID to filter chunks by
         match_count: Maximum number of chunks to return
         similarity_threshold: Minimum similarity score (0-1)
+        filters: Optional structured filters, applied inside match_chunks
+        scope_document_ids: Documents attached to the thread; when set, only
+            these are searched via match_chunks_scoped
 
     Returns:
         List of retrieved chunks sorted by relevance
     """
-    # Generate embedding for the query
-    query_embedding = generate_embedding(query)
-
-    if not query_embedding:
+    rpc_name, filters = _resolve_scope(filters, scope_document_ids)
+    if rpc_name is None:
         return []
 
-    client = get_supabase_client()
+    client = get_supabase()
+    state = get_embedding_state()
 
-    # Call the match_chunks function
-    response = client.rpc(
-        "match_chunks",
-        {
-            "query_embedding": query_embedding,
-            "match_count": match_count,
-            "filter_user_id": user_id,
-        },
-    ).execute()
+    for attempt in range(2):
+        # Generate embedding for the query
+        query_embedding = generate_embedding(query, state.model, state.dimensions)
 
-    if not response.data:
+        if not query_embedding:
+            return []
+
+        # Call the match_chunks (or match_chunks_scoped) function
+        params = _build_match_params(query_embedding, state.model, user_id, match_count, filters)
+        try:
+            with RETRIEVAL_MATCH_SECONDS.time(rpc=rpc_name):
+                response = client.rpc(rpc_name, params).execute()
+            break
+        except Exception as e:
+            if attempt or not _is_model_mismatch(e):
+                raise
+            # An embedding migration was just finalized; embed again with the new model
+            state = get_embedding_state(refresh=True)
+
+    chunks = _rows_to_chunks(response.data, similarity_threshold)
+
+    if settings.rerank_enabled:
+        with RETRIEVAL_RERANK_SECONDS.time():
+            return rerank_chunks(query, chunks, top_n=min(settings.rerank_top_n, match_count))
+
+    return chunks
+
+
+async def match_candidates_async(
+    query: str,
+    user_id: str,
+    match_count: int,
+    filters: Optional[RetrievalFilters] = None,
+    scope_document_ids: Optional[List[str]] = None,
+    client=None,
+    query_embedding: Optional[List[float]] = None,
+) -> List[RetrievedChunk]:
+    """
+    Vector search only: the candidates retrieve_context_async thresholds and
+    reranks, most similar first.
+
+    Args:
+        query: The search query (embedded if no query_embedding is given)
+        user_id: The user ID to filter chunks by
+        match_count: Final result count; rerank_candidate_multiplier times
+            as many candidates are fetched when reranking is enabled
+        filters: Optional structured filters, applied inside match_chunks
+        scope_document_ids: Documents attached to the thread
+        client: Optional AsyncClient to reuse
+        query_embedding: Optional precomputed query embedding (from the
+            active model)
+
+    Returns:
+        Candidate chunks sorted by similarity, without a threshold applied
+    """
+    rpc_name, filters = _resolve_scope(filters, scope_document_ids)
+    if rpc_name is None:
         return []
 
-    # Filter by similarity threshold and convert to dataclass
-    chunks = []
-    for row in response.data:
-        if row["similarity"] >= similarity_threshold:
-            chunks.append(
-                RetrievedChunk(
-                    id=row["id"],
-                    document_id=row["document_id"],
-                    content=row["content"],
-                    metadata=row["metadata"] or {},
-                    similarity=row["similarity"],
-                )
+    if client is None:
+        client = await get_async_supabase()
+    state = await get_embedding_state_async()
+
+    for attempt in range(2):
+        if query_embedding is None:
+            query_embedding = await generate_embedding_async(query, state.model, state.dimensions)
+
+        if not query_embedding:
+            return []
+
+        params = _build_match_params(query_embedding, state.model, user_id, match_count, filters)
+        try:
+            with RETRIEVAL_MATCH_SECONDS.time(rpc=rpc_name):
+                response = await client.rpc(rpc_name, params).execute()
+            return _rows_to_chunks(response.data, -1.0)
+        except Exception as e:
+            if attempt or not _is_model_mismatch(e):
+                raise
+            # An embedding migration was just finalized; embed again with the new model
+            state = await get_embedding_state_async(refresh=True)
+            query_embedding = None
+    return []
+
+
+async def retrieve_context_async(
+    query: str,
+    user_id: str,
+    match_count: int = 5,
+    similarity_threshold: float = 0.5,
+    filters: Optional[RetrievalFilters] = None,
+    scope_document_ids: Optional[List[str]] = None,
+    client=None,
+    query_embedding: Optional[List[float]] = None,
+) -> List[RetrievedChunk]:
+    """
+    Async variant of retrieve_context that never blocks the event loop.
+
+    Takes the same arguments, plus an optional AsyncClient to reuse and an
+    optional precomputed query embedding (from the active model). The
+    cross-encoder (CPU bound) runs in a worker thread.
+    """
+    candidates = await match_candidates_async(
+        query, user_id, match_count, filters, scope_document_ids, client, query_embedding
+    )
+    chunks = [c for c in candidates if c.similarity >= similarity_threshold]
+
+    if settings.rerank_enabled:
+        with RETRIEVAL_RERANK_SECONDS.time():
+            return await asyncio.to_thread(
+                rerank_chunks, query, chunks, min(settings.rerank_top_n, match_count)
             )
 
     return chunks
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""Benchmark the CPU-bound ingestion stages.
+
+Runs text extraction, sanitize_text, chunk_text and build_chunk_records over
+synthetic corpora (large txt, CSV, JSON and a multi-hundred-page PDF) plus
+any fixture files given with --fixtures. Reports throughput (MB/s, chunks/s)
+and peak traced memory per stage, writes the results as JSON and compares
+them to a stored baseline, exiting non-zero if any stage got slower than the
+tolerance allows.
+
+Usage (from backend/):
+    python -m benchmarks.ingestion --save-baseline
+    python -m benchmarks.ingestion --tolerance 0.15 --output results.json
+    python -m benchmarks.ingestion --fixtures ~/docs --pdf-pages 500
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Settings are loaded on import; the benchmark does not talk to Supabase
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_ANON_KEY", "benchmark")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "benchmark")
+
+from app.services.ingestion.chunker import chunk_text  # noqa: E402
+from app.services.ingestion.pipeline import (  # noqa: E402
+    build_chunk_records,
+    extract_text_from_file,
+    sanitize_text,
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "ingestion.json")
+FIXTURE_EXTENSIONS = {".txt", ".md", ".pdf", ".json", ".csv"}
+EMBEDDING_DIMENSIONS = 1536
+BATCH_SIZE = 100
+MB = 1024 * 1024
+
+WORDS = [
+    "retrieval", "augmented", "generation", "vector", "chunk", "embedding", "context",
+    "answer", "model", "index", "query", "document", "similarity", "token", "latency",
+]
+
+
+def make_sentences(rng: random.Random):
+    while True:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+        yield " ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"])
+
+
+def make_txt(size: int, rng: random.Random) -> bytes:
+    parts, total = [], 0
+    sentences = make_sentences(rng)
+    while total < size:
+        paragraph = " ".join(next(sentences) for _ in range(rng.randint(3, 8)))
+        # A sprinkling of control characters gives sanitize_text something to do
+        if rng.random() < 0.05:
+            paragraph += "\x0c\x00"
+        parts.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(parts).encode()
+
+
+def make_csv(size: int, rng: random.Random) -> bytes:
+    rows, total = ["id,title,score,description"], 0
+    sentences = make_sentences(rng)
+    while total < size:
+        row = f"{len(rows)},{rng.choice(WORDS)},{rng.random():.4f},\"{next(sentences)}\""
+        rows.append(row)
+        total += len(row) + 1
+    return "\n".join(rows).encode()
+
+
+def make_json(size: int, rng: random.Random) -> bytes:
+    records, total = [], 0
+    sentences = make_sentences(rng)
+    while total < size:
+        record = {
+            "id": len(records),
+            "tags": rng.sample(WORDS, 3),
+            "body": " ".join(next(sentences) for _ in range(3)),
+        }
+        records.append(record)
+        total += len(record["body"]) + 60
+    return json.dumps(records, indent=2).encode()
+
+
+def make_pdf(pages: int, rng: random.Random, lines_per_page: int = 45) -> bytes:
+    """Write a minimal multi-page PDF with one Helvetica text stream per page."""
+    sentences = make_sentences(rng)
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",  # Pages, filled in once the kids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for _ in range(pages):
+        lines = []
+        for _ in range(lines_per_page):
+            line = next(sentences)[:95]
+            lines.append(line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)"))
+        body = "BT /F1 10 Tf 12 TL 40 760 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        stream = body.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids),
+        len(kids),
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def build_corpora(args) -> List[Tuple[str, str, bytes]]:
+    """Returns (name, filename, content) triples."""
+    rng = random.Random(args.seed)
+    corpora = [
+        ("txt", "synthetic.txt", make_txt(int(args.txt_mb * MB), rng)),
+        ("csv", "synthetic.csv", make_csv(int(args.csv_mb * MB), rng)),
+        ("json", "synthetic.json", make_json(int(args.json_mb * MB), rng)),
+        ("pdf", "synthetic.pdf", make_pdf(args.pdf_pages, rng)),
+    ]
+    if args.fixtures:
+        for entry in sorted(os.scandir(os.path.expanduser(args.fixtures)), key=lambda e: e.name):
+            ext = os.path.splitext(entry.name)[1].lower()
+            if entry.is_file() and ext in FIXTURE_EXTENSIONS:
+                with open(entry.path, "rb") as f:
+                    corpora.append((f"fixture:{entry.name}", entry.name, f.read()))
+    return corpora
+
+
+def measure(fn: Callable[[], object], repeats: int) -> Tuple[float, int, object]:
+    """
+    Time a stage and trace its peak allocation.
+
+    Args:
+        fn: The stage to run
+        repeats: Timed runs; the fastest is reported
+
+    Returns:
+        (best seconds, peak traced bytes, result of the last run)
+    """
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+
+    # Separate untimed pass: tracemalloc slows allocation-heavy code severalfold
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def stage_result(seconds: float, peak: int, input_bytes: int, chunks: Optional[int] = None) -> dict:
+    result = {
+        "seconds": round(seconds, 6),
+        "input_mb": round(input_bytes / MB, 3),
+        "mb_per_s": round(input_bytes / MB / seconds, 3) if seconds else None,
+        "peak_mb": round(peak / MB, 3),
+    }
+    if chunks is not None:
+        result["chunks"] = chunks
+        result["chunks_per_s"] = round(chunks / seconds, 1) if seconds else None
+    return result
+
+
+def run_stages(corpora, repeats: int) -> Dict[str, dict]:
+    stages: Dict[str, dict] = {}
+    embedding = [0.0] * EMBEDDING_DIMENSIONS
+
+    for name, filename, content in corpora:
+        seconds, peak, text = measure(lambda: extract_text_from_file(content, filename), repeats)
+        stages[f"extract:{name}"] = stage_result(seconds, peak, len(content))
+
+        raw = content.decode("utf-8", errors="replace") if not filename.endswith(".pdf") else text
+        seconds, peak, _ = measure(lambda: sanitize_text(raw), repeats)
+        stages[f"sanitize:{name}"] = stage_result(seconds, peak, len(raw.encode()))
+
+        text_bytes = len(text.encode())
+        seconds, peak, chunks = measure(lambda: chunk_text(text), repeats)
+        stages[f"chunk:{name}"] = stage_result(seconds, peak, text_bytes, len(chunks))
+
+        def build_records():
+            records = []
+            for i in range(0, len(chunks), BATCH_SIZE):
+                batch = chunks[i : i + BATCH_SIZE]
+                records.extend(
+                    build_chunk_records(batch, [embedding] * len(batch), "doc", "user", filename)
+                )
+            return records
+
+        seconds, peak, _ = measure(build_records, repeats)
+        stages[f"records:{name}"] = stage_result(seconds, peak, text_bytes, len(chunks))
+
+        print(
+            f"{name:<24} extract={stages[f'extract:{name}']['mb_per_s']:>8.2f}MB/s  "
+            f"sanitize={stages[f'sanitize:{name}']['mb_per_s']:>8.2f}MB/s  "
+            f"chunk={stages[f'chunk:{name}']['chunks_per_s']:>9.0f}/s  "
+            f"records={stages[f'records:{name}']['chunks_per_s']:>9.0f}/s"
+        )
+    return stages
+
+
+def throughput(key: str, result: dict) -> Tuple[Optional[float], str]:
+    # Record building scales with chunk count, not bytes
+    if key.startswith("records:"):
+        return result.get("chunks_per_s"), "chunks/s"
+    return result.get("mb_per_s"), "MB/s"
+
+
+def compare(stages: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    Compare per-stage throughput with the baseline.
+
+    Throughput rather than seconds, so a resized corpus still compares fairly.
+
+    Returns:
+        Names of stages slower than baseline by more than the tolerance
+    """
+    regressions = []
+    print(f"\n{'stage':<36} {'baseline':>12} {'current':>12} {'unit':>9} {'change':>8}")
+    for key, current in stages.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        before, unit = throughput(key, previous)
+        after, _ = throughput(key, current)
+        if not before or not after:
+            continue
+        flag = ""
+        if before / after - 1 > tolerance:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<36} {before:>12.2f} {after:>12.2f} {unit:>9} {after / before - 1:>+8.1%}{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--txt-mb", type=float, default=8, help="Size of the synthetic txt corpus")
+    parser.add_argument("--csv-mb", type=float, default=4, help="Size of the synthetic CSV corpus")
+    parser.add_argument("--json-mb", type=float, default=4, help="Size of the synthetic JSON corpus")
+    parser.add_argument("--pdf-pages", type=int, default=300, help="Pages in the synthetic PDF")
+    parser.add_argument("--fixtures", help="Directory of extra txt/md/csv/json/pdf files to include")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per stage; the fastest counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with these results")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown per stage (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    corpora = build_corpora(args)
+    stages = run_stages(corpora, args.repeats)
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "save_baseline")},
+        "stages": stages,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved baseline {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(stages, baseline["stages"], args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) slower than baseline by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Offline load test: fake OpenAI and Supabase servers plus a concurrent user driver."""
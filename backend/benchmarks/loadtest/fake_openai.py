@@ -0,0 +1,144 @@
+"""OpenAI-compatible stand-in for chat completions and embeddings.
+
+Configured through environment variables so it can run under uvicorn:
+    FAKE_LLM_LATENCY_MS      delay before the first token (default 300)
+    FAKE_LLM_TOKEN_RATE      tokens per second while streaming (default 50, 0 = no delay)
+    FAKE_LLM_TOKENS          tokens per answer (default 150)
+    FAKE_EMBED_LATENCY_MS    delay per embeddings request (default 50)
+    FAKE_EMBED_DIMENSIONS    vector size (default 1536)
+    FAKE_LLM_ERROR_RATE      fraction of chat completions that fail with a 500 (default 0)
+
+Usage:
+    uvicorn benchmarks.loadtest.fake_openai:app --port 9100
+
+Tests build servers with their own settings through create_app().
+"""
+
+import array
+import asyncio
+import base64
+import json
+import os
+import random
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY = float(os.getenv("FAKE_LLM_LATENCY_MS", "300")) / 1000
+TOKEN_RATE = float(os.getenv("FAKE_LLM_TOKEN_RATE", "50"))
+TOKENS = int(os.getenv("FAKE_LLM_TOKENS", "150"))
+EMBED_LATENCY = float(os.getenv("FAKE_EMBED_LATENCY_MS", "50")) / 1000
+DIMENSIONS = int(os.getenv("FAKE_EMBED_DIMENSIONS", "1536"))
+ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+
+WORDS = ["the", "document", "says", "that", "retrieval", "context", "answer", "chunk", "model", "vector"]
+
+# A handful of precomputed unit-ish vectors; texts map onto them by hash so
+# the server spends its time sleeping, not generating floats
+_rng = random.Random(42)
+_VECTORS = [[_rng.uniform(-1, 1) for _ in range(DIMENSIONS)] for _ in range(16)]
+_VECTORS_B64 = [base64.b64encode(array.array("f", v).tobytes()).decode() for v in _VECTORS]
+
+
+def _answer_tokens(seed: str, count: int):
+    rng = random.Random(seed)
+    return [" " + rng.choice(WORDS) for _ in range(count)]
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason=None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def create_app(
+    latency: float = LATENCY,
+    token_rate: float = TOKEN_RATE,
+    tokens_per_answer: int = TOKENS,
+    error_rate: float = ERROR_RATE,
+) -> FastAPI:
+    """Build a fake server; app.state.chat_requests counts chat completions received."""
+    app = FastAPI(title="Fake OpenAI")
+    app.state.chat_requests = 0
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake-model")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        app.state.chat_requests += 1
+        if random.random() < error_rate:
+            return JSONResponse({"error": {"message": "Fake upstream failure"}}, status_code=500)
+        tokens = _answer_tokens(json.dumps(body.get("messages", []))[-200:], tokens_per_answer)
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency + (len(tokens) / token_rate if token_rate > 0 else 0))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens).strip()},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            }
+
+        async def stream():
+            await asyncio.sleep(latency)
+            yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+            delay = 1 / token_rate if token_rate > 0 else 0
+            for token in tokens:
+                yield _chunk(completion_id, model, {"content": token})
+                if delay:
+                    await asyncio.sleep(delay)
+            yield _chunk(completion_id, model, {}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        use_base64 = body.get("encoding_format") == "base64"
+        await asyncio.sleep(EMBED_LATENCY)
+
+        data = []
+        for index, text in enumerate(texts):
+            slot = hash(text) % len(_VECTORS)
+            data.append(
+                {
+                    "object": "embedding",
+                    "index": index,
+                    "embedding": _VECTORS_B64[slot] if use_base64 else _VECTORS[slot],
+                }
+            )
+        return JSONResponse(
+            {
+                "object": "list",
+                "data": data,
+                "model": body.get("model", "fake-embedding"),
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            }
+        )
+
+    return app
+
+
+app = create_app()
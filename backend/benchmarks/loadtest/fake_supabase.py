@@ -0,0 +1,568 @@
+"""In-memory stand-in for the parts of Supabase the backend uses.
+
+Implements just enough of PostgREST (table CRUD with eq/neq/lt/gt/lte/gte/in
+filters, select, order, limit), the RPCs in supabase/migrations, Storage
+upload/download/remove and a JWKS endpoint with an HS256 key, so the app can
+run end to end without a database. Vector search is not real: match
+functions return the user's chunks with a fixed similarity.
+
+Usage:
+    uvicorn benchmarks.loadtest.fake_supabase:app --port 9200
+
+Tokens for simulated users are minted with `make_token`.
+"""
+
+import base64
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import jwt
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+JWT_SECRET = b"loadtest-secret-not-for-production"
+JWT_KID = "loadtest"
+
+app = FastAPI(title="Fake Supabase")
+
+tables: Dict[str, List[dict]] = defaultdict(list)
+objects: Dict[str, bytes] = {}
+
+TABLE_DEFAULTS = {
+    "threads": lambda: {"title": None, "openai_thread_id": None, "vector_store_id": None, "metadata": {}},
+    "messages": lambda: {"metadata": {}},
+    "documents": lambda: {
+        "status": "pending", "error_message": None, "chunk_count": 0, "progress": None, "deleted_at": None,
+    },
+    "chunks": lambda: {"metadata": {}},
+}
+
+tables["embedding_config"].append(
+    {"id": True, "model": "text-embedding-3-small", "dimensions": 1536, "target_model": None, "target_dimensions": None}
+)
+
+
+class RpcError(Exception):
+    """Raised by an RPC handler; returned the way PostgREST reports RAISE EXCEPTION."""
+
+_last_ts = 0.0
+
+
+def _now() -> str:
+    # Strictly increasing so created_at ordering is deterministic
+    global _last_ts
+    ts = max(time.time(), _last_ts + 1e-6)
+    _last_ts = ts
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def make_token(user_id: str, email: str = "", ttl: int = 3600) -> str:
+    return jwt.encode(
+        {"sub": user_id, "email": email, "exp": int(time.time()) + ttl, "role": "authenticated"},
+        JWT_SECRET,
+        algorithm="HS256",
+        headers={"kid": JWT_KID},
+    )
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.get("/auth/v1/.well-known/jwks.json")
+async def jwks():
+    key = base64.urlsafe_b64encode(JWT_SECRET).decode().rstrip("=")
+    return {"keys": [{"kty": "oct", "k": key, "kid": JWT_KID, "alg": "HS256", "use": "sig"}]}
+
+
+# --- PostgREST tables -------------------------------------------------------
+
+def _parse_value(raw: str):
+    if raw == "null":
+        return None
+    if raw in ("true", "false"):
+        return raw == "true"
+    return raw.strip('"')
+
+
+def _compare(value, op: str, raw: str) -> bool:
+    if op == "in":
+        options = [_parse_value(v) for v in raw.strip("()").split(",")]
+        return str(value) in options
+    if op == "is":
+        return value is _parse_value(raw) or value == _parse_value(raw)
+    target = _parse_value(raw)
+    if value is None:
+        return False
+    value = value if isinstance(value, (int, float)) else str(value)
+    if isinstance(value, (int, float)):
+        target = type(value)(target)
+    return {
+        "eq": value == target,
+        "neq": value != target,
+        "lt": value < target,
+        "gt": value > target,
+        "lte": value <= target,
+        "gte": value >= target,
+    }[op]
+
+
+def _filter_rows(rows: List[dict], params) -> List[dict]:
+    for column, spec in params.multi_items():
+        if column in ("select", "order", "limit", "offset", "or", "on_conflict", "columns"):
+            continue
+        op, _, raw = spec.partition(".")
+        rows = [row for row in rows if _compare(row.get(column), op, raw)]
+    return rows
+
+
+def _shape(rows: List[dict], params) -> List[dict]:
+    order = params.get("order")
+    if order:
+        for term in reversed(order.split(",")):
+            column, _, direction = term.partition(".")
+            rows = sorted(
+                rows,
+                key=lambda r: (r.get(column) is None, r.get(column) or ""),
+                reverse=direction.startswith("desc"),
+            )
+    if params.get("limit"):
+        rows = rows[: int(params["limit"])]
+    select = params.get("select", "*")
+    if select != "*":
+        columns = [c.strip() for c in select.split(",")]
+        rows = [{c: row.get(c) for c in columns} for row in rows]
+    return rows
+
+
+@app.get("/rest/v1/{table}")
+async def select_rows(table: str, request: Request):
+    rows = _filter_rows(tables[table], request.query_params)
+    return _shape(rows, request.query_params)
+
+
+@app.post("/rest/v1/{table}")
+async def insert_rows(table: str, request: Request):
+    body = await request.json()
+    records = body if isinstance(body, list) else [body]
+    inserted = []
+    for record in records:
+        now = _now()
+        row = {
+            **TABLE_DEFAULTS.get(table, dict)(),
+            "id": str(uuid.uuid4()),
+            "created_at": now,
+            "updated_at": now,
+            **record,
+        }
+        tables[table].append(row)
+        inserted.append(row)
+    return JSONResponse(inserted, status_code=201)
+
+
+@app.patch("/rest/v1/{table}")
+async def update_rows(table: str, request: Request):
+    changes = await request.json()
+    rows = _filter_rows(tables[table], request.query_params)
+    for row in rows:
+        row.update(changes)
+        row["updated_at"] = _now()
+    return rows
+
+
+# ON DELETE CASCADE children, by parent table
+CASCADES = {
+    "documents": [
+        ("chunks", "document_id"),
+        ("document_tombstones", "document_id"),
+        ("thread_documents", "document_id"),
+        ("ingestion_jobs", "document_id"),
+    ],
+    "threads": [("messages", "thread_id"), ("thread_documents", "thread_id")],
+}
+
+
+def _delete(table: str, doomed: List[dict]) -> None:
+    doomed_ids = {id(row) for row in doomed}
+    tables[table] = [row for row in tables[table] if id(row) not in doomed_ids]
+    parent_ids = {row["id"] for row in doomed}
+    for child, column in CASCADES.get(table, []):
+        _delete(child, [row for row in tables[child] if row.get(column) in parent_ids])
+
+
+@app.delete("/rest/v1/{table}")
+async def delete_rows(table: str, request: Request):
+    doomed = _filter_rows(tables[table], request.query_params)
+    _delete(table, doomed)
+    return doomed
+
+
+# --- RPCs -------------------------------------------------------------------
+
+def _owned_thread(thread_id: str, user_id: str):
+    for thread in tables["threads"]:
+        if thread["id"] == thread_id and thread["user_id"] == user_id:
+            return thread
+    return None
+
+
+def _insert(table: str, row: dict) -> dict:
+    now = _now()
+    row = {**TABLE_DEFAULTS.get(table, dict)(), "id": str(uuid.uuid4()), "created_at": now, **row}
+    tables[table].append(row)
+    return row
+
+
+def rpc_begin_chat_turn(p: dict):
+    thread = _owned_thread(p["p_thread_id"], p["p_user_id"])
+    if thread is None:
+        return None
+    message = _insert(
+        "messages",
+        {"thread_id": thread["id"], "user_id": p["p_user_id"], "role": "user", "content": p["p_content"]},
+    )
+    thread["updated_at"] = _now()
+    messages = [m for m in tables["messages"] if m["thread_id"] == thread["id"]]
+    limit = p["p_history_limit"]
+    history = messages[-limit:]
+    return {
+        "thread": {"id": thread["id"], "title": thread["title"], "metadata": thread.get("metadata") or {}},
+        "message_id": message["id"],
+        "history": [
+            {k: m[k] for k in ("id", "role", "content", "created_at")} for m in history
+        ],
+        "history_truncated": len(messages) > limit,
+        "document_ids": [
+            td["document_id"] for td in tables["thread_documents"] if td["thread_id"] == thread["id"]
+        ],
+    }
+
+
+def rpc_finish_chat_turn(p: dict):
+    thread = _owned_thread(p["p_thread_id"], p["p_user_id"])
+    if thread is None:
+        return None
+    message = _insert(
+        "messages",
+        {
+            "thread_id": thread["id"],
+            "user_id": p["p_user_id"],
+            "role": "assistant",
+            "content": p["p_content"],
+            "metadata": p.get("p_metadata") or {},
+        },
+    )
+    if p.get("p_title") and not thread["title"]:
+        thread["title"] = p["p_title"]
+    thread["updated_at"] = _now()
+    return message["id"]
+
+
+def rpc_match_chunks(p: dict):
+    config = tables["embedding_config"][0]
+    if p.get("query_model") and p["query_model"] != config["model"]:
+        raise RpcError(f"Embedding model mismatch: query uses {p['query_model']}, chunks use {config['model']}")
+    document_ids = set(p.get("filter_document_ids") or [])
+    tombstoned = {t["document_id"] for t in tables["document_tombstones"]}
+    rows = [
+        c for c in tables["chunks"]
+        if c["user_id"] == p["filter_user_id"]
+        and (not document_ids or c["document_id"] in document_ids)
+        and c["document_id"] not in tombstoned
+    ]
+    return [
+        {
+            "id": c["id"],
+            "document_id": c["document_id"],
+            "content": c["content"],
+            "metadata": c["metadata"],
+            "chunk_index": c.get("chunk_index"),
+            "similarity": 0.8,
+        }
+        for c in rows[: p["match_count"]]
+    ]
+
+
+def rpc_tombstone_documents(p: dict):
+    ids = set(p["p_document_ids"])
+    marked = []
+    for doc in tables["documents"]:
+        if doc["id"] in ids and doc["user_id"] == p["p_user_id"] and doc["deleted_at"] is None:
+            doc["deleted_at"] = _now()
+            _insert(
+                "document_tombstones",
+                {"document_id": doc["id"], "user_id": doc["user_id"], "storage_path": doc["storage_path"],
+                 "deleted_at": doc["deleted_at"]},
+            )
+            marked.append(doc["id"])
+    return marked
+
+
+def rpc_claim_tombstones(p: dict):
+    now = _now_ts()
+    free = sorted(
+        (t for t in tables["document_tombstones"] if (t.get("claimed_until") or 0) < now),
+        key=lambda t: t["deleted_at"],
+    )[: p["p_limit"]]
+    for tombstone in free:
+        tombstone.update(claimed_by=p["p_worker_id"], claimed_until=now + p["p_lease_seconds"])
+    return [{"document_id": t["document_id"], "storage_path": t["storage_path"]} for t in free]
+
+
+def _held_tombstone(document_id: str, worker_id: str):
+    for tombstone in tables["document_tombstones"]:
+        if tombstone["document_id"] == document_id and tombstone.get("claimed_by") == worker_id:
+            return tombstone
+    return None
+
+
+def _now_ts() -> float:
+    return time.time()
+
+
+def rpc_reap_document_chunks(p: dict):
+    tombstone = _held_tombstone(p["p_document_id"], p["p_worker_id"])
+    if tombstone is None:
+        raise RpcError(f"Tombstone {p['p_document_id']} is not held by {p['p_worker_id']}")
+    tombstone["claimed_until"] = _now_ts() + p["p_lease_seconds"]
+    doomed = [c for c in tables["chunks"] if c["document_id"] == p["p_document_id"]][: p["p_batch_size"]]
+    doomed_ids = {id(c) for c in doomed}
+    tables["chunks"] = [c for c in tables["chunks"] if id(c) not in doomed_ids]
+    return len(doomed)
+
+
+def rpc_finish_reaped_documents(p: dict):
+    held = [d for d in p["p_document_ids"] if _held_tombstone(d, p["p_worker_id"])]
+    _delete("documents", [d for d in tables["documents"] if d["id"] in held])
+    return held
+
+
+def rpc_enqueue_ingestion_job(p: dict):
+    doc = next(
+        (d for d in tables["documents"]
+         if d["id"] == p["p_document_id"] and d["user_id"] == p["p_user_id"] and d["deleted_at"] is None),
+        None,
+    )
+    if doc is None:
+        return []
+    for job in tables["ingestion_jobs"]:
+        if job["document_id"] == doc["id"] and job["status"] in ("queued", "running"):
+            return [{"job_id": job["id"], "created": False}]
+    job = _insert(
+        "ingestion_jobs",
+        {"document_id": doc["id"], "user_id": doc["user_id"], "status": "queued", "attempts": 0,
+         "max_attempts": p.get("p_max_attempts", 3), "run_after": _now_ts(), "locked_by": None,
+         "lease_expires_at": None, "last_error": None},
+    )
+    doc.update(status="pending", error_message=None)
+    return [{"job_id": job["id"], "created": True}]
+
+
+def rpc_claim_ingestion_jobs(p: dict):
+    now = _now_ts()
+    queued = sorted(
+        (j for j in tables["ingestion_jobs"] if j["status"] == "queued" and j["run_after"] <= now),
+        key=lambda j: (j["run_after"], j["created_at"]),
+    )[: p["p_limit"]]
+    for job in queued:
+        job.update(
+            status="running", locked_by=p["p_worker_id"],
+            lease_expires_at=now + p["p_lease_seconds"], attempts=job["attempts"] + 1,
+        )
+        for doc in tables["documents"]:
+            if doc["id"] == job["document_id"]:
+                doc.update(status="processing", error_message=None)
+    return queued
+
+
+def _held_job(job_id: str, worker_id: str):
+    for job in tables["ingestion_jobs"]:
+        if job["id"] == job_id and job["locked_by"] == worker_id and job["status"] == "running":
+            return job
+    return None
+
+
+def rpc_heartbeat_ingestion_job(p: dict):
+    job = _held_job(p["p_job_id"], p["p_worker_id"])
+    if job is None:
+        return False
+    job["lease_expires_at"] = _now_ts() + p["p_lease_seconds"]
+    return True
+
+
+def rpc_write_document_chunks(p: dict):
+    job = _held_job(p["p_job_id"], p["p_worker_id"])
+    if job is None or job["lease_expires_at"] <= _now_ts():
+        raise RpcError(f"Lost the lease on ingestion job {p['p_job_id']}")
+    if p.get("p_replace"):
+        tables["chunks"] = [c for c in tables["chunks"] if c["document_id"] != job["document_id"]]
+    for row in p["p_rows"]:
+        _insert("chunks", row)
+    return len(p["p_rows"])
+
+
+def rpc_finish_ingestion_job(p: dict):
+    job = _held_job(p["p_job_id"], p["p_worker_id"])
+    if job is None:
+        return False
+    job.update(status=p["p_status"], last_error=p.get("p_error"), locked_by=None, lease_expires_at=None)
+    if p["p_status"] == "queued":
+        job["run_after"] = _now_ts() + (p.get("p_retry_after_seconds") or 0)
+        job["attempts"] -= 1
+        for doc in tables["documents"]:
+            if doc["id"] == job["document_id"]:
+                doc["status"] = "pending"
+    return True
+
+
+def rpc_requeue_expired_ingestion_jobs(p: dict):
+    now = _now_ts()
+    swept = 0
+    for job in tables["ingestion_jobs"]:
+        if job["status"] == "running" and job["lease_expires_at"] < now:
+            job.update(
+                status="failed" if job["attempts"] >= job["max_attempts"] else "queued",
+                last_error=f"Lease expired on {job['locked_by']}", locked_by=None, lease_expires_at=None,
+            )
+            swept += 1
+    return swept
+
+
+def _migration() -> dict:
+    config = tables["embedding_config"][0]
+    if config["target_model"] is None:
+        raise RpcError("No embedding migration in progress")
+    return config
+
+
+def rpc_begin_embedding_migration(p: dict):
+    config = tables["embedding_config"][0]
+    if config["target_model"] is not None:
+        raise RpcError(f"A migration to {config['target_model']} is already in progress")
+    config.update(target_model=p["p_model"], target_dimensions=p["p_dimensions"])
+    for chunk in tables["chunks"]:
+        chunk["embedding_next"] = None
+
+
+def rpc_embedding_migration_status(p: dict):
+    config = tables["embedding_config"][0]
+    remaining = 0
+    if config["target_model"] is not None:
+        remaining = sum(1 for c in tables["chunks"] if c.get("embedding_next") is None)
+    return [{**config, "migration_started_at": None, "total_chunks": len(tables["chunks"]), "remaining_chunks": remaining}]
+
+
+def rpc_embedding_migration_indexes_ready(p: dict):
+    _migration()
+    return True
+
+
+def rpc_next_chunks_to_backfill(p: dict):
+    _migration()
+    after = p.get("p_after_id")
+    pending = sorted(
+        (c for c in tables["chunks"] if c.get("embedding_next") is None and (after is None or c["id"] > after)),
+        key=lambda c: c["id"],
+    )
+    return [{"id": c["id"], "content": c["content"]} for c in pending[: p["p_limit"]]]
+
+
+def rpc_set_shadow_embeddings(p: dict):
+    _migration()
+    vectors = {r["id"]: r["embedding"] for r in p["p_rows"]}
+    updated = 0
+    for chunk in tables["chunks"]:
+        if chunk["id"] in vectors:
+            chunk["embedding_next"] = vectors[chunk["id"]]
+            updated += 1
+    return updated
+
+
+def rpc_finalize_embedding_migration(p: dict):
+    config = _migration()
+    remaining = sum(1 for c in tables["chunks"] if c.get("embedding_next") is None)
+    if remaining:
+        raise RpcError(f"Embedding migration incomplete: {remaining} chunks left to backfill")
+    for chunk in tables["chunks"]:
+        chunk["embedding"] = chunk.pop("embedding_next")
+    tables["answer_cache"].clear()
+    config.update(model=config["target_model"], dimensions=config["target_dimensions"], target_model=None, target_dimensions=None)
+
+
+def rpc_abort_embedding_migration(p: dict):
+    config = _migration()
+    for chunk in tables["chunks"]:
+        chunk.pop("embedding_next", None)
+    config.update(target_model=None, target_dimensions=None)
+
+
+RPCS = {
+    "begin_chat_turn": rpc_begin_chat_turn,
+    "finish_chat_turn": rpc_finish_chat_turn,
+    "match_chunks": rpc_match_chunks,
+    "match_chunks_scoped": rpc_match_chunks,
+    "match_answer_cache": lambda p: [],
+    "tombstone_documents": rpc_tombstone_documents,
+    "claim_tombstones": rpc_claim_tombstones,
+    "reap_document_chunks": rpc_reap_document_chunks,
+    "finish_reaped_documents": rpc_finish_reaped_documents,
+    "enqueue_ingestion_job": rpc_enqueue_ingestion_job,
+    "claim_ingestion_jobs": rpc_claim_ingestion_jobs,
+    "heartbeat_ingestion_job": rpc_heartbeat_ingestion_job,
+    "write_document_chunks": rpc_write_document_chunks,
+    "finish_ingestion_job": rpc_finish_ingestion_job,
+    "requeue_expired_ingestion_jobs": rpc_requeue_expired_ingestion_jobs,
+    "begin_embedding_migration": rpc_begin_embedding_migration,
+    "embedding_migration_status": rpc_embedding_migration_status,
+    "embedding_migration_indexes_ready": rpc_embedding_migration_indexes_ready,
+    "next_chunks_to_backfill": rpc_next_chunks_to_backfill,
+    "set_shadow_embeddings": rpc_set_shadow_embeddings,
+    "finalize_embedding_migration": rpc_finalize_embedding_migration,
+    "abort_embedding_migration": rpc_abort_embedding_migration,
+}
+
+
+@app.post("/rest/v1/rpc/{name}")
+async def rpc(name: str, request: Request):
+    handler = RPCS.get(name)
+    if handler is None:
+        return JSONResponse({"message": f"Unknown function {name}"}, status_code=404)
+    try:
+        return JSONResponse(handler(await request.json()))
+    except RpcError as e:
+        return JSONResponse({"code": "P0001", "message": str(e), "details": None, "hint": None}, status_code=400)
+
+
+# --- Storage ----------------------------------------------------------------
+
+@app.post("/storage/v1/object/{bucket}/{path:path}")
+async def upload_object(bucket: str, path: str, request: Request):
+    form = await request.form()
+    upload = form["file"]
+    objects[f"{bucket}/{path}"] = await upload.read()
+    return {"Key": f"{bucket}/{path}"}
+
+
+@app.get("/storage/v1/object/{bucket}/{path:path}")
+async def download_object(bucket: str, path: str):
+    data = objects.get(f"{bucket}/{path}")
+    if data is None:
+        return JSONResponse(
+            {"statusCode": "404", "error": "not_found", "message": "Object not found"},
+            status_code=404,
+        )
+    return Response(data, media_type="application/octet-stream")
+
+
+@app.delete("/storage/v1/object/{bucket}")
+async def remove_objects(bucket: str, request: Request):
+    body = await request.json()
+    removed = []
+    for path in body.get("prefixes", []):
+        if objects.pop(f"{bucket}/{path}", None) is not None:
+            removed.append({"name": path})
+    return removed
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""Load test the backend against local fake OpenAI and Supabase servers.
+
+Starts fake_openai, fake_supabase and the FastAPI app as uvicorn
+subprocesses on free ports, then drives the app with concurrent simulated
+users. Each user creates a thread and runs chat turns over SSE while a
+separate set of uploaders uploads and processes documents. Reports request
+throughput, time to first token, turn latency and ingestion docs/min.
+
+Nothing leaves the machine: no OpenAI key or Supabase project is needed.
+
+Usage (from backend/):
+    python -m benchmarks.loadtest.run --users 20 --turns 5 --docs 10
+    python -m benchmarks.loadtest.run --token-rate 0 --llm-latency-ms 0 --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.loadtest.fake_supabase import make_token
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# How often uploaders poll a queued document's status
+POLL_SECONDS = 0.2
+
+QUESTIONS = [
+    "What does the document say about retrieval?",
+    "Summarize the main points.",
+    "How are chunks embedded?",
+    "Which sections mention vectors?",
+    "Give me the key takeaways in three bullets.",
+]
+
+
+@dataclass
+class Results:
+    ttft: List[float] = field(default_factory=list)
+    turns: List[float] = field(default_factory=list)
+    requests: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+    docs_processed: int = 0
+    ingestion_seconds: List[float] = field(default_factory=list)
+
+    def error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(
+    target: str, port: int, env: Dict[str, str], workers: int = 1, quiet: bool = True
+) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "uvicorn", target,
+        "--host", "127.0.0.1", "--port", str(port),
+        "--log-level", "warning", "--workers", str(workers),
+    ]
+    # The app logs every request at INFO; rerun with --verbose to debug failures
+    output = subprocess.DEVNULL if quiet else None
+    return subprocess.Popen(
+        command, cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=output, stderr=output
+    )
+
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def make_document(size_kb: int, rng: random.Random) -> bytes:
+    words = ["retrieval", "vector", "chunk", "embedding", "context", "answer", "model", "index"]
+    paragraphs = []
+    size = 0
+    while size < size_kb * 1024:
+        paragraph = " ".join(rng.choice(words) for _ in range(120)) + "."
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs).encode()
+
+
+async def chat_turn(client: httpx.AsyncClient, thread_id: str, content: str, results: Results) -> None:
+    started = time.perf_counter()
+    first_token = None
+    event = None
+    results.requests += 1
+    try:
+        async with client.stream(
+            "POST", f"/api/threads/{thread_id}/chat", json={"content": content}
+        ) as response:
+            if response.status_code != 200:
+                results.error(f"chat_{response.status_code}")
+                await response.aread()
+                return
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:") and event == "message" and first_token is None:
+                    first_token = time.perf_counter() - started
+                elif line.startswith("data:") and event == "error":
+                    results.error("chat_stream_error")
+                    return
+                if event == "done":
+                    break
+    except httpx.HTTPError as e:
+        results.error(f"chat_{type(e).__name__}")
+        return
+
+    if first_token is not None:
+        results.ttft.append(first_token)
+    results.turns.append(time.perf_counter() - started)
+
+
+async def simulate_user(base_url: str, turns: int, think_ms: int, results: Results) -> None:
+    token = make_token(str(uuid.uuid4()))
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=120) as client:
+        results.requests += 1
+        response = await client.post("/api/threads", json={"title": "Load test"})
+        if response.status_code != 201:
+            results.error(f"thread_{response.status_code}")
+            return
+        thread_id = response.json()["id"]
+
+        for turn in range(turns):
+            await chat_turn(client, thread_id, QUESTIONS[turn % len(QUESTIONS)], results)
+            if think_ms:
+                await asyncio.sleep(random.uniform(0.5, 1.5) * think_ms / 1000)
+
+
+async def wait_processed(client: httpx.AsyncClient, document_id: str, results: Results) -> str:
+    while True:
+        await asyncio.sleep(POLL_SECONDS)
+        results.requests += 1
+        response = await client.get(f"/api/documents/{document_id}")
+        if response.status_code != 200:
+            return f"poll_{response.status_code}"
+        status = response.json()["status"]
+        if status in ("completed", "failed"):
+            return status
+
+
+async def ingest_documents(base_url: str, docs: int, size_kb: int, results: Results, seed: int) -> None:
+    rng = random.Random(seed)
+    token = make_token(str(uuid.uuid4()))
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=300) as client:
+        for i in range(docs):
+            started = time.perf_counter()
+            results.requests += 1
+            response = await client.post(
+                "/api/documents/upload",
+                files={"file": (f"loadtest-{seed}-{i}.txt", make_document(size_kb, rng), "text/plain")},
+            )
+            if response.status_code != 200:
+                results.error(f"upload_{response.status_code}")
+                continue
+
+            document_id = response.json()["id"]
+            results.requests += 1
+            response = await client.post(f"/api/documents/{document_id}/process")
+            if response.status_code != 202:
+                results.error(f"process_{response.status_code}")
+                continue
+
+            # Processing is queued; wait for a worker to finish it
+            status = await wait_processed(client, document_id, results)
+            if status != "completed":
+                results.error(f"ingestion_{status}")
+                continue
+            results.docs_processed += 1
+            results.ingestion_seconds.append(time.perf_counter() - started)
+
+
+async def run_load(args, base_url: str) -> dict:
+    results = Results()
+    tasks = [
+        simulate_user(base_url, args.turns, args.think_ms, results) for _ in range(args.users)
+    ]
+    # Spread documents over the uploaders; each uploader works sequentially
+    uploaders = min(args.uploaders, args.docs)
+    for u in range(uploaders):
+        count = args.docs // uploaders + (1 if u < args.docs % uploaders else 0)
+        tasks.append(ingest_documents(base_url, count, args.doc_kb, results, seed=u))
+
+    started = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value * 1000, 1)
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": results.requests,
+        "rps": round(results.requests / elapsed, 2),
+        "chat_turns": len(results.turns),
+        "ttft_ms": {f"p{p}": ms(percentile(results.ttft, p)) for p in (50, 95, 99)},
+        "turn_ms": {f"p{p}": ms(percentile(results.turns, p)) for p in (50, 95, 99)},
+        "turn_ms_mean": ms(statistics.fmean(results.turns)) if results.turns else None,
+        "docs_processed": results.docs_processed,
+        "docs_per_minute": round(results.docs_processed / elapsed * 60, 1),
+        "ingestion_ms": {f"p{p}": ms(percentile(results.ingestion_seconds, p)) for p in (50, 95)},
+        "errors": results.errors,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\nElapsed:          {report['elapsed_seconds']}s")
+    print(f"Requests:         {report['requests']} ({report['rps']} req/s)")
+    print(f"Chat turns:       {report['chat_turns']}")
+    ttft = report["ttft_ms"]
+    print(f"TTFT ms:          p50={ttft['p50']}  p95={ttft['p95']}  p99={ttft['p99']}")
+    turn = report["turn_ms"]
+    print(f"Turn ms:          p50={turn['p50']}  p95={turn['p95']}  p99={turn['p99']}")
+    print(f"Docs processed:   {report['docs_processed']} ({report['docs_per_minute']} docs/min)")
+    if report["errors"]:
+        print(f"Errors:           {report['errors']}")
+
+
+async def main(args) -> int:
+    openai_port, supabase_port, app_port = free_port(), free_port(), free_port()
+    supabase_url = f"http://127.0.0.1:{supabase_port}"
+    anon_key = make_token("anon", ttl=86400)
+
+    processes = {
+        "fake_openai": start_server(
+            "benchmarks.loadtest.fake_openai:app",
+            openai_port,
+            {
+                "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+                "FAKE_LLM_TOKEN_RATE": str(args.token_rate),
+                "FAKE_LLM_TOKENS": str(args.tokens),
+                "FAKE_EMBED_LATENCY_MS": str(args.embed_latency_ms),
+            },
+        ),
+        "fake_supabase": start_server("benchmarks.loadtest.fake_supabase:app", supabase_port, {}),
+    }
+    try:
+        await wait_ready(f"http://127.0.0.1:{openai_port}/health", processes["fake_openai"])
+        await wait_ready(f"{supabase_url}/health", processes["fake_supabase"])
+
+        processes["app"] = start_server(
+            "app.main:app",
+            app_port,
+            {
+                "SUPABASE_URL": supabase_url,
+                "SUPABASE_ANON_KEY": anon_key,
+                "SUPABASE_SERVICE_ROLE_KEY": anon_key,
+                "SUPABASE_HTTP2": "false",
+                "LLM_PROVIDER": "openai",
+                "LLM_MODEL": "fake-model",
+                "OPENAI_API_KEY": "fake",
+                "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+                "LANGSMITH_ENABLED": "false",
+            },
+            workers=args.workers,
+            quiet=not args.verbose,
+        )
+        base_url = f"http://127.0.0.1:{app_port}"
+        await wait_ready(f"{base_url}/health", processes["app"], timeout=60)
+
+        report = await run_load(args, base_url)
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10, help="concurrent chat users")
+    parser.add_argument("--turns", type=int, default=3, help="chat turns per user")
+    parser.add_argument("--think-ms", type=int, default=0, help="mean pause between turns")
+    parser.add_argument("--docs", type=int, default=5, help="documents to upload and process")
+    parser.add_argument("--uploaders", type=int, default=2, help="concurrent uploaders")
+    parser.add_argument("--doc-kb", type=int, default=50, help="size of each generated document")
+    parser.add_argument("--token-rate", type=float, default=50, help="fake LLM tokens/sec (0 = instant)")
+    parser.add_argument("--tokens", type=int, default=150, help="tokens per fake answer")
+    parser.add_argument("--llm-latency-ms", type=int, default=300, help="fake LLM time to first token")
+    parser.add_argument("--embed-latency-ms", type=int, default=50, help="fake embeddings latency")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the app")
+    parser.add_argument("--verbose", action="store_true", help="show the app's logs")
+    parser.add_argument("--json", help="write the report to this file")
+    sys.exit(asyncio.run(main(parser.parse_args())))
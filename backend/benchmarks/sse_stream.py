@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Benchmark the chat SSE output stage.
+
+Feeds a synthetic provider stream through the old per-delta path and the
+coalescing path, encodes each event the way sse-starlette does, and reports
+events/sec, bytes on the wire and CPU time per stream.
+
+Usage (from backend/):
+    python -m benchmarks.sse_stream --tokens 2000 --token-rate 0
+    python -m benchmarks.sse_stream --tokens 500 --token-rate 80 --window-ms 30
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+# Settings are loaded on import; the benchmark does not talk to Supabase
+os.environ.setdefault("SUPABASE_URL", "http://localhost")
+os.environ.setdefault("SUPABASE_ANON_KEY", "benchmark")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "benchmark")
+
+from sse_starlette.sse import ServerSentEvent  # noqa: E402
+
+from app.services.llm.streaming import coalesce_deltas, encode_sse_data  # noqa: E402
+
+WORDS = ["the", "retrieval", "chunk", "answer", "model", "vector", "context", "token"]
+
+
+def make_deltas(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    deltas = []
+    for i in range(count):
+        word = rng.choice(WORDS)
+        deltas.append(f" {word}" + ("\n" if i % 40 == 39 else ""))
+    return deltas
+
+
+async def provider(deltas: list, token_rate: float):
+    delay = 1 / token_rate if token_rate > 0 else 0
+    for delta in deltas:
+        if delay:
+            await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)
+        yield delta
+
+
+async def run_baseline(deltas: list, token_rate: float) -> dict:
+    """One event per delta, two replaces per delta, quadratic += accumulation."""
+    events = 0
+    wire_bytes = 0
+    full_response = ""
+    async for chunk in provider(deltas, token_rate):
+        full_response += chunk
+        encoded_chunk = chunk.replace("\n", "\\n").replace("\r", "\\r")
+        wire_bytes += len(ServerSentEvent(data=encoded_chunk, event="message").encode())
+        events += 1
+    return {"events": events, "bytes": wire_bytes, "chars": len(full_response)}
+
+
+async def run_coalesced(deltas: list, token_rate: float, window_ms: int, max_chars: int) -> dict:
+    events = 0
+    wire_bytes = 0
+    parts = []
+    async for frame in coalesce_deltas(provider(deltas, token_rate), window_ms, max_chars):
+        parts.append(frame)
+        wire_bytes += len(ServerSentEvent(data=encode_sse_data(frame), event="message").encode())
+        events += 1
+    return {"events": events, "bytes": wire_bytes, "chars": len("".join(parts))}
+
+
+async def measure(name: str, coro_factory, streams: int) -> None:
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    results = await asyncio.gather(*(coro_factory() for _ in range(streams)))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    events = sum(r["events"] for r in results)
+    wire_bytes = sum(r["bytes"] for r in results)
+    print(
+        f"{name:<10} events={events:>8}  events/s={events / wall:>10.0f}  "
+        f"bytes={wire_bytes:>9}  cpu/stream={cpu / streams * 1000:>7.2f}ms  wall={wall:.2f}s"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=2000, help="Deltas per stream")
+    parser.add_argument("--streams", type=int, default=50, help="Concurrent streams")
+    parser.add_argument("--token-rate", type=float, default=0, help="Deltas/sec per stream (0 = as fast as possible)")
+    parser.add_argument("--window-ms", type=int, default=30)
+    parser.add_argument("--max-chars", type=int, default=512)
+    args = parser.parse_args()
+
+    deltas = make_deltas(args.tokens)
+
+    async def run():
+        await measure("baseline", lambda: run_baseline(deltas, args.token_rate), args.streams)
+        await measure(
+            "coalesced",
+            lambda: run_coalesced(deltas, args.token_rate, args.window_ms, args.max_chars),
+            args.streams,
+        )
+
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Evaluate retrieval quality and latency over a set of labelled questions.
+
+Reads cases from a JSON array or JSONL file, one object per case:
+
+    {"question": "...", "expected_document_ids": ["..."]}
+    {"question": "...", "expected_chunk_ids": ["..."], "expected_answer_terms": ["..."]}
+
+and searches the given user's documents for each, scoring every combination
+of --match-counts and --thresholds from a single search per question.
+Reports recall@k, hit rate, MRR and per-stage latency percentiles. Chunk
+sizes are compared by re-ingesting with different chunker settings and
+running the same cases again.
+
+Usage (from backend/, with the app's .env):
+    python -m scripts.evaluate_retrieval cases.jsonl --user-id <uuid>
+    python -m scripts.evaluate_retrieval cases.json --user-id <uuid> \\
+        --match-counts 3,5,10 --thresholds 0.2,0.3,0.5 --generate --output report.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from typing import List
+
+from app.models.evaluation import EvaluationCase, EvaluationReport, EvaluationRequest
+from app.services.evaluation import run_evaluation
+
+
+def load_cases(path: str) -> List[EvaluationCase]:
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        rows = json.loads(text)
+    else:
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [EvaluationCase(**row) for row in rows]
+
+
+def parse_list(value: str, cast) -> list:
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def print_report(report: EvaluationReport) -> None:
+    print(f"\nCases: {report.cases} ({report.failed_cases} failed), rerank {'on' if report.rerank_enabled else 'off'}")
+    print(f"\n{'k':>4} {'threshold':>10} {'recall@k':>9} {'hit rate':>9} {'MRR':>7} {'results':>8}")
+    best = max(report.configs, key=lambda c: (c.recall_at_k, c.mrr))
+    for c in report.configs:
+        marker = "  <- best" if c is best and len(report.configs) > 1 else ""
+        print(
+            f"{c.match_count:>4} {c.similarity_threshold:>10.2f} {c.recall_at_k:>9.3f} "
+            f"{c.hit_rate:>9.3f} {c.mrr:>7.3f} {c.mean_results:>8.1f}{marker}"
+        )
+    print(f"\n{'stage':<22} {'count':>6} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for stage, s in report.latency.items():
+        print(
+            f"{stage:<22} {s.count:>6} {s.mean_ms:>8.1f} {s.p50_ms:>8.1f} "
+            f"{s.p90_ms:>8.1f} {s.p99_ms:>8.1f} {s.max_ms:>8.1f}"
+        )
+    if report.answer_term_coverage is not None:
+        print(f"\nAnswer term coverage: {report.answer_term_coverage:.1%}")
+
+
+async def main(args: argparse.Namespace) -> int:
+    request = EvaluationRequest(
+        cases=load_cases(args.cases),
+        match_counts=parse_list(args.match_counts, int),
+        similarity_thresholds=parse_list(args.thresholds, float),
+        generate=args.generate,
+        concurrency=args.concurrency,
+        include_cases=args.output is not None,
+    )
+    report = await run_evaluation(request, args.user_id)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report.model_dump_json(indent=2))
+        print(f"\nWrote {args.output}")
+    return 1 if report.failed_cases == report.cases else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cases", help="JSON or JSONL file of evaluation cases")
+    parser.add_argument("--user-id", required=True, help="User whose documents are searched")
+    parser.add_argument("--match-counts", default="5", help="Comma-separated match counts to sweep")
+    parser.add_argument("--thresholds", default="0.3", help="Comma-separated similarity thresholds to sweep")
+    parser.add_argument("--generate", action="store_true", help="Also answer each question with the first setting")
+    parser.add_argument("--concurrency", type=int, default=8, help="Questions in flight at once")
+    parser.add_argument("--output", help="Write the full report, with per-case results, to this file")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Migrate chunk embeddings to another model without blocking ingestion.
+
+`begin` adds a shadow vector column next to the live one, and ingestion
+starts writing both. Its indexes are then built with CREATE INDEX
+CONCURRENTLY from psql or the SQL editor (`begin` prints the statements),
+since a plain CREATE INDEX would block inserts while it scans the table.
+`backfill` re-embeds existing chunks into the shadow column in throttled
+background batches while retrieval keeps using the old vectors. `finalize`
+swaps the columns atomically once coverage is 100% and the indexes are
+built, and drops the old vectors. `run` does all of it except building the
+indexes, which it waits for, backfilling again if finalize finds chunks
+that arrived in the meantime.
+
+HNSW indexes support at most 2000 dimensions, so larger models are
+migrated with shortened vectors (text-embedding-3 models accept a smaller size).
+
+Usage (from backend/, with the app's .env):
+    python -m scripts.migrate_embeddings status
+    python -m scripts.migrate_embeddings run text-embedding-3-large 1536
+    python -m scripts.migrate_embeddings backfill --batch-size 50 --max-rate 20
+    python -m scripts.migrate_embeddings abort
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+from app.core.config import settings
+from app.services.ingestion.model_migration import (
+    MAX_INDEXED_DIMENSIONS,
+    SHADOW_INDEX_STATEMENTS,
+    MigrationStatus,
+    abort_migration,
+    backfill_shadow_embeddings,
+    begin_migration,
+    finalize_migration,
+    migration_status,
+    shadow_indexes_ready,
+)
+
+FINALIZE_ATTEMPTS = 3
+# How often `run` checks whether the shadow indexes have been built
+INDEX_POLL_SECONDS = 30
+
+
+def print_status(status: MigrationStatus) -> None:
+    print(f"Active model:  {status.model} ({status.dimensions} dimensions)")
+    if not status.migrating:
+        print("No migration in progress")
+        return
+    print(f"Target model:  {status.target_model} ({status.target_dimensions} dimensions)")
+    migrated = status.total_chunks - status.remaining_chunks
+    print(f"Coverage:      {migrated}/{status.total_chunks} chunks ({status.coverage:.1%})")
+
+
+def print_index_statements() -> None:
+    print("Build the shadow indexes from psql or the SQL editor, one statement at a time:")
+    for statement in SHADOW_INDEX_STATEMENTS:
+        print(f"  {statement}")
+
+
+async def wait_for_indexes() -> None:
+    if await shadow_indexes_ready():
+        return
+    print_index_statements()
+    print(f"Waiting for the shadow indexes (checking every {INDEX_POLL_SECONDS}s)", flush=True)
+    while not await shadow_indexes_ready():
+        await asyncio.sleep(INDEX_POLL_SECONDS)
+    print("Shadow indexes are built")
+
+
+async def backfill() -> int:
+    status = await migration_status()
+    started = time.monotonic()
+
+    def report(done: int, batch: int) -> None:
+        rate = done / max(time.monotonic() - started, 1e-9)
+        print(f"  {done}/{status.remaining_chunks} chunks backfilled ({rate:.1f}/s)", flush=True)
+
+    print(f"Backfilling {status.remaining_chunks} chunks with {status.target_model}")
+    done = await backfill_shadow_embeddings(on_batch=report)
+    print(f"Backfilled {done} chunks in {time.monotonic() - started:.1f}s")
+    return done
+
+
+async def run(model: str, dimensions: int) -> None:
+    status = await migration_status()
+    if not status.migrating:
+        await begin_migration(model, dimensions)
+        print(f"Began migration to {model} ({dimensions} dimensions)")
+        print_index_statements()
+    elif (status.target_model, status.target_dimensions) != (model, dimensions):
+        raise ValueError(
+            f"A migration to {status.target_model} ({status.target_dimensions}) is already in progress"
+        )
+
+    for attempt in range(1, FINALIZE_ATTEMPTS + 1):
+        await backfill()
+        await wait_for_indexes()
+        try:
+            await finalize_migration()
+            print(f"Finalized; retrieval now uses {model}")
+            return
+        except Exception as e:
+            # Chunks inserted without a shadow vector since the sweep ended
+            if "incomplete" not in str(e) or attempt == FINALIZE_ATTEMPTS:
+                raise
+            print(f"Finalize found new chunks, backfilling again: {e}")
+
+
+async def main(args: argparse.Namespace) -> int:
+    if args.batch_size is not None:
+        settings.embedding_backfill_batch_size = args.batch_size
+    if args.pause_ms is not None:
+        settings.embedding_backfill_pause_ms = args.pause_ms
+    if args.max_rate is not None:
+        settings.embedding_backfill_max_chunks_per_second = args.max_rate
+
+    try:
+        if args.command == "status":
+            print_status(await migration_status())
+        elif args.command == "begin":
+            await begin_migration(args.model, args.dimensions)
+            print_status(await migration_status())
+            print_index_statements()
+        elif args.command == "backfill":
+            await backfill()
+        elif args.command == "finalize":
+            await finalize_migration()
+            print_status(await migration_status())
+        elif args.command == "abort":
+            await abort_migration()
+            print_status(await migration_status())
+        elif args.command == "run":
+            await run(args.model, args.dimensions)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, help="Chunks re-embedded per request")
+    parser.add_argument("--pause-ms", type=int, help="Pause between backfill batches")
+    parser.add_argument("--max-rate", type=float, help="Backfill rate cap in chunks per second (0 = off)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show the active model and backfill coverage")
+    for name, help in (
+        ("begin", "Add the shadow column for a new model"),
+        ("run", "Begin (if needed), backfill and finalize"),
+    ):
+        command = commands.add_parser(name, help=help)
+        command.add_argument("model", help="Embedding model, e.g. text-embedding-3-large")
+        command.add_argument(
+            "dimensions", type=int, help=f"Vector size, at most {MAX_INDEXED_DIMENSIONS}, e.g. 1536"
+        )
+    commands.add_parser("backfill", help="Embed chunks that have no target-model vector yet")
+    commands.add_parser(
+        "finalize",
+        help="Switch retrieval to the target model once coverage is 100%% and the indexes are built",
+    )
+    commands.add_parser("abort", help="Drop the shadow vectors and keep the active model")
+    sys.exit(asyncio.run(main(parser.parse_args())))
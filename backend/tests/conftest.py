@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+# Settings are read at import time; unit tests never talk to Supabase
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "test")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+
+
+@pytest.fixture
+def anyio_backend():
+    # The app is asyncio-only
+    return "asyncio"
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected, Priority
+
+
+def _controller(global_capacity: int = 64, per_user_capacity: int = 2) -> AdmissionController:
+    return AdmissionController(
+        name="Test",
+        global_capacity=global_capacity,
+        per_user_capacity=per_user_capacity,
+        max_queue={p: 10 for p in Priority},
+        max_wait_seconds={p: 0.2 for p in Priority},
+    )
+
+
+@pytest.mark.anyio
+async def test_user_at_own_limit_does_not_block_other_users():
+    controller = _controller()
+    held = [await controller.acquire("a"), await controller.acquire("a")]
+
+    # A queues behind their own per-user cap while most global slots are free
+    queued = asyncio.create_task(controller.acquire("a"))
+    await asyncio.sleep(0)
+    assert controller.queue_depth() == 1
+
+    ticket = await asyncio.wait_for(controller.acquire("b"), timeout=0.1)
+    assert ticket.user_id == "b"
+    assert controller.queue_depth() == 1
+
+    ticket.release()
+    held[0].release()
+    (await queued).release()
+    held[1].release()
+    assert controller.in_use == 0
+
+
+@pytest.mark.anyio
+async def test_waiter_for_global_capacity_is_served_first():
+    controller = _controller(global_capacity=1)
+    held = await controller.acquire("a")
+
+    queued = asyncio.create_task(controller.acquire("b"))
+    await asyncio.sleep(0)
+    held.release()
+
+    # The slot went to the queued waiter, so a newcomer has to wait its turn
+    with pytest.raises(AdmissionRejected):
+        await controller.acquire("c")
+    (await queued).release()
@@ -0,0 +1,56 @@
+import random
+
+from app.services.ingestion.chunker import chunk_text
+from app.services.retrieval.packer import merge_neighbors
+from app.services.retrieval.search import RetrievedChunk
+
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa"]
+
+
+def _document(rng: random.Random) -> str:
+    sentences = []
+    for _ in range(rng.randint(5, 120)):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(3, 25))]
+        sentences.append(" ".join(words).capitalize() + rng.choice(".!?"))
+    return " ".join(sentences)
+
+
+def _retrieved(text: str) -> list:
+    return [
+        RetrievedChunk(
+            id=f"chunk-{chunk.index}",
+            document_id="doc",
+            content=chunk.content,
+            metadata=dict(chunk.metadata),
+            similarity=0.5,
+            chunk_index=chunk.index,
+        )
+        for chunk in chunk_text(text)
+    ]
+
+
+def test_merging_every_chunk_rebuilds_the_document():
+    rng = random.Random(0)
+    for _ in range(200):
+        text = _document(rng)
+        chunks = _retrieved(text)
+
+        merged = merge_neighbors(list(reversed(chunks)))
+
+        assert len(merged) == 1
+        assert merged[0].content == text
+        assert merged[0].metadata["chunk_ids"] == [c.id for c in chunks]
+
+
+def test_trailing_chunk_inside_previous_one_is_not_repeated():
+    rng = random.Random(1)
+    while True:
+        chunks = _retrieved(_document(rng))
+        # The chunker sometimes emits a last chunk that the previous one already covers
+        if len(chunks) > 2 and chunks[-2].content.endswith(chunks[-1].content):
+            break
+
+    merged = merge_neighbors(chunks[-2:])
+
+    assert len(merged) == 1
+    assert merged[0].content == chunks[-2].content
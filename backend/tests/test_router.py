@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import httpx
+import openai
+import pytest
+
+from app.services.llm.router import ProviderBackend, ProviderRouter
+from app.services.llm.types import StreamInfo
+from benchmarks.loadtest.fake_openai import create_app
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+def _backend(name: str, latency: float = 0.0, error_rate: float = 0.0):
+    app = create_app(latency=latency, token_rate=0, tokens_per_answer=5, error_rate=error_rate)
+    client = openai.AsyncOpenAI(
+        api_key="test",
+        base_url=f"http://{name}/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app)),
+    )
+    return ProviderBackend(name=name, model=f"{name}-model", client=client), app
+
+
+async def _answer(router: ProviderRouter, info: StreamInfo = None) -> str:
+    return "".join([delta async for delta in router.stream(MESSAGES, info)])
+
+
+@pytest.mark.anyio
+async def test_hedge_picks_the_faster_backend():
+    slow, slow_app = _backend("slow", latency=2.0)
+    fast, fast_app = _backend("fast", latency=0.01)
+    router = ProviderRouter([slow, fast], hedge_ms=100)
+
+    info = StreamInfo()
+    started = time.monotonic()
+    assert await _answer(router, info)
+    assert time.monotonic() - started < 1.0
+    assert (info.provider, info.model) == ("fast", "fast-model")
+
+    assert (slow_app.state.chat_requests, fast_app.state.chat_requests) == (1, 1)
+    assert list(fast.stats.outcomes) == [True]
+    # The loser gets one sample at the hedge deadline and no failure
+    assert slow.stats.ttft_ewma == pytest.approx(0.1)
+    assert list(slow.stats.outcomes) == []
+    assert router.ranked()[0] is fast
+
+
+@pytest.mark.anyio
+async def test_cancelled_request_records_no_latency():
+    backend, _ = _backend("only", latency=2.0)
+    router = ProviderRouter([backend])
+
+    task = asyncio.create_task(_answer(router))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert backend.stats.ttft_ewma is None
+    assert list(backend.stats.outcomes) == []
+
+
+@pytest.mark.anyio
+async def test_breaker_opens_after_consecutive_failures():
+    broken, broken_app = _backend("broken", error_rate=1.0)
+    healthy, healthy_app = _backend("healthy")
+    # Known to be slower, so the broken backend is tried first until its circuit opens
+    healthy.stats.ttft_ewma = 5.0
+    router = ProviderRouter([broken, healthy], failure_threshold=2, cooldown_seconds=60)
+
+    for _ in range(3):
+        assert await _answer(router)
+
+    assert broken_app.state.chat_requests == 2
+    assert healthy_app.state.chat_requests == 3
+    assert broken.stats.opened_until > time.monotonic()
+    assert router.ranked() == [healthy]
+
+
+@pytest.mark.anyio
+async def test_half_open_backend_admits_a_single_probe():
+    recovering, recovering_app = _backend("recovering", latency=0.2)
+    healthy, healthy_app = _backend("healthy")
+    healthy.stats.ttft_ewma = 5.0
+    router = ProviderRouter([recovering, healthy], failure_threshold=2, cooldown_seconds=60)
+
+    # Circuit opened earlier and its cooldown has just run out
+    recovering.stats.consecutive_failures = 2
+    recovering.stats.opened_until = time.monotonic() - 1
+
+    answers = await asyncio.gather(*(_answer(router) for _ in range(3)))
+
+    assert all(answers)
+    assert recovering_app.state.chat_requests == 1
+    assert healthy_app.state.chat_requests == 2
+    # The probe succeeded, so the circuit is closed again
+    assert recovering.stats.opened_until == 0.0
+    assert not recovering.stats.probing
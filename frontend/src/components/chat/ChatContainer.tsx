@@ -8,8 +8,19 @@ interface ChatContainerProps {
 }
 
 export function ChatContainer({ threadId }: ChatContainerProps) {
-  const { messages, streamingContent, isLoadingMessages, isSending, error, loadMessages, sendMessage } =
-    useChat(threadId)
+  const {
+    messages,
+    streamingContent,
+    isLoadingMessages,
+    isLoadingOlder,
+    hasOlderMessages,
+    isSending,
+    error,
+    loadMessages,
+    loadOlderMessages,
+    sendMessage,
+    prefetch,
+  } = useChat(threadId)
 
   useEffect(() => {
     loadMessages()
@@ -91,8 +102,11 @@ export function ChatContainer({ threadId }: ChatContainerProps) {
         streamingContent={streamingContent}
         isLoadingMessages={isLoadingMessages}
         isSending={isSending}
+        hasOlderMessages={hasOlderMessages}
+        isLoadingOlder={isLoadingOlder}
+        onLoadOlder={loadOlderMessages}
       />
-      <ChatInput onSend={sendMessage} disabled={isSending} />
+      <ChatInput onSend={sendMessage} onPause={prefetch} disabled={isSending} />
     </div>
   )
 }
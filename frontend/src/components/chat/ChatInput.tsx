@@ -3,13 +3,17 @@ import { cn } from "@/lib/utils";
 
 interface ChatInputProps {
   onSend: (message: string) => void;
+  // Called with the draft once typing pauses, e.g. to prefetch retrieval
+  onPause?: (draft: string) => void;
   disabled: boolean;
 }
 
 const MAX_LINES = 5;
 const LINE_HEIGHT = 20; // approximate line height in pixels for text-sm leading-relaxed
+const PAUSE_MS = 400;
+const MIN_PAUSE_CHARS = 8; // matches the backend's PREFETCH_MIN_CHARS default
 
-export function ChatInput({ onSend, disabled }: ChatInputProps) {
+export function ChatInput({ onSend, onPause, disabled }: ChatInputProps) {
   const [input, setInput] = useState("");
   const [isFocused, setIsFocused] = useState(false);
   const textareaRef = useRef<HTMLTextAreaElement>(null);
@@ -28,6 +32,14 @@ export function ChatInput({ onSend, disabled }: ChatInputProps) {
     }
   };
 
+  // Debounced: fires once the user stops typing for PAUSE_MS
+  useEffect(() => {
+    const draft = input.trim();
+    if (!onPause || disabled || draft.length < MIN_PAUSE_CHARS) return;
+    const timer = setTimeout(() => onPause(draft), PAUSE_MS);
+    return () => clearTimeout(timer);
+  }, [input, onPause, disabled]);
+
   // Auto-resize textarea based on content
   useEffect(() => {
     const textarea = textareaRef.current;
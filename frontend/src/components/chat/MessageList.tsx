@@ -1,6 +1,7 @@
 import { useEffect, useRef } from 'react'
 import { MessageBubble } from './MessageBubble'
 import { TypingIndicator } from './TypingIndicator'
+import { Button } from '@/components/ui/button'
 import type { Message } from '@/lib/api'
 
 interface MessageListProps {
@@ -8,14 +9,27 @@ interface MessageListProps {
   streamingContent: string | null
   isLoadingMessages: boolean
   isSending: boolean
+  hasOlderMessages: boolean
+  isLoadingOlder: boolean
+  onLoadOlder: () => void
 }
 
-export function MessageList({ messages, streamingContent, isLoadingMessages, isSending }: MessageListProps) {
+export function MessageList({
+  messages,
+  streamingContent,
+  isLoadingMessages,
+  isSending,
+  hasOlderMessages,
+  isLoadingOlder,
+  onLoadOlder,
+}: MessageListProps) {
   const bottomRef = useRef<HTMLDivElement>(null)
+  // Only new messages at the bottom scroll; loading earlier ones keeps the position
+  const lastMessageId = messages[messages.length - 1]?.id
 
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: 'smooth' })
-  }, [messages, streamingContent])
+  }, [lastMessageId, streamingContent])
 
   // Loading messages from database
   if (isLoadingMessages) {
@@ -52,6 +66,13 @@ export function MessageList({ messages, streamingContent, isLoadingMessages, isS
   return (
     <div className="flex-1 overflow-y-auto p-6">
       <div className="max-w-[39rem] mx-auto space-y-4">
+        {hasOlderMessages && (
+          <div className="flex justify-center">
+            <Button variant="ghost" size="sm" onClick={onLoadOlder} disabled={isLoadingOlder}>
+              {isLoadingOlder ? 'Loading...' : 'Load earlier messages'}
+            </Button>
+          </div>
+        )}
         {messages.map((message, index) => (
           <div
             key={message.id}
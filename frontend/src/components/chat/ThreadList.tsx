@@ -9,6 +9,9 @@ interface ThreadListProps {
   onDeleteThread: (threadId: string) => void
   onNewThread: () => void
   loading: boolean
+  hasMore: boolean
+  loadingMore: boolean
+  onLoadMore: () => void
 }
 
 export function ThreadList({
@@ -18,6 +21,9 @@ export function ThreadList({
   onDeleteThread,
   onNewThread,
   loading,
+  hasMore,
+  loadingMore,
+  onLoadMore,
 }: ThreadListProps) {
   return (
     <div className="flex flex-col h-full">
@@ -94,6 +100,17 @@ export function ThreadList({
                 />
               </div>
             ))}
+            {hasMore && (
+              <Button
+                variant="ghost"
+                size="sm"
+                className="w-full text-muted-foreground"
+                onClick={onLoadMore}
+                disabled={loadingMore}
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </Button>
+            )}
           </div>
         )}
       </div>
@@ -1,14 +1,26 @@
 import { type Document } from '@/lib/api'
 import { DocumentItem } from './DocumentItem'
+import { Button } from '@/components/ui/button'
 
 interface DocumentListProps {
   documents: Document[]
   loading: boolean
   onDelete: (id: string) => void
   onProcess: (id: string) => void
+  hasMore: boolean
+  loadingMore: boolean
+  onLoadMore: () => void
 }
 
-export function DocumentList({ documents, loading, onDelete, onProcess }: DocumentListProps) {
+export function DocumentList({
+  documents,
+  loading,
+  onDelete,
+  onProcess,
+  hasMore,
+  loadingMore,
+  onLoadMore,
+}: DocumentListProps) {
   if (loading) {
     return (
       <div className="flex items-center justify-center py-12">
@@ -71,6 +83,11 @@ export function DocumentList({ documents, loading, onDelete, onProcess }: Docume
           onProcess={onProcess}
         />
       ))}
+      {hasMore && (
+        <Button variant="outline" className="w-full" onClick={onLoadMore} disabled={loadingMore}>
+          {loadingMore ? 'Loading...' : 'Load more documents'}
+        </Button>
+      )}
     </div>
   )
 }
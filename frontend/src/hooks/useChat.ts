@@ -5,20 +5,24 @@ export function useChat(threadId: string | null) {
   const [messages, setMessages] = useState<Message[]>([])
   const [streamingContent, setStreamingContent] = useState<string | null>(null)
   const [isLoadingMessages, setIsLoadingMessages] = useState(false)
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false)
+  const [olderCursor, setOlderCursor] = useState<string | null>(null)
   const [isSending, setIsSending] = useState(false)
   const [error, setError] = useState<string | null>(null)
 
   const loadMessages = useCallback(async () => {
     if (!threadId) {
       setMessages([])
+      setOlderCursor(null)
       return
     }
 
     try {
       setIsLoadingMessages(true)
       setError(null)
-      const data = await api.getMessages(threadId)
-      setMessages(data)
+      const page = await api.getMessages(threadId)
+      setMessages(page.items)
+      setOlderCursor(page.nextCursor)
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to load messages')
     } finally {
@@ -26,6 +30,22 @@ export function useChat(threadId: string | null) {
     }
   }, [threadId])
 
+  const loadOlderMessages = useCallback(async () => {
+    if (!threadId || !olderCursor) return
+
+    try {
+      setIsLoadingOlder(true)
+      setError(null)
+      const page = await api.getMessages(threadId, olderCursor)
+      setMessages((prev) => [...page.items, ...prev])
+      setOlderCursor(page.nextCursor)
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to load messages')
+    } finally {
+      setIsLoadingOlder(false)
+    }
+  }, [threadId, olderCursor])
+
   const sendMessage = useCallback(
     async (content: string) => {
       if (!threadId) return
@@ -102,13 +122,26 @@ export function useChat(threadId: string | null) {
     [threadId]
   )
 
+  // Speculative retrieval while typing; failures only cost the speedup
+  const prefetch = useCallback(
+    (content: string) => {
+      if (!threadId) return
+      api.prefetch(threadId, content).catch(() => {})
+    },
+    [threadId]
+  )
+
   return {
     messages,
     streamingContent,
     isLoadingMessages,
+    isLoadingOlder,
+    hasOlderMessages: olderCursor !== null,
     isSending,
     error,
     loadMessages,
+    loadOlderMessages,
     sendMessage,
+    prefetch,
   }
 }
@@ -5,6 +5,8 @@ import { supabase } from '@/lib/supabase'
 export function useDocuments() {
   const [documents, setDocuments] = useState<Document[]>([])
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   const [error, setError] = useState<string | null>(null)
   const [uploading, setUploading] = useState(false)
 
@@ -12,8 +14,9 @@ export function useDocuments() {
     try {
       setLoading(true)
       setError(null)
-      const data = await api.listDocuments()
-      setDocuments(data)
+      const page = await api.listDocuments()
+      setDocuments(page.items)
+      setNextCursor(page.nextCursor)
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to fetch documents')
     } finally {
@@ -21,6 +24,25 @@ export function useDocuments() {
     }
   }, [])
 
+  const loadMore = useCallback(async () => {
+    if (!nextCursor) return
+    try {
+      setLoadingMore(true)
+      setError(null)
+      const page = await api.listDocuments(nextCursor)
+      setDocuments((prev) => {
+        // Skip documents the realtime subscription already added
+        const seen = new Set(prev.map((d) => d.id))
+        return [...prev, ...page.items.filter((d) => !seen.has(d.id))]
+      })
+      setNextCursor(page.nextCursor)
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to fetch documents')
+    } finally {
+      setLoadingMore(false)
+    }
+  }, [nextCursor])
+
   useEffect(() => {
     fetchDocuments()
   }, [fetchDocuments])
@@ -114,11 +136,14 @@ export function useDocuments() {
   return {
     documents,
     loading,
+    loadingMore,
+    hasMore: nextCursor !== null,
     error,
     uploading,
     uploadDocument,
     deleteDocument,
     processDocument,
+    loadMore,
     refetch: fetchDocuments,
   }
 }
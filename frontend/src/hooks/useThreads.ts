@@ -4,14 +4,17 @@ import { api, type Thread } from '@/lib/api'
 export function useThreads() {
   const [threads, setThreads] = useState<Thread[]>([])
   const [loading, setLoading] = useState(true)
+  const [loadingMore, setLoadingMore] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
   const [error, setError] = useState<string | null>(null)
 
   const fetchThreads = useCallback(async () => {
     try {
       setLoading(true)
       setError(null)
-      const data = await api.listThreads()
-      setThreads(data)
+      const page = await api.listThreads()
+      setThreads(page.items)
+      setNextCursor(page.nextCursor)
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to fetch threads')
     } finally {
@@ -19,6 +22,25 @@ export function useThreads() {
     }
   }, [])
 
+  const loadMore = useCallback(async () => {
+    if (!nextCursor) return
+    try {
+      setLoadingMore(true)
+      setError(null)
+      const page = await api.listThreads(nextCursor)
+      setThreads((prev) => {
+        // Threads created since the first page was loaded may show up again
+        const seen = new Set(prev.map((t) => t.id))
+        return [...prev, ...page.items.filter((t) => !seen.has(t.id))]
+      })
+      setNextCursor(page.nextCursor)
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to fetch threads')
+    } finally {
+      setLoadingMore(false)
+    }
+  }, [nextCursor])
+
   useEffect(() => {
     fetchThreads()
   }, [fetchThreads])
@@ -47,9 +69,12 @@ export function useThreads() {
   return {
     threads,
     loading,
+    loadingMore,
+    hasMore: nextCursor !== null,
     error,
     createThread,
     deleteThread,
+    loadMore,
     refetch: fetchThreads,
   }
 }
@@ -13,6 +13,22 @@ async function getAuthHeaders(): Promise<Record<string, string>> {
   }
 }
 
+// List endpoints return one page and put the next page's cursor in this header
+const NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+export interface Page<T> {
+  items: T[]
+  nextCursor: string | null
+}
+
+async function fetchPage<T>(path: string, cursor: string | null | undefined, errorMessage: string): Promise<Page<T>> {
+  const headers = await getAuthHeaders()
+  const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''
+  const response = await fetch(`${API_URL}${path}${query}`, { headers })
+  if (!response.ok) throw new Error(errorMessage)
+  return { items: await response.json(), nextCursor: response.headers.get(NEXT_CURSOR_HEADER) }
+}
+
 export interface Thread {
   id: string
   user_id: string
@@ -40,14 +56,26 @@ export interface Document {
   error_message: string | null
   chunk_count: number
   created_at: string
+  progress?: DocumentProgress | null
+}
+
+export interface DocumentProgress {
+  stage: 'download' | 'extract' | 'chunk' | 'embedding' | 'done' | 'failed' | 'queued' | null
+  bytes_total?: number | null
+  bytes_downloaded?: number
+  pages_total?: number
+  pages_extracted?: number
+  chunks_total?: number
+  chunks_embedded?: number
+  chunks_inserted?: number
+  eta_seconds?: number | null
+  timings: Record<string, number>
 }
 
 export const api = {
-  async listThreads(): Promise<Thread[]> {
-    const headers = await getAuthHeaders()
-    const response = await fetch(`${API_URL}/api/threads`, { headers })
-    if (!response.ok) throw new Error('Failed to fetch threads')
-    return response.json()
+  // Most recently updated first
+  async listThreads(cursor?: string | null): Promise<Page<Thread>> {
+    return fetchPage<Thread>('/api/threads', cursor, 'Failed to fetch threads')
   },
 
   async createThread(title?: string): Promise<Thread> {
@@ -77,11 +105,9 @@ export const api = {
     if (!response.ok) throw new Error('Failed to delete thread')
   },
 
-  async getMessages(threadId: string): Promise<Message[]> {
-    const headers = await getAuthHeaders()
-    const response = await fetch(`${API_URL}/api/threads/${threadId}/messages`, { headers })
-    if (!response.ok) throw new Error('Failed to fetch messages')
-    return response.json()
+  // Latest messages in chronological order; the cursor pages back to earlier ones
+  async getMessages(threadId: string, cursor?: string | null): Promise<Page<Message>> {
+    return fetchPage<Message>(`/api/threads/${threadId}/messages`, cursor, 'Failed to fetch messages')
   },
 
   async sendMessage(threadId: string, content: string): Promise<ReadableStreamDefaultReader<Uint8Array>> {
@@ -96,12 +122,20 @@ export const api = {
     return response.body.getReader()
   },
 
-  // Document APIs
-  async listDocuments(): Promise<Document[]> {
+  // Fire-and-forget: starts retrieval for a draft so sending it is faster
+  async prefetch(threadId: string, content: string): Promise<void> {
     const headers = await getAuthHeaders()
-    const response = await fetch(`${API_URL}/api/documents`, { headers })
-    if (!response.ok) throw new Error('Failed to fetch documents')
-    return response.json()
+    await fetch(`${API_URL}/api/threads/${threadId}/prefetch`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify({ content }),
+    })
+  },
+
+  // Document APIs
+  // Newest first
+  async listDocuments(cursor?: string | null): Promise<Page<Document>> {
+    return fetchPage<Document>('/api/documents', cursor, 'Failed to fetch documents')
   },
 
   async uploadDocument(file: File): Promise<Document> {
@@ -143,6 +177,17 @@ export const api = {
     if (!response.ok) throw new Error('Failed to delete document')
   },
 
+  async deleteDocuments(documentIds: string[]): Promise<{ deleted: string[]; not_found: string[] }> {
+    const headers = await getAuthHeaders()
+    const response = await fetch(`${API_URL}/api/documents/delete`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify({ document_ids: documentIds }),
+    })
+    if (!response.ok) throw new Error('Failed to delete documents')
+    return response.json()
+  },
+
   async processDocument(documentId: string): Promise<void> {
     const headers = await getAuthHeaders()
     const response = await fetch(`${API_URL}/api/documents/${documentId}/process`, {
@@ -4,7 +4,7 @@ import { ChatContainer } from '@/components/chat/ChatContainer'
 import { useThreads } from '@/hooks/useThreads'
 
 export function ChatPage() {
-  const { threads, loading, createThread, deleteThread } = useThreads()
+  const { threads, loading, loadingMore, hasMore, loadMore, createThread, deleteThread } = useThreads()
   const [activeThreadId, setActiveThreadId] = useState<string | null>(null)
 
   const handleNewThread = useCallback(async () => {
@@ -45,6 +45,9 @@ export function ChatPage() {
             onDeleteThread={handleDeleteThread}
             onNewThread={handleNewThread}
             loading={loading}
+            hasMore={hasMore}
+            loadingMore={loadingMore}
+            onLoadMore={loadMore}
           />
         </div>
       </aside>
@@ -6,6 +6,9 @@ export function DocumentsPage() {
   const {
     documents,
     loading,
+    loadingMore,
+    hasMore,
+    loadMore,
     error,
     uploading,
     uploadDocument,
@@ -45,6 +48,9 @@ export function DocumentsPage() {
               loading={loading}
               onDelete={deleteDocument}
               onProcess={processDocument}
+              hasMore={hasMore}
+              loadingMore={loadingMore}
+              onLoadMore={loadMore}
             />
           </div>
         </div>
@@ -0,0 +1,36 @@
+-- Return chunk_index from match_chunks so neighboring chunks can be merged
+-- when packing context. The return type changes, so the function is recreated.
+DROP FUNCTION IF EXISTS match_chunks(vector, INTEGER, UUID);
+
+CREATE OR REPLACE FUNCTION match_chunks(
+  query_embedding vector(1536),
+  match_count INTEGER DEFAULT 5,
+  filter_user_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  document_id UUID,
+  content TEXT,
+  metadata JSONB,
+  chunk_index INTEGER,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    c.id,
+    c.document_id,
+    c.content,
+    c.metadata,
+    c.chunk_index,
+    1 - (c.embedding <=> query_embedding) AS similarity
+  FROM chunks c
+  WHERE
+    (filter_user_id IS NULL OR c.user_id = filter_user_id)
+    AND c.embedding IS NOT NULL
+  ORDER BY c.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
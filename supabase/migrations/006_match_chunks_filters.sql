@@ -0,0 +1,55 @@
+-- Structured retrieval filters applied inside match_chunks, so the vector
+-- scan only considers rows the caller is allowed to match.
+
+-- Indexes for the filtered fields
+CREATE INDEX IF NOT EXISTS idx_chunks_metadata ON chunks USING gin (metadata jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS idx_chunks_user_filename ON chunks (user_id, (metadata->>'filename'));
+CREATE INDEX IF NOT EXISTS idx_chunks_user_created_at ON chunks (user_id, created_at);
+
+DROP FUNCTION IF EXISTS match_chunks(vector, INTEGER, UUID);
+
+-- hnsw.iterative_scan (pgvector >= 0.8) keeps scanning the HNSW graph until
+-- match_count rows pass the filters instead of returning a short result set.
+CREATE OR REPLACE FUNCTION match_chunks(
+  query_embedding vector(1536),
+  match_count INTEGER DEFAULT 5,
+  filter_user_id UUID DEFAULT NULL,
+  filter_document_ids UUID[] DEFAULT NULL,
+  filter_filenames TEXT[] DEFAULT NULL,
+  filter_created_after TIMESTAMPTZ DEFAULT NULL,
+  filter_created_before TIMESTAMPTZ DEFAULT NULL,
+  filter_metadata JSONB DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  document_id UUID,
+  content TEXT,
+  metadata JSONB,
+  chunk_index INTEGER,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+SET hnsw.iterative_scan = strict_order
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    c.id,
+    c.document_id,
+    c.content,
+    c.metadata,
+    c.chunk_index,
+    1 - (c.embedding <=> query_embedding) AS similarity
+  FROM chunks c
+  WHERE
+    (filter_user_id IS NULL OR c.user_id = filter_user_id)
+    AND c.embedding IS NOT NULL
+    AND (filter_document_ids IS NULL OR c.document_id = ANY(filter_document_ids))
+    AND (filter_filenames IS NULL OR c.metadata->>'filename' = ANY(filter_filenames))
+    AND (filter_created_after IS NULL OR c.created_at >= filter_created_after)
+    AND (filter_created_before IS NULL OR c.created_at < filter_created_before)
+    AND (filter_metadata IS NULL OR c.metadata @> filter_metadata)
+  ORDER BY c.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
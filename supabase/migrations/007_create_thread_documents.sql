@@ -0,0 +1,69 @@
+-- Document sets attached to a thread. When a thread has attachments,
+-- retrieval only searches chunks of those documents.
+CREATE TABLE thread_documents (
+  thread_id UUID NOT NULL REFERENCES threads(id) ON DELETE CASCADE,
+  document_id UUID NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  PRIMARY KEY (thread_id, document_id)
+);
+
+-- Enable Row Level Security
+ALTER TABLE thread_documents ENABLE ROW LEVEL SECURITY;
+
+-- Policy: Users can only manage attachments on their own threads
+CREATE POLICY "Users can CRUD own thread documents" ON thread_documents
+  FOR ALL USING (auth.uid() = user_id);
+
+-- Create index for cascading deletes from documents
+CREATE INDEX idx_thread_documents_document_id ON thread_documents(document_id);
+
+-- Scoped search: exact distance over the chunks of a small document set.
+-- The MATERIALIZED CTE makes the planner fetch rows through
+-- idx_chunks_document_id instead of walking the user-wide HNSW graph.
+CREATE OR REPLACE FUNCTION match_chunks_scoped(
+  query_embedding vector(1536),
+  filter_document_ids UUID[],
+  match_count INTEGER DEFAULT 5,
+  filter_user_id UUID DEFAULT NULL,
+  filter_filenames TEXT[] DEFAULT NULL,
+  filter_created_after TIMESTAMPTZ DEFAULT NULL,
+  filter_created_before TIMESTAMPTZ DEFAULT NULL,
+  filter_metadata JSONB DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  document_id UUID,
+  content TEXT,
+  metadata JSONB,
+  chunk_index INTEGER,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  WITH scoped AS MATERIALIZED (
+    SELECT c.id, c.document_id, c.content, c.metadata, c.chunk_index, c.embedding
+    FROM chunks c
+    WHERE
+      c.document_id = ANY(filter_document_ids)
+      AND (filter_user_id IS NULL OR c.user_id = filter_user_id)
+      AND c.embedding IS NOT NULL
+      AND (filter_filenames IS NULL OR c.metadata->>'filename' = ANY(filter_filenames))
+      AND (filter_created_after IS NULL OR c.created_at >= filter_created_after)
+      AND (filter_created_before IS NULL OR c.created_at < filter_created_before)
+      AND (filter_metadata IS NULL OR c.metadata @> filter_metadata)
+  )
+  SELECT
+    s.id,
+    s.document_id,
+    s.content,
+    s.metadata,
+    s.chunk_index,
+    1 - (s.embedding <=> query_embedding) AS similarity
+  FROM scoped s
+  ORDER BY s.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
@@ -0,0 +1,7 @@
+-- Rolling conversation summaries live in threads.metadata:
+--   summary          text of everything folded so far
+--   summary_through  created_at of the newest message included in the summary
+ALTER TABLE threads ADD COLUMN IF NOT EXISTS metadata JSONB DEFAULT '{}';
+
+-- Recent-history reads fetch the newest messages of a thread first
+CREATE INDEX IF NOT EXISTS idx_messages_thread_created_at ON messages(thread_id, created_at DESC);
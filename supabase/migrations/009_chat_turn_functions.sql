@@ -0,0 +1,94 @@
+-- Collapse the chat turn's setup and teardown into one round trip each.
+
+-- Verify ownership, save the user message and return the bounded history
+-- (only messages newer than the thread's rolling summary) plus the thread's
+-- attached document set. Returns NULL if the thread does not belong to the user.
+CREATE OR REPLACE FUNCTION begin_chat_turn(
+  p_thread_id UUID,
+  p_user_id UUID,
+  p_content TEXT,
+  p_history_limit INTEGER DEFAULT 40
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_thread threads%ROWTYPE;
+  v_message_id UUID;
+  v_since TIMESTAMPTZ;
+  v_history JSONB;
+  v_history_count INTEGER;
+  v_document_ids JSONB;
+BEGIN
+  SELECT * INTO v_thread
+  FROM threads
+  WHERE id = p_thread_id AND user_id = p_user_id;
+
+  IF NOT FOUND THEN
+    RETURN NULL;
+  END IF;
+
+  v_since := (v_thread.metadata->>'summary_through')::TIMESTAMPTZ;
+
+  INSERT INTO messages (thread_id, user_id, role, content)
+  VALUES (p_thread_id, p_user_id, 'user', p_content)
+  RETURNING id INTO v_message_id;
+
+  SELECT
+    COALESCE(jsonb_agg(to_jsonb(h) ORDER BY h.created_at, h.id), '[]'::JSONB),
+    count(*)
+  INTO v_history, v_history_count
+  FROM (
+    SELECT m.id, m.role, m.content, m.created_at
+    FROM messages m
+    WHERE m.thread_id = p_thread_id
+      AND (v_since IS NULL OR m.created_at > v_since)
+    ORDER BY m.created_at DESC
+    LIMIT p_history_limit
+  ) h;
+
+  SELECT COALESCE(jsonb_agg(td.document_id), '[]'::JSONB)
+  INTO v_document_ids
+  FROM thread_documents td
+  WHERE td.thread_id = p_thread_id;
+
+  RETURN jsonb_build_object(
+    'thread', jsonb_build_object(
+      'id', v_thread.id,
+      'title', v_thread.title,
+      'metadata', COALESCE(v_thread.metadata, '{}'::JSONB)
+    ),
+    'message_id', v_message_id,
+    'history', v_history,
+    'history_truncated', v_history_count >= p_history_limit,
+    'document_ids', v_document_ids
+  );
+END;
+$$;
+
+-- Save the assistant message and, on the first turn, set the thread title.
+CREATE OR REPLACE FUNCTION finish_chat_turn(
+  p_thread_id UUID,
+  p_user_id UUID,
+  p_content TEXT,
+  p_metadata JSONB DEFAULT '{}',
+  p_title TEXT DEFAULT NULL
+)
+RETURNS UUID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_message_id UUID;
+BEGIN
+  INSERT INTO messages (thread_id, user_id, role, content, metadata)
+  VALUES (p_thread_id, p_user_id, 'assistant', p_content, COALESCE(p_metadata, '{}'::JSONB))
+  RETURNING id INTO v_message_id;
+
+  IF p_title IS NOT NULL THEN
+    UPDATE threads SET title = p_title
+    WHERE id = p_thread_id AND user_id = p_user_id;
+  END IF;
+
+  RETURN v_message_id;
+END;
+$$;
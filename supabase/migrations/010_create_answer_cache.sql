@@ -0,0 +1,96 @@
+-- Semantic answer cache: answers keyed by the query embedding's nearest
+-- neighbor, the exact set of retrieved chunks and the model.
+CREATE TABLE answer_cache (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  model TEXT NOT NULL,
+  query TEXT NOT NULL,
+  query_embedding vector(1536) NOT NULL,
+  chunk_ids UUID[] NOT NULL, -- sorted
+  document_ids UUID[] NOT NULL,
+  answer TEXT NOT NULL,
+  generation_ms INTEGER,
+  hit_count INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  last_hit_at TIMESTAMPTZ
+);
+
+-- Enable Row Level Security
+ALTER TABLE answer_cache ENABLE ROW LEVEL SECURITY;
+
+-- Policy: Users can only see their own cached answers
+CREATE POLICY "Users can view own cached answers" ON answer_cache
+  FOR SELECT USING (auth.uid() = user_id);
+
+-- Create indexes for lookup and invalidation
+CREATE INDEX idx_answer_cache_user_model ON answer_cache(user_id, model);
+CREATE INDEX idx_answer_cache_document_ids ON answer_cache USING gin (document_ids);
+CREATE INDEX idx_answer_cache_embedding ON answer_cache USING hnsw (query_embedding vector_cosine_ops);
+
+-- Find a cached answer for a near-identical question over the same chunks
+-- and record the hit.
+CREATE OR REPLACE FUNCTION match_answer_cache(
+  p_user_id UUID,
+  p_model TEXT,
+  p_query_embedding vector(1536),
+  p_chunk_ids UUID[],
+  p_min_similarity FLOAT DEFAULT 0.95,
+  p_max_age INTERVAL DEFAULT INTERVAL '7 days'
+)
+RETURNS TABLE (
+  id UUID,
+  answer TEXT,
+  similarity FLOAT,
+  generation_ms INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  WITH hit AS (
+    SELECT
+      a.id,
+      a.answer,
+      1 - (a.query_embedding <=> p_query_embedding) AS similarity,
+      a.generation_ms
+    FROM answer_cache a
+    WHERE
+      a.user_id = p_user_id
+      AND a.model = p_model
+      AND a.chunk_ids = p_chunk_ids
+      AND a.created_at > now() - p_max_age
+    ORDER BY a.query_embedding <=> p_query_embedding
+    LIMIT 1
+  ),
+  touched AS (
+    UPDATE answer_cache a
+    SET hit_count = a.hit_count + 1, last_hit_at = now()
+    FROM hit
+    WHERE a.id = hit.id AND hit.similarity >= p_min_similarity
+    RETURNING a.id
+  )
+  SELECT hit.id, hit.answer, hit.similarity, hit.generation_ms
+  FROM hit
+  JOIN touched ON touched.id = hit.id;
+END;
+$$;
+
+-- Drop cached answers whose source documents change or disappear
+CREATE OR REPLACE FUNCTION invalidate_answer_cache()
+RETURNS TRIGGER AS $$
+BEGIN
+  DELETE FROM answer_cache WHERE document_ids @> ARRAY[OLD.id];
+  RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER invalidate_answer_cache_on_document_delete
+  AFTER DELETE ON documents
+  FOR EACH ROW
+  EXECUTE FUNCTION invalidate_answer_cache();
+
+CREATE TRIGGER invalidate_answer_cache_on_document_update
+  AFTER UPDATE OF status, chunk_count ON documents
+  FOR EACH ROW
+  WHEN (OLD.status IS DISTINCT FROM NEW.status OR OLD.chunk_count IS DISTINCT FROM NEW.chunk_count)
+  EXECUTE FUNCTION invalidate_answer_cache();
@@ -0,0 +1,18 @@
+-- Composite indexes for keyset pagination on the list endpoints.
+-- Each matches the endpoint's filter + ORDER BY (sort column, id), so a page
+-- is an index range scan no matter how deep the cursor is.
+
+CREATE INDEX IF NOT EXISTS idx_threads_user_updated_at_id
+    ON threads (user_id, updated_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_messages_thread_created_at_id
+    ON messages (thread_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_documents_user_created_at_id
+    ON documents (user_id, created_at DESC, id DESC);
+
+-- Superseded by the composite indexes above (leading column covers them)
+DROP INDEX IF EXISTS idx_threads_user_id;
+DROP INDEX IF EXISTS idx_messages_thread_id;
+DROP INDEX IF EXISTS idx_messages_thread_created_at;
+DROP INDEX IF EXISTS idx_documents_user_id;
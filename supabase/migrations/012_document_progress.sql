@@ -0,0 +1,9 @@
+-- Fine-grained ingestion progress, written by the pipeline at most once per
+-- second per document and pushed to the frontend through Realtime:
+--   stage                                   download | extract | chunk | embedding | done | failed | queued
+--   bytes_total, bytes_downloaded
+--   pages_total, pages_extracted            PDFs only
+--   chunks_total, chunks_embedded, chunks_inserted
+--   eta_seconds                             remaining time for the embedding stage
+--   timings                                 seconds spent in each finished stage
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS progress JSONB;
@@ -0,0 +1,179 @@
+-- Asynchronous document deletion. Deleting a document only tombstones it;
+-- a background reaper in the backend removes its chunks in bounded batches,
+-- removes the storage objects in bulk and finally deletes the row, so no
+-- request holds locks while tens of thousands of chunks (and their HNSW
+-- entries) are deleted.
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMPTZ;
+
+-- Documents waiting to be reaped. Kept separate from documents so retrieval
+-- can exclude them with an anti-join against a table that is almost always
+-- tiny, instead of a documents lookup for every candidate chunk.
+CREATE TABLE document_tombstones (
+  document_id UUID PRIMARY KEY REFERENCES documents(id) ON DELETE CASCADE,
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  storage_path TEXT NOT NULL,
+  deleted_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Enable Row Level Security (service role only; users never read this)
+ALTER TABLE document_tombstones ENABLE ROW LEVEL SECURITY;
+
+-- Reaper worklist order
+CREATE INDEX idx_document_tombstones_deleted_at ON document_tombstones(deleted_at);
+
+-- Tombstone a user's documents. Returns the ids that were tombstoned;
+-- missing, foreign and already deleted ids are skipped.
+CREATE OR REPLACE FUNCTION tombstone_documents(
+  p_user_id UUID,
+  p_document_ids UUID[]
+)
+RETURNS SETOF UUID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  WITH marked AS (
+    UPDATE documents d
+    SET deleted_at = now()
+    WHERE d.id = ANY(p_document_ids)
+      AND d.user_id = p_user_id
+      AND d.deleted_at IS NULL
+    RETURNING d.id, d.user_id, d.storage_path
+  ),
+  queued AS (
+    INSERT INTO document_tombstones (document_id, user_id, storage_path)
+    SELECT m.id, m.user_id, m.storage_path FROM marked m
+    ON CONFLICT (document_id) DO NOTHING
+    RETURNING document_id
+  ),
+  -- Answers citing these documents must not be served again
+  invalidated AS (
+    DELETE FROM answer_cache a
+    WHERE a.document_ids && ARRAY(SELECT m.id FROM marked m)
+  )
+  SELECT q.document_id FROM queued q;
+END;
+$$;
+
+-- Delete up to p_batch_size chunks of a tombstoned document. Returns the
+-- number deleted; the reaper calls it until it returns less than the batch.
+CREATE OR REPLACE FUNCTION reap_document_chunks(
+  p_document_id UUID,
+  p_batch_size INTEGER DEFAULT 1000
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_deleted INTEGER;
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM document_tombstones WHERE document_id = p_document_id) THEN
+    RETURN 0;
+  END IF;
+
+  DELETE FROM chunks
+  WHERE id IN (
+    SELECT c.id FROM chunks c
+    WHERE c.document_id = p_document_id
+    LIMIT p_batch_size
+  );
+  GET DIAGNOSTICS v_deleted = ROW_COUNT;
+  RETURN v_deleted;
+END;
+$$;
+
+-- Retrieval excludes tombstoned documents from here on. Same signatures as
+-- 006 and 007, so callers are unchanged.
+CREATE OR REPLACE FUNCTION match_chunks(
+  query_embedding vector(1536),
+  match_count INTEGER DEFAULT 5,
+  filter_user_id UUID DEFAULT NULL,
+  filter_document_ids UUID[] DEFAULT NULL,
+  filter_filenames TEXT[] DEFAULT NULL,
+  filter_created_after TIMESTAMPTZ DEFAULT NULL,
+  filter_created_before TIMESTAMPTZ DEFAULT NULL,
+  filter_metadata JSONB DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  document_id UUID,
+  content TEXT,
+  metadata JSONB,
+  chunk_index INTEGER,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+SET hnsw.iterative_scan = strict_order
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    c.id,
+    c.document_id,
+    c.content,
+    c.metadata,
+    c.chunk_index,
+    1 - (c.embedding <=> query_embedding) AS similarity
+  FROM chunks c
+  WHERE
+    (filter_user_id IS NULL OR c.user_id = filter_user_id)
+    AND c.embedding IS NOT NULL
+    AND (filter_document_ids IS NULL OR c.document_id = ANY(filter_document_ids))
+    AND (filter_filenames IS NULL OR c.metadata->>'filename' = ANY(filter_filenames))
+    AND (filter_created_after IS NULL OR c.created_at >= filter_created_after)
+    AND (filter_created_before IS NULL OR c.created_at < filter_created_before)
+    AND (filter_metadata IS NULL OR c.metadata @> filter_metadata)
+    AND NOT EXISTS (SELECT 1 FROM document_tombstones t WHERE t.document_id = c.document_id)
+  ORDER BY c.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION match_chunks_scoped(
+  query_embedding vector(1536),
+  filter_document_ids UUID[],
+  match_count INTEGER DEFAULT 5,
+  filter_user_id UUID DEFAULT NULL,
+  filter_filenames TEXT[] DEFAULT NULL,
+  filter_created_after TIMESTAMPTZ DEFAULT NULL,
+  filter_created_before TIMESTAMPTZ DEFAULT NULL,
+  filter_metadata JSONB DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  document_id UUID,
+  content TEXT,
+  metadata JSONB,
+  chunk_index INTEGER,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  WITH scoped AS MATERIALIZED (
+    SELECT c.id, c.document_id, c.content, c.metadata, c.chunk_index, c.embedding
+    FROM chunks c
+    WHERE
+      c.document_id = ANY(filter_document_ids)
+      AND (filter_user_id IS NULL OR c.user_id = filter_user_id)
+      AND c.embedding IS NOT NULL
+      AND (filter_filenames IS NULL OR c.metadata->>'filename' = ANY(filter_filenames))
+      AND (filter_created_after IS NULL OR c.created_at >= filter_created_after)
+      AND (filter_created_before IS NULL OR c.created_at < filter_created_before)
+      AND (filter_metadata IS NULL OR c.metadata @> filter_metadata)
+      AND NOT EXISTS (SELECT 1 FROM document_tombstones t WHERE t.document_id = c.document_id)
+  )
+  SELECT
+    s.id,
+    s.document_id,
+    s.content,
+    s.metadata,
+    s.chunk_index,
+    1 - (s.embedding <=> query_embedding) AS similarity
+  FROM scoped s
+  ORDER BY s.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
@@ -0,0 +1,227 @@
+-- Ingestion job queue shared by every API replica.
+--
+-- Workers claim queued jobs with FOR UPDATE SKIP LOCKED, so concurrent
+-- replicas never pick the same job, and hold them under a lease they extend
+-- with heartbeats. A sweeper requeues jobs whose lease expired (the worker
+-- crashed or lost its connection) and fails jobs that keep dying.
+CREATE TABLE ingestion_jobs (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  document_id UUID NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 3,
+  run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+  locked_by TEXT,
+  lease_expires_at TIMESTAMPTZ,
+  last_error TEXT,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+-- Enable Row Level Security
+ALTER TABLE ingestion_jobs ENABLE ROW LEVEL SECURITY;
+
+-- Policy: Users can see the jobs of their own documents
+CREATE POLICY "Users can view own ingestion jobs" ON ingestion_jobs
+  FOR SELECT USING (auth.uid() = user_id);
+
+-- At most one live job per document
+CREATE UNIQUE INDEX idx_ingestion_jobs_active_document
+  ON ingestion_jobs(document_id) WHERE status IN ('queued', 'running');
+
+-- Claim order and lease sweeps only ever look at live jobs
+CREATE INDEX idx_ingestion_jobs_queue
+  ON ingestion_jobs(run_after, created_at) WHERE status = 'queued';
+CREATE INDEX idx_ingestion_jobs_lease
+  ON ingestion_jobs(lease_expires_at) WHERE status = 'running';
+
+CREATE TRIGGER update_ingestion_jobs_updated_at
+  BEFORE UPDATE ON ingestion_jobs
+  FOR EACH ROW
+  EXECUTE FUNCTION update_updated_at_column();
+
+-- Queue a document for ingestion. Returns the live job and whether it was
+-- created by this call (false if the document already had one), or no row
+-- if the document does not exist, is not the user's or was deleted.
+CREATE OR REPLACE FUNCTION enqueue_ingestion_job(
+  p_document_id UUID,
+  p_user_id UUID,
+  p_max_attempts INTEGER DEFAULT 3
+)
+RETURNS TABLE (job_id UUID, created BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_job_id UUID;
+BEGIN
+  PERFORM 1 FROM documents d
+  WHERE d.id = p_document_id AND d.user_id = p_user_id AND d.deleted_at IS NULL
+  FOR UPDATE;
+  IF NOT FOUND THEN
+    RETURN;
+  END IF;
+
+  INSERT INTO ingestion_jobs (document_id, user_id, max_attempts)
+  VALUES (p_document_id, p_user_id, p_max_attempts)
+  ON CONFLICT (document_id) WHERE status IN ('queued', 'running') DO NOTHING
+  RETURNING id INTO v_job_id;
+
+  IF v_job_id IS NOT NULL THEN
+    UPDATE documents
+    SET status = 'pending', error_message = NULL
+    WHERE id = p_document_id;
+    RETURN QUERY SELECT v_job_id, TRUE;
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  SELECT j.id, FALSE
+  FROM ingestion_jobs j
+  WHERE j.document_id = p_document_id AND j.status IN ('queued', 'running');
+END;
+$$;
+
+-- Claim up to p_limit runnable jobs for a worker and mark their documents
+-- as processing. Rows locked by another claimer are skipped, not waited on.
+CREATE OR REPLACE FUNCTION claim_ingestion_jobs(
+  p_worker_id TEXT,
+  p_limit INTEGER DEFAULT 1,
+  p_lease_seconds INTEGER DEFAULT 60
+)
+RETURNS SETOF ingestion_jobs
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  WITH next AS (
+    SELECT j.id
+    FROM ingestion_jobs j
+    WHERE j.status = 'queued' AND j.run_after <= now()
+    ORDER BY j.run_after, j.created_at
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  ),
+  claimed AS (
+    UPDATE ingestion_jobs j
+    SET
+      status = 'running',
+      locked_by = p_worker_id,
+      lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+      attempts = j.attempts + 1
+    FROM next
+    WHERE j.id = next.id
+    RETURNING j.*
+  ),
+  processing AS (
+    UPDATE documents d
+    SET status = 'processing', error_message = NULL
+    FROM claimed
+    WHERE d.id = claimed.document_id
+  )
+  SELECT * FROM claimed;
+END;
+$$;
+
+-- Extend a lease. Returns false if the worker no longer holds the job
+-- (the lease expired and it was requeued), in which case it must stop.
+CREATE OR REPLACE FUNCTION heartbeat_ingestion_job(
+  p_job_id UUID,
+  p_worker_id TEXT,
+  p_lease_seconds INTEGER DEFAULT 60
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  UPDATE ingestion_jobs
+  SET lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+  WHERE id = p_job_id AND locked_by = p_worker_id AND status = 'running';
+  RETURN FOUND;
+END;
+$$;
+
+-- Finish a claimed job as 'completed', 'failed', or 'queued' (hand it back,
+-- e.g. on shutdown or when shed by admission control, runnable again after
+-- p_retry_after_seconds). Returns false if the worker had lost the lease.
+CREATE OR REPLACE FUNCTION finish_ingestion_job(
+  p_job_id UUID,
+  p_worker_id TEXT,
+  p_status TEXT,
+  p_error TEXT DEFAULT NULL,
+  p_retry_after_seconds FLOAT DEFAULT 0
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_document_id UUID;
+BEGIN
+  IF p_status NOT IN ('completed', 'failed', 'queued') THEN
+    RAISE EXCEPTION 'Invalid job status: %', p_status;
+  END IF;
+
+  UPDATE ingestion_jobs
+  SET
+    status = p_status,
+    last_error = p_error,
+    locked_by = NULL,
+    lease_expires_at = NULL,
+    run_after = CASE WHEN p_status = 'queued'
+      THEN now() + make_interval(secs => p_retry_after_seconds)
+      ELSE run_after END,
+    -- Handing a job back is not a failed attempt
+    attempts = CASE WHEN p_status = 'queued' THEN attempts - 1 ELSE attempts END
+  WHERE id = p_job_id AND locked_by = p_worker_id AND status = 'running'
+  RETURNING document_id INTO v_document_id;
+
+  IF v_document_id IS NULL THEN
+    RETURN FALSE;
+  END IF;
+
+  IF p_status = 'queued' THEN
+    UPDATE documents SET status = 'pending' WHERE id = v_document_id;
+  END IF;
+  RETURN TRUE;
+END;
+$$;
+
+-- Requeue running jobs whose lease expired; fail those out of attempts.
+-- Safe to run from every replica at once. Returns the number of jobs swept.
+CREATE OR REPLACE FUNCTION requeue_expired_ingestion_jobs()
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_swept INTEGER;
+BEGIN
+  WITH expired AS (
+    SELECT j.id
+    FROM ingestion_jobs j
+    WHERE j.status = 'running' AND j.lease_expires_at < now()
+    FOR UPDATE SKIP LOCKED
+  ),
+  swept AS (
+    UPDATE ingestion_jobs j
+    SET
+      status = CASE WHEN j.attempts >= j.max_attempts THEN 'failed' ELSE 'queued' END,
+      last_error = 'Lease expired on ' || coalesce(j.locked_by, 'unknown worker'),
+      locked_by = NULL,
+      lease_expires_at = NULL
+    FROM expired
+    WHERE j.id = expired.id
+    RETURNING j.document_id, j.status
+  ),
+  documents_updated AS (
+    UPDATE documents d
+    SET
+      status = CASE WHEN swept.status = 'failed' THEN 'failed' ELSE 'pending' END,
+      error_message = CASE WHEN swept.status = 'failed'
+        THEN 'Processing was interrupted too many times' ELSE NULL END
+    FROM swept
+    WHERE d.id = swept.document_id
+  )
+  SELECT count(*) INTO v_swept FROM swept;
+  RETURN v_swept;
+END;
+$$;
@@ -0,0 +1,372 @@
+-- Online embedding model migrations.
+--
+-- The active model lives in embedding_config instead of being hard-coded.
+-- Switching models adds a shadow column (chunks.embedding_next) with its own
+-- HNSW index, which is backfilled from chunk content while retrieval keeps
+-- using chunks.embedding. Once every chunk has a shadow vector, finalize
+-- swaps the columns in one transaction and drops the old vectors.
+--
+--   begin_embedding_migration('text-embedding-3-large', 1536)
+--   ... build the shadow indexes concurrently (see 018) ...
+--   ... backfill (python -m scripts.migrate_embeddings backfill) ...
+--   finalize_embedding_migration()
+--
+-- Vector parameters of the match functions are untyped `vector` from here
+-- on, so the dimension can change without redefining them.
+
+CREATE TABLE embedding_config (
+  id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id), -- single row
+  model TEXT NOT NULL,
+  dimensions INTEGER NOT NULL,
+  target_model TEXT,
+  target_dimensions INTEGER,
+  migration_started_at TIMESTAMPTZ,
+  updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+-- Enable Row Level Security (service role only)
+ALTER TABLE embedding_config ENABLE ROW LEVEL SECURITY;
+
+CREATE TRIGGER update_embedding_config_updated_at
+  BEFORE UPDATE ON embedding_config
+  FOR EACH ROW
+  EXECUTE FUNCTION update_updated_at_column();
+
+-- The model every existing chunk was embedded with
+INSERT INTO embedding_config (model, dimensions) VALUES ('text-embedding-3-small', 1536);
+
+-- Add the shadow column and its indexes. Both indexes are built on an empty
+-- column, so this is instant; the backfill maintains them incrementally.
+CREATE OR REPLACE FUNCTION begin_embedding_migration(
+  p_model TEXT,
+  p_dimensions INTEGER
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_config embedding_config%ROWTYPE;
+BEGIN
+  SELECT * INTO v_config FROM embedding_config FOR UPDATE;
+  IF v_config.target_model IS NOT NULL THEN
+    RAISE EXCEPTION 'A migration to % is already in progress', v_config.target_model;
+  END IF;
+  IF p_model = v_config.model AND p_dimensions = v_config.dimensions THEN
+    RAISE EXCEPTION 'Chunks are already embedded with % (%)', p_model, p_dimensions;
+  END IF;
+  IF p_dimensions < 1 OR p_dimensions > 16000 THEN
+    RAISE EXCEPTION 'Invalid dimensions: %', p_dimensions;
+  END IF;
+
+  EXECUTE format('ALTER TABLE chunks ADD COLUMN embedding_next vector(%s)', p_dimensions);
+  CREATE INDEX idx_chunks_embedding_next ON chunks USING hnsw (embedding_next vector_cosine_ops);
+  -- Backfill worklist; shrinks to nothing as the backfill proceeds
+  CREATE INDEX idx_chunks_embedding_backfill ON chunks (id) WHERE embedding_next IS NULL;
+
+  UPDATE embedding_config
+  SET target_model = p_model, target_dimensions = p_dimensions, migration_started_at = now();
+END;
+$$;
+
+-- Next chunks without a shadow vector, in id order after p_after_id
+CREATE OR REPLACE FUNCTION next_chunks_to_backfill(
+  p_after_id UUID DEFAULT NULL,
+  p_limit INTEGER DEFAULT 100
+)
+RETURNS TABLE (id UUID, content TEXT)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  -- Dynamic because embedding_next only exists during a migration
+  RETURN QUERY EXECUTE
+    'SELECT c.id, c.content FROM chunks c
+     WHERE c.embedding_next IS NULL AND ($1 IS NULL OR c.id > $1)
+     ORDER BY c.id
+     LIMIT $2'
+  USING p_after_id, p_limit;
+END;
+$$;
+
+-- Write shadow vectors: p_rows is [{"id": "...", "embedding": [...]}, ...]
+CREATE OR REPLACE FUNCTION set_shadow_embeddings(p_rows JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_updated INTEGER;
+BEGIN
+  EXECUTE
+    'UPDATE chunks c
+     SET embedding_next = (r->>''embedding'')::vector
+     FROM jsonb_array_elements($1) r
+     WHERE c.id = (r->>''id'')::uuid'
+  USING p_rows;
+  GET DIAGNOSTICS v_updated = ROW_COUNT;
+  RETURN v_updated;
+END;
+$$;
+
+-- Active and target model plus backfill coverage
+CREATE OR REPLACE FUNCTION embedding_migration_status()
+RETURNS TABLE (
+  model TEXT,
+  dimensions INTEGER,
+  target_model TEXT,
+  target_dimensions INTEGER,
+  migration_started_at TIMESTAMPTZ,
+  total_chunks BIGINT,
+  remaining_chunks BIGINT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_config embedding_config%ROWTYPE;
+  v_total BIGINT;
+  v_remaining BIGINT := 0;
+BEGIN
+  SELECT * INTO v_config FROM embedding_config;
+  SELECT count(*) INTO v_total FROM chunks;
+  IF v_config.target_model IS NOT NULL THEN
+    EXECUTE 'SELECT count(*) FROM chunks WHERE embedding_next IS NULL' INTO v_remaining;
+  END IF;
+  RETURN QUERY SELECT
+    v_config.model, v_config.dimensions, v_config.target_model, v_config.target_dimensions,
+    v_config.migration_started_at, v_total, v_remaining;
+END;
+$$;
+
+-- Swap the shadow column in. Fails without changing anything unless every
+-- chunk has a shadow vector. Readers see either the old or the new column,
+-- never a mix; the exclusive lock is held only for the catalog changes.
+CREATE OR REPLACE FUNCTION finalize_embedding_migration()
+RETURNS VOID
+LANGUAGE plpgsql
+SET lock_timeout = '5s'
+AS $$
+DECLARE
+  v_config embedding_config%ROWTYPE;
+  v_remaining BIGINT;
+BEGIN
+  SELECT * INTO v_config FROM embedding_config FOR UPDATE;
+  IF v_config.target_model IS NULL THEN
+    RAISE EXCEPTION 'No embedding migration in progress';
+  END IF;
+
+  -- Blocks inserts racing the coverage check; lock_timeout keeps us from
+  -- queueing behind (and stalling everyone behind) a long-running query
+  LOCK TABLE chunks IN ACCESS EXCLUSIVE MODE;
+  EXECUTE 'SELECT count(*) FROM chunks WHERE embedding_next IS NULL' INTO v_remaining;
+  IF v_remaining > 0 THEN
+    RAISE EXCEPTION 'Embedding migration incomplete: % chunks left to backfill', v_remaining;
+  END IF;
+
+  DROP INDEX idx_chunks_embedding_backfill;
+  -- Dropping the column drops idx_chunks_embedding; space is reclaimed by vacuum
+  ALTER TABLE chunks DROP COLUMN embedding;
+  ALTER TABLE chunks RENAME COLUMN embedding_next TO embedding;
+  ALTER INDEX idx_chunks_embedding_next RENAME TO idx_chunks_embedding;
+
+  -- Cached answers are keyed by query vectors from the old model
+  TRUNCATE answer_cache;
+  DROP INDEX IF EXISTS idx_answer_cache_embedding;
+  EXECUTE format(
+    'ALTER TABLE answer_cache ALTER COLUMN query_embedding TYPE vector(%s)',
+    v_config.target_dimensions
+  );
+  CREATE INDEX idx_answer_cache_embedding ON answer_cache USING hnsw (query_embedding vector_cosine_ops);
+
+  UPDATE embedding_config
+  SET
+    model = v_config.target_model,
+    dimensions = v_config.target_dimensions,
+    target_model = NULL,
+    target_dimensions = NULL,
+    migration_started_at = NULL;
+END;
+$$;
+
+-- Give up on a migration and drop the shadow vectors
+CREATE OR REPLACE FUNCTION abort_embedding_migration()
+RETURNS VOID
+LANGUAGE plpgsql
+SET lock_timeout = '5s'
+AS $$
+BEGIN
+  PERFORM 1 FROM embedding_config WHERE target_model IS NOT NULL FOR UPDATE;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'No embedding migration in progress';
+  END IF;
+  ALTER TABLE chunks DROP COLUMN embedding_next; -- drops both shadow indexes
+  UPDATE embedding_config
+  SET target_model = NULL, target_dimensions = NULL, migration_started_at = NULL;
+END;
+$$;
+
+-- Match functions: untyped query vectors, plus an optional query_model
+-- guard. A caller whose cached model is stale (the migration was just
+-- finalized) gets an error instead of silently comparing vectors from
+-- different models, and retries with the new model.
+CREATE OR REPLACE FUNCTION check_embedding_model(query_model TEXT)
+RETURNS VOID
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+  v_model TEXT;
+BEGIN
+  IF query_model IS NULL THEN
+    RETURN;
+  END IF;
+  SELECT model INTO v_model FROM embedding_config;
+  IF v_model IS DISTINCT FROM query_model THEN
+    RAISE EXCEPTION 'Embedding model mismatch: query uses %, chunks use %', query_model, v_model;
+  END IF;
+END;
+$$;
+
+DROP FUNCTION IF EXISTS match_chunks(vector, INTEGER, UUID, UUID[], TEXT[], TIMESTAMPTZ, TIMESTAMPTZ, JSONB);
+DROP FUNCTION IF EXISTS match_chunks_scoped(vector, UUID[], INTEGER, UUID, TEXT[], TIMESTAMPTZ, TIMESTAMPTZ, JSONB);
+DROP FUNCTION IF EXISTS match_answer_cache(UUID, TEXT, vector, UUID[], FLOAT, INTERVAL);
+
+CREATE OR REPLACE FUNCTION match_chunks(
+  query_embedding vector,
+  match_count INTEGER DEFAULT 5,
+  filter_user_id UUID DEFAULT NULL,
+  filter_document_ids UUID[] DEFAULT NULL,
+  filter_filenames TEXT[] DEFAULT NULL,
+  filter_created_after TIMESTAMPTZ DEFAULT NULL,
+  filter_created_before TIMESTAMPTZ DEFAULT NULL,
+  filter_metadata JSONB DEFAULT NULL,
+  query_model TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  document_id UUID,
+  content TEXT,
+  metadata JSONB,
+  chunk_index INTEGER,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+SET hnsw.iterative_scan = strict_order
+AS $$
+BEGIN
+  PERFORM check_embedding_model(query_model);
+  RETURN QUERY
+  SELECT
+    c.id,
+    c.document_id,
+    c.content,
+    c.metadata,
+    c.chunk_index,
+    1 - (c.embedding <=> query_embedding) AS similarity
+  FROM chunks c
+  WHERE
+    (filter_user_id IS NULL OR c.user_id = filter_user_id)
+    AND c.embedding IS NOT NULL
+    AND (filter_document_ids IS NULL OR c.document_id = ANY(filter_document_ids))
+    AND (filter_filenames IS NULL OR c.metadata->>'filename' = ANY(filter_filenames))
+    AND (filter_created_after IS NULL OR c.created_at >= filter_created_after)
+    AND (filter_created_before IS NULL OR c.created_at < filter_created_before)
+    AND (filter_metadata IS NULL OR c.metadata @> filter_metadata)
+    AND NOT EXISTS (SELECT 1 FROM document_tombstones t WHERE t.document_id = c.document_id)
+  ORDER BY c.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION match_chunks_scoped(
+  query_embedding vector,
+  filter_document_ids UUID[],
+  match_count INTEGER DEFAULT 5,
+  filter_user_id UUID DEFAULT NULL,
+  filter_filenames TEXT[] DEFAULT NULL,
+  filter_created_after TIMESTAMPTZ DEFAULT NULL,
+  filter_created_before TIMESTAMPTZ DEFAULT NULL,
+  filter_metadata JSONB DEFAULT NULL,
+  query_model TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+  id UUID,
+  document_id UUID,
+  content TEXT,
+  metadata JSONB,
+  chunk_index INTEGER,
+  similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  PERFORM check_embedding_model(query_model);
+  RETURN QUERY
+  WITH scoped AS MATERIALIZED (
+    SELECT c.id, c.document_id, c.content, c.metadata, c.chunk_index, c.embedding
+    FROM chunks c
+    WHERE
+      c.document_id = ANY(filter_document_ids)
+      AND (filter_user_id IS NULL OR c.user_id = filter_user_id)
+      AND c.embedding IS NOT NULL
+      AND (filter_filenames IS NULL OR c.metadata->>'filename' = ANY(filter_filenames))
+      AND (filter_created_after IS NULL OR c.created_at >= filter_created_after)
+      AND (filter_created_before IS NULL OR c.created_at < filter_created_before)
+      AND (filter_metadata IS NULL OR c.metadata @> filter_metadata)
+      AND NOT EXISTS (SELECT 1 FROM document_tombstones t WHERE t.document_id = c.document_id)
+  )
+  SELECT
+    s.id,
+    s.document_id,
+    s.content,
+    s.metadata,
+    s.chunk_index,
+    1 - (s.embedding <=> query_embedding) AS similarity
+  FROM scoped s
+  ORDER BY s.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION match_answer_cache(
+  p_user_id UUID,
+  p_model TEXT,
+  p_query_embedding vector,
+  p_chunk_ids UUID[],
+  p_min_similarity FLOAT DEFAULT 0.95,
+  p_max_age INTERVAL DEFAULT INTERVAL '7 days'
+)
+RETURNS TABLE (
+  id UUID,
+  answer TEXT,
+  similarity FLOAT,
+  generation_ms INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  WITH hit AS (
+    SELECT
+      a.id,
+      a.answer,
+      1 - (a.query_embedding <=> p_query_embedding) AS similarity,
+      a.generation_ms
+    FROM answer_cache a
+    WHERE
+      a.user_id = p_user_id
+      AND a.model = p_model
+      AND a.chunk_ids = p_chunk_ids
+      AND a.created_at > now() - p_max_age
+    ORDER BY a.query_embedding <=> p_query_embedding
+    LIMIT 1
+  ),
+  touched AS (
+    UPDATE answer_cache a
+    SET hit_count = a.hit_count + 1, last_hit_at = now()
+    FROM hit
+    WHERE a.id = hit.id AND hit.similarity >= p_min_similarity
+    RETURNING a.id
+  )
+  SELECT hit.id, hit.answer, hit.similarity, hit.generation_ms
+  FROM hit
+  JOIN touched ON touched.id = hit.id;
+END;
+$$;
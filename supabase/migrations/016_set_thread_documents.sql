@@ -0,0 +1,42 @@
+-- Replace a thread's document set in one transaction, so a failed or
+-- cancelled request can never leave the thread without its scope (which
+-- would silently widen retrieval to all of the user's documents).
+--
+-- Returns the ids that are not live documents of the user; when there are
+-- any, the existing set is left untouched.
+CREATE OR REPLACE FUNCTION set_thread_documents(
+  p_thread_id UUID,
+  p_user_id UUID,
+  p_document_ids UUID[]
+)
+RETURNS SETOF UUID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT r.id
+  FROM unnest(p_document_ids) AS r(id)
+  WHERE NOT EXISTS (
+    SELECT 1
+    FROM documents d
+    WHERE d.id = r.id
+      AND d.user_id = p_user_id
+      AND d.deleted_at IS NULL
+  );
+  IF FOUND THEN
+    RETURN;
+  END IF;
+
+  -- Serializes concurrent replaces of the same thread
+  PERFORM 1 FROM threads WHERE id = p_thread_id AND user_id = p_user_id FOR UPDATE;
+  IF NOT FOUND THEN
+    RETURN;
+  END IF;
+
+  DELETE FROM thread_documents WHERE thread_id = p_thread_id;
+
+  INSERT INTO thread_documents (thread_id, document_id, user_id)
+  SELECT DISTINCT p_thread_id, r.id, p_user_id
+  FROM unnest(p_document_ids) AS r(id);
+END;
+$$;
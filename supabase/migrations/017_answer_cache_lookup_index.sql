@@ -0,0 +1,68 @@
+-- Answer cache lookups go through a btree on the exact key.
+--
+-- match_answer_cache filters on an exact (user_id, model, chunk_ids) match
+-- but ordered by query distance, so the planner walked the HNSW index and
+-- post-filtered its ef_search candidates. The row with the matching chunk
+-- set could fall outside that candidate list and be missed, more often the
+-- larger the cache grew. The key now selects the handful of candidate rows
+-- and the distance is computed on just those.
+
+CREATE INDEX idx_answer_cache_lookup ON answer_cache(user_id, model, chunk_ids);
+
+-- Covered by idx_answer_cache_lookup
+DROP INDEX IF EXISTS idx_answer_cache_user_model;
+
+-- No longer used for lookups; only made every insert more expensive
+DROP INDEX IF EXISTS idx_answer_cache_embedding;
+
+CREATE OR REPLACE FUNCTION match_answer_cache(
+  p_user_id UUID,
+  p_model TEXT,
+  p_query_embedding vector,
+  p_chunk_ids UUID[],
+  p_min_similarity FLOAT DEFAULT 0.95,
+  p_max_age INTERVAL DEFAULT INTERVAL '7 days'
+)
+RETURNS TABLE (
+  id UUID,
+  answer TEXT,
+  similarity FLOAT,
+  generation_ms INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  -- MATERIALIZED keeps the planner on idx_answer_cache_lookup instead of
+  -- ordering through a vector index
+  WITH candidates AS MATERIALIZED (
+    SELECT a.id, a.answer, a.query_embedding, a.generation_ms
+    FROM answer_cache a
+    WHERE
+      a.user_id = p_user_id
+      AND a.model = p_model
+      AND a.chunk_ids = p_chunk_ids
+      AND a.created_at > now() - p_max_age
+  ),
+  hit AS (
+    SELECT
+      c.id,
+      c.answer,
+      1 - (c.query_embedding <=> p_query_embedding) AS similarity,
+      c.generation_ms
+    FROM candidates c
+    ORDER BY c.query_embedding <=> p_query_embedding
+    LIMIT 1
+  ),
+  touched AS (
+    UPDATE answer_cache a
+    SET hit_count = a.hit_count + 1, last_hit_at = now()
+    FROM hit
+    WHERE a.id = hit.id AND hit.similarity >= p_min_similarity
+    RETURNING a.id
+  )
+  SELECT hit.id, hit.answer, hit.similarity, hit.generation_ms
+  FROM hit
+  JOIN touched ON touched.id = hit.id;
+END;
+$$;
@@ -0,0 +1,127 @@
+-- Embedding migrations: dimension limit and non-blocking shadow indexes.
+--
+-- pgvector's HNSW index on `vector` supports at most 2000 dimensions, so a
+-- bigger target could be backfilled but never indexed. Models that allow
+-- shortened vectors are migrated at 2000 or fewer dimensions instead
+-- (e.g. text-embedding-3-large at 1536).
+--
+-- begin_embedding_migration used to build the shadow indexes itself. A
+-- plain CREATE INDEX holds a SHARE lock on chunks while it scans the whole
+-- table, which blocks ingestion inserts, and CREATE INDEX CONCURRENTLY
+-- cannot run inside a function. begin now only adds the column; the
+-- indexes are built concurrently from psql or the SQL editor (one
+-- statement at a time, outside a transaction), at any point before
+-- finalize:
+--
+--   SELECT begin_embedding_migration('text-embedding-3-large', 1536);
+--   CREATE INDEX CONCURRENTLY idx_chunks_embedding_next
+--     ON chunks USING hnsw (embedding_next vector_cosine_ops);
+--   CREATE INDEX CONCURRENTLY idx_chunks_embedding_backfill
+--     ON chunks (id) WHERE embedding_next IS NULL;
+--   ... backfill (python -m scripts.migrate_embeddings backfill) ...
+--   SELECT finalize_embedding_migration();
+--
+-- Building the HNSW index after the backfill is faster than maintaining it
+-- during it; finalize refuses to run until both indexes are valid.
+
+-- Add the shadow column. Metadata-only, so the ACCESS EXCLUSIVE lock is
+-- held for an instant; lock_timeout keeps it from queueing behind (and
+-- stalling everyone behind) a long-running query.
+CREATE OR REPLACE FUNCTION begin_embedding_migration(
+  p_model TEXT,
+  p_dimensions INTEGER
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SET lock_timeout = '5s'
+AS $$
+DECLARE
+  v_config embedding_config%ROWTYPE;
+BEGIN
+  SELECT * INTO v_config FROM embedding_config FOR UPDATE;
+  IF v_config.target_model IS NOT NULL THEN
+    RAISE EXCEPTION 'A migration to % is already in progress', v_config.target_model;
+  END IF;
+  IF p_model = v_config.model AND p_dimensions = v_config.dimensions THEN
+    RAISE EXCEPTION 'Chunks are already embedded with % (%)', p_model, p_dimensions;
+  END IF;
+  IF p_dimensions < 1 OR p_dimensions > 2000 THEN
+    RAISE EXCEPTION 'Invalid dimensions: % (HNSW indexes support 1 to 2000; use shortened vectors)', p_dimensions;
+  END IF;
+
+  EXECUTE format('ALTER TABLE chunks ADD COLUMN embedding_next vector(%s)', p_dimensions);
+
+  UPDATE embedding_config
+  SET target_model = p_model, target_dimensions = p_dimensions, migration_started_at = now();
+END;
+$$;
+
+-- Whether both shadow indexes exist and a concurrent build has completed
+CREATE OR REPLACE FUNCTION embedding_migration_indexes_ready()
+RETURNS BOOLEAN
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT count(*) = 2
+  FROM pg_index i
+  JOIN pg_class c ON c.oid = i.indexrelid
+  WHERE
+    c.relnamespace = 'public'::regnamespace
+    AND c.relname IN ('idx_chunks_embedding_next', 'idx_chunks_embedding_backfill')
+    AND i.indisvalid
+    AND i.indisready;
+$$;
+
+-- Swap the shadow column in. Fails without changing anything unless every
+-- chunk has a shadow vector and the shadow indexes are built. Readers see
+-- either the old or the new column, never a mix; the exclusive lock is held
+-- only for the catalog changes.
+CREATE OR REPLACE FUNCTION finalize_embedding_migration()
+RETURNS VOID
+LANGUAGE plpgsql
+SET lock_timeout = '5s'
+AS $$
+DECLARE
+  v_config embedding_config%ROWTYPE;
+  v_remaining BIGINT;
+BEGIN
+  SELECT * INTO v_config FROM embedding_config FOR UPDATE;
+  IF v_config.target_model IS NULL THEN
+    RAISE EXCEPTION 'No embedding migration in progress';
+  END IF;
+  -- Without them the coverage check scans the table under the exclusive
+  -- lock, and retrieval falls back to a sequential scan once swapped
+  IF NOT embedding_migration_indexes_ready() THEN
+    RAISE EXCEPTION 'Shadow indexes are not built: run CREATE INDEX CONCURRENTLY for idx_chunks_embedding_next and idx_chunks_embedding_backfill first';
+  END IF;
+
+  -- Blocks inserts racing the coverage check
+  LOCK TABLE chunks IN ACCESS EXCLUSIVE MODE;
+  EXECUTE 'SELECT count(*) FROM chunks WHERE embedding_next IS NULL' INTO v_remaining;
+  IF v_remaining > 0 THEN
+    RAISE EXCEPTION 'Embedding migration incomplete: % chunks left to backfill', v_remaining;
+  END IF;
+
+  DROP INDEX idx_chunks_embedding_backfill;
+  -- Dropping the column drops idx_chunks_embedding; space is reclaimed by vacuum
+  ALTER TABLE chunks DROP COLUMN embedding;
+  ALTER TABLE chunks RENAME COLUMN embedding_next TO embedding;
+  ALTER INDEX idx_chunks_embedding_next RENAME TO idx_chunks_embedding;
+
+  -- Cached answers are keyed by query vectors from the old model. Lookups
+  -- go through idx_answer_cache_lookup (017), so no vector index is rebuilt.
+  TRUNCATE answer_cache;
+  EXECUTE format(
+    'ALTER TABLE answer_cache ALTER COLUMN query_embedding TYPE vector(%s)',
+    v_config.target_dimensions
+  );
+
+  UPDATE embedding_config
+  SET
+    model = v_config.target_model,
+    dimensions = v_config.target_dimensions,
+    target_model = NULL,
+    target_dimensions = NULL,
+    migration_started_at = NULL;
+END;
+$$;
@@ -0,0 +1,100 @@
+-- Reaper coordination across replicas.
+--
+-- Every replica runs the reaper, and each used to read the same oldest
+-- tombstones and delete the same chunk batches. Tombstones are now claimed
+-- under a lease with FOR UPDATE SKIP LOCKED, like ingestion jobs (014): a
+-- replica only reaps documents it holds, each chunk batch extends the lease,
+-- and a crashed reaper's tombstones are picked up by others once it expires.
+
+ALTER TABLE document_tombstones
+  ADD COLUMN claimed_by TEXT,
+  ADD COLUMN claimed_until TIMESTAMPTZ;
+
+-- Claim up to p_limit tombstones that nobody holds (or whose lease expired),
+-- oldest first. Rows locked by another claimer are skipped, not waited on.
+CREATE OR REPLACE FUNCTION claim_tombstones(
+  p_worker_id TEXT,
+  p_limit INTEGER DEFAULT 50,
+  p_lease_seconds INTEGER DEFAULT 120
+)
+RETURNS TABLE (document_id UUID, storage_path TEXT)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  WITH next AS (
+    SELECT t.document_id
+    FROM document_tombstones t
+    WHERE t.claimed_until IS NULL OR t.claimed_until < now()
+    ORDER BY t.deleted_at
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  ),
+  claimed AS (
+    UPDATE document_tombstones t
+    SET claimed_by = p_worker_id, claimed_until = now() + make_interval(secs => p_lease_seconds)
+    FROM next
+    WHERE t.document_id = next.document_id
+    RETURNING t.document_id, t.storage_path
+  )
+  SELECT c.document_id, c.storage_path FROM claimed c;
+END;
+$$;
+
+-- Delete up to p_batch_size chunks of a tombstoned document held by
+-- p_worker_id, extending its lease. Returns the number deleted; raises if
+-- the lease was lost, so the caller stops instead of racing the new holder.
+DROP FUNCTION IF EXISTS reap_document_chunks(UUID, INTEGER);
+
+CREATE OR REPLACE FUNCTION reap_document_chunks(
+  p_document_id UUID,
+  p_worker_id TEXT,
+  p_batch_size INTEGER DEFAULT 1000,
+  p_lease_seconds INTEGER DEFAULT 120
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_deleted INTEGER;
+BEGIN
+  UPDATE document_tombstones
+  SET claimed_until = now() + make_interval(secs => p_lease_seconds)
+  WHERE document_id = p_document_id AND claimed_by = p_worker_id;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Tombstone % is not held by %', p_document_id, p_worker_id;
+  END IF;
+
+  DELETE FROM chunks
+  WHERE id IN (
+    SELECT c.id FROM chunks c
+    WHERE c.document_id = p_document_id
+    LIMIT p_batch_size
+  );
+  GET DIAGNOSTICS v_deleted = ROW_COUNT;
+  RETURN v_deleted;
+END;
+$$;
+
+-- Delete the rows of reaped documents still held by p_worker_id (cascading
+-- to their tombstones and thread attachments). Returns the ids deleted.
+CREATE OR REPLACE FUNCTION finish_reaped_documents(
+  p_worker_id TEXT,
+  p_document_ids UUID[]
+)
+RETURNS SETOF UUID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  WITH deleted AS (
+    DELETE FROM documents d
+    USING document_tombstones t
+    WHERE t.document_id = d.id
+      AND t.claimed_by = p_worker_id
+      AND d.id = ANY(p_document_ids)
+    RETURNING d.id
+  )
+  SELECT deleted.id FROM deleted;
+END;
+$$;
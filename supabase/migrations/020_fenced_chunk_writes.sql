@@ -0,0 +1,63 @@
+-- Fence ingestion chunk writes by the job lease.
+--
+-- A worker that stops heartbeating (network or database trouble) keeps
+-- running until it notices, while its expired lease lets the sweeper hand
+-- the job to another replica. Without a fence both would delete and insert
+-- the same document's chunks. Workers now write chunks through this
+-- function, which refuses unless the caller still holds an unexpired lease.
+-- The job row is share-locked for the write, so the sweeper (which skips
+-- locked rows) cannot requeue the job halfway through a batch.
+
+-- Insert chunk rows for a claimed job's document, first deleting its
+-- existing chunks if p_replace. Returns the number of rows inserted. Rows
+-- are chunks-shaped JSON objects; their keys are the columns written, so
+-- embedding_next is included only while a model migration is running.
+CREATE OR REPLACE FUNCTION write_document_chunks(
+  p_job_id UUID,
+  p_worker_id TEXT,
+  p_rows JSONB,
+  p_replace BOOLEAN DEFAULT FALSE
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_document_id UUID;
+  v_columns TEXT;
+  v_inserted INTEGER := 0;
+BEGIN
+  SELECT j.document_id INTO v_document_id
+  FROM ingestion_jobs j
+  WHERE j.id = p_job_id
+    AND j.locked_by = p_worker_id
+    AND j.status = 'running'
+    AND j.lease_expires_at > now()
+  FOR SHARE;
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'Lost the lease on ingestion job %', p_job_id;
+  END IF;
+
+  IF p_replace THEN
+    DELETE FROM chunks WHERE document_id = v_document_id;
+  END IF;
+
+  IF jsonb_array_length(p_rows) = 0 THEN
+    RETURN 0;
+  END IF;
+  IF EXISTS (
+    SELECT 1 FROM jsonb_array_elements(p_rows) r
+    WHERE (r->>'document_id')::uuid IS DISTINCT FROM v_document_id
+  ) THEN
+    RAISE EXCEPTION 'Chunks do not belong to the document of job %', p_job_id;
+  END IF;
+
+  SELECT string_agg(quote_ident(k), ', ') INTO v_columns
+  FROM jsonb_object_keys(p_rows->0) k;
+  EXECUTE format(
+    'INSERT INTO chunks (%1$s) SELECT %1$s FROM jsonb_populate_recordset(NULL::chunks, $1)',
+    v_columns
+  ) USING p_rows;
+  GET DIAGNOSTICS v_inserted = ROW_COUNT;
+  RETURN v_inserted;
+END;
+$$;